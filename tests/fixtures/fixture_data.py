@@ -5,6 +5,11 @@ from mixer.backend.django import mixer as _mixer
 from posts.models import Post, Group
 
 
+@pytest.fixture(autouse=True)
+def temp_media_root(settings, tmp_path):
+    settings.MEDIA_ROOT = str(tmp_path)
+
+
 @pytest.fixture()
 def mock_media(settings):
     with tempfile.TemporaryDirectory() as temp_directory:
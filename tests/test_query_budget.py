@@ -0,0 +1,31 @@
+import pytest
+from django.core.cache import cache
+
+from posts.models import Follow, Post
+from tests.utils import get_within_query_budget
+
+
+class TestQueryBudget:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_pages_within_query_budget(self, settings, mixer, user,
+                                       user_client, another_user, group):
+        Follow.objects.create(user=user, author=another_user)
+        for author in (user, another_user):
+            mixer.cycle(11).blend(Post, author=author, group=group, image='')
+        post = Post.objects.filter(author=user).first()
+        urls = [
+            '/',
+            f'/group/{group.slug}/',
+            f'/profile/{another_user.username}/',
+            f'/posts/{post.id}/',
+            f'/posts/{post.id}/edit/',
+            '/create/',
+            '/follow/',
+        ]
+        for url in urls:
+            cache.clear()
+            response = get_within_query_budget(user_client, url, settings)
+            assert response.status_code == 200, (
+                f'Страница `{url}` должна укладываться в бюджет SQL-запросов'
+            )
@@ -3,3 +3,10 @@ def get_field_from_context(context, field_type):
         if field not in ('user', 'request') and isinstance(context[field], field_type):
             return context[field]
     return
+
+
+def get_within_query_budget(client, url, settings):
+    """GET в строгом режиме бюджета запросов: превышение бюджета view
+    поднимает QueryBudgetExceeded со списком запросов."""
+    settings.QUERY_BUDGET_STRICT = True
+    return client.get(url)
@@ -0,0 +1,158 @@
+"""Статистика кэша по префиксам ключей и по view.
+
+core.caches.instrumented.InstrumentedCache вызывает record() на каждое
+обращение к кэшу: попадания, промахи, записи с их размером,
+удаления, вытеснения и время каждой операции. Счётчики копятся в
+памяти процесса и раз в FLUSH_INTERVAL секунд (и при выходе)
+добавляются в SQLite-файл, общий для процессов машины. Его читают
+команда cache_stats и страница cache_stats для персонала.
+
+View, из которого обращаются к кэшу, запоминает
+CacheStatsMiddleware; вне запросов view — '-'.
+"""
+import atexit
+import os
+import re
+import sqlite3
+import threading
+import time
+from contextvars import ContextVar
+
+FLUSH_INTERVAL = 10
+NO_VIEW = '-'
+# ключи cache_page: views.decorators.cache.cache_page.<key_prefix>....
+CACHE_PAGE_RE = re.compile(
+    r'views\.decorators\.cache\.(cache_page|cache_header)\.([^.]*)')
+EVENTS = ('hit', 'miss', 'set', 'delete', 'evict')
+
+_view = ContextVar('cache_stats_view', default=NO_VIEW)
+
+
+def key_prefix(key):
+    """Постоянная часть ключа: 'posts:card:12:abc' -> 'posts:card',
+    ключи cache_page -> 'cache_page.<key_prefix>'."""
+    match = CACHE_PAGE_RE.match(key)
+    if match:
+        return '.'.join(match.groups())
+    parts = []
+    for part in key.split(':')[:2]:
+        if not part or any(char.isdigit() for char in part):
+            break
+        parts.append(part)
+    return ':'.join(parts) or key[:16]
+
+
+class StatsStore:
+    """Счётчики процесса и их общий SQLite-файл."""
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.pid = None
+        self.counters = {}
+        self.flushed = time.monotonic()
+        atexit.register(self.flush)
+
+    def _connect(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        connection = sqlite3.connect(self.path, timeout=5,
+                                     isolation_level=None)
+        connection.execute(
+            'CREATE TABLE IF NOT EXISTS cache_stats (prefix TEXT, view '
+            'TEXT, event TEXT, count INTEGER, bytes INTEGER, seconds REAL, '
+            'max_seconds REAL, PRIMARY KEY (prefix, view, event))')
+        return connection
+
+    def record(self, prefix, event, count=1, size=0, seconds=0.0):
+        with self.lock:
+            if self.pid != os.getpid():
+                # счётчики родителя после fork сбросит сам родитель
+                self.pid = os.getpid()
+                self.counters.clear()
+            row = self.counters.setdefault(
+                (prefix, _view.get(), event), [0, 0, 0.0, 0.0])
+            row[0] += count
+            row[1] += size
+            row[2] += seconds
+            row[3] = max(row[3], seconds)
+            due = time.monotonic() - self.flushed >= FLUSH_INTERVAL
+        if due:
+            self.flush()
+
+    def flush(self):
+        with self.lock:
+            counters, self.counters = self.counters, {}
+            self.flushed = time.monotonic()
+        if not counters:
+            return
+        connection = self._connect()
+        try:
+            connection.executemany(
+                'INSERT INTO cache_stats VALUES (?, ?, ?, ?, ?, ?, ?) '
+                'ON CONFLICT (prefix, view, event) DO UPDATE SET '
+                'count = count + excluded.count, '
+                'bytes = bytes + excluded.bytes, '
+                'seconds = seconds + excluded.seconds, '
+                'max_seconds = max(max_seconds, excluded.max_seconds)',
+                [(*key, *row) for key, row in counters.items()])
+        finally:
+            connection.close()
+
+    def rows(self):
+        """Накопленная статистика всех процессов: словари по строкам
+        (prefix, view, event)."""
+        self.flush()
+        connection = self._connect()
+        connection.row_factory = sqlite3.Row
+        try:
+            return [dict(row) for row in connection.execute(
+                'SELECT * FROM cache_stats ORDER BY prefix, view, event')]
+        finally:
+            connection.close()
+
+    def reset(self):
+        with self.lock:
+            self.counters.clear()
+        connection = self._connect()
+        try:
+            connection.execute('DELETE FROM cache_stats')
+        finally:
+            connection.close()
+
+
+def summary(rows):
+    """Строки по (prefix, view): число событий, доля попаданий,
+    записанные байты и среднее время операций в миллисекундах."""
+    grouped = {}
+    for row in rows:
+        line = grouped.setdefault((row['prefix'], row['view']), dict(
+            prefix=row['prefix'], view=row['view'], bytes=0, calls=0,
+            seconds=0.0, max_ms=0.0, **dict.fromkeys(EVENTS, 0)))
+        if row['event'] in EVENTS:
+            line[row['event']] += row['count']
+            line['bytes'] += row['bytes']
+        else:
+            line['calls'] += row['count']
+            line['seconds'] += row['seconds']
+            line['max_ms'] = max(line['max_ms'], row['max_seconds'] * 1000)
+    for line in grouped.values():
+        lookups = line['hit'] + line['miss']
+        line['hit_ratio'] = line['hit'] / lookups if lookups else None
+        line['avg_ms'] = (line.pop('seconds') * 1000 / line['calls']
+                          if line['calls'] else 0.0)
+    return list(grouped.values())
+
+
+class CacheStatsMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = _view.set(NO_VIEW)
+        try:
+            return self.get_response(request)
+        finally:
+            _view.reset(token)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        _view.set(request.resolver_match.view_name)
@@ -0,0 +1,249 @@
+"""Кэш страниц с инвалидацией по тегам.
+
+Тег — строка вроде 'post:42', от которой зависит страница. У каждого
+тега в кэше хранится версия — время последнего изменения в
+микросекундах. Страница, закэшированная cache_view, хранится вместе с
+версиями своих тегов и отдаётся, только пока ни одна из них не
+сменилась, поэтому записи можно держать долго: обработчики сигналов
+моделей вызывают bump() для затронутых тегов, и следующая же
+загрузка страницы рендерит её заново.
+
+Тело страницы кэшируется одно на URL для всех пользователей, поэтому
+всё, что зависит от пользователя, шаблоны таких view выводят через
+дырки core.donut: они заполняются для каждого запроса.
+"""
+import hashlib
+import math
+import random
+import sys
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+from django.utils.cache import (get_cache_key, has_vary_header,
+                                learn_cache_key, patch_cache_control)
+from django.views.decorators.http import condition
+
+from . import donut
+
+TAG_KEY = 'tag:{}'
+LOCK_KEY = 'lock:{}:{}'
+# сколько держится блокировка пересчёта страницы и сколько её ждут
+LOCK_TIMEOUT = 10
+LOCK_POLL = 0.05
+EARLY_REFRESH_BETA = 1.0
+
+
+def _now():
+    return time.time_ns() // 1000
+
+
+def versions(tags):
+    """Текущие версии тегов; отсутствующим в кэше назначается новая."""
+    keys = {TAG_KEY.format(tag): tag for tag in tags}
+    found = cache.get_many(keys)
+    missing = {key: _now() for key in keys.keys() - found.keys()}
+    if missing:
+        cache.set_many(missing, None)
+    return {keys[key]: version
+            for key, version in {**found, **missing}.items()}
+
+
+def bump(*tags):
+    """Меняет версии тегов. Внутри транзакции версии меняются ещё раз
+    после фиксации: страница, отрендеренная по старым данным между
+    двумя сменами, не будет считаться свежей."""
+    def set_versions():
+        version = _now()
+        cache.set_many(
+            {TAG_KEY.format(tag): version for tag in tags}, None)
+
+    set_versions()
+    transaction.on_commit(set_versions)
+
+
+def _cacheable(request, response):
+    if (response.streaming or response.status_code != 200
+            or 'private' in response.get('Cache-Control', '')):
+        return False
+    # показанные сообщения не должны повторяться из кэша
+    messages = getattr(request, '_messages', None)
+    if messages is not None and messages.used:
+        return False
+    # как CacheMiddleware: не кэшируем ответ, выдающий cookie новому
+    # посетителю, если он зависит от cookie
+    return not (not request.COOKIES and response.cookies
+                and has_vary_header(response, 'Cookie'))
+
+
+def _filled(request, response):
+    """Заполняет дырки в ответе. Ответ из кэша — собственная копия
+    запроса, полученная распаковкой, её можно менять на месте."""
+    response.content = donut.fill(
+        request, response.content.decode(response.charset))
+    return response
+
+
+def _render(view, request, args, kwargs):
+    request.donut = True
+    try:
+        response = view(request, *args, **kwargs)
+        if hasattr(response, 'render'):
+            response.render()
+    finally:
+        request.donut = False
+    return response
+
+
+def _refresh_early(expires, delta):
+    """Вероятностное досрочное обновление (XFetch): чем ближе срок
+    записи и чем дольше её рендер delta, тем вероятнее, что запрос
+    обновит её заранее, пока остальные ещё получают кэш."""
+    return time.time() - delta * EARLY_REFRESH_BETA * math.log(
+        random.random() or sys.float_info.min) >= expires
+
+
+def _entry(request, key_prefix):
+    """Запись кэша страницы, если версии её тегов не менялись."""
+    key = get_cache_key(request, key_prefix, 'GET', cache)
+    entry = cache.get(key) if key else None
+    if entry is not None and versions(entry[0]) == entry[0]:
+        return entry
+    return None
+
+
+def _expiring(expires, delta):
+    return time.time() >= expires or _refresh_early(expires, delta)
+
+
+def _recompute(view, request, args, kwargs, tags, timeout, key_prefix):
+    """Рендерит страницу и кладёт её в кэш вместе с версиями тегов,
+    сроком и временем рендера."""
+    stored = versions(tags(request, *args, **kwargs))
+    started = time.monotonic()
+    response = _render(view, request, args, kwargs)
+    delta = time.monotonic() - started
+    if _cacheable(request, response):
+        key = learn_cache_key(request, response, timeout, key_prefix,
+                              cache)
+        expires = time.time() + (timeout or math.inf)
+        cache.set(key, (stored, response, expires, delta),
+                  timeout and timeout * 2)
+    return response
+
+
+def _lock_key(request, key_prefix):
+    url = hashlib.md5(request.build_absolute_uri().encode()).hexdigest()
+    return LOCK_KEY.format(key_prefix, url)
+
+
+def _wait(request, key_prefix, lock):
+    """Ждёт, пока запрос, взявший блокировку, положит в кэш страницу
+    с текущими версиями тегов. Если блокировку сняли, а такой записи
+    нет — ответ не кэшируется (404, стриминг) или данные снова
+    изменились, и ждать нечего."""
+    deadline = time.monotonic() + LOCK_TIMEOUT
+    while time.monotonic() < deadline:
+        time.sleep(LOCK_POLL)
+        entry = _entry(request, key_prefix)
+        if entry is not None:
+            return entry
+        if cache.get(lock) is None:
+            return None
+    return None
+
+
+def cache_view(tags, timeout=None, key_prefix=''):
+    """Кэширует GET-ответы view, как cache_page, но проверяет версии
+    тегов, от которых зависит страница, и заполняет дырки для каждого
+    запроса. tags(request, *args, **kwargs) возвращает список тегов и
+    вызывается только при промахе: на попадании теги берутся из
+    записи кэша.
+
+    Пересчитывает страницу один запрос, взявший блокировку. Если у
+    записи только истёк срок или она обновляется заранее (см.
+    _refresh_early), остальные тем временем получают её; если записи
+    нет или сменилась версия тега — данные изменились, и старая
+    страница не отдаётся, — остальные ждут новую запись, пока
+    блокировка не снята, но не дольше LOCK_TIMEOUT секунд. Запись
+    хранится вдвое дольше timeout, чтобы после истечения срока было
+    что отдать, пока идёт пересчёт."""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view(request, *args, **kwargs)
+            entry = _entry(request, key_prefix)
+            lock = _lock_key(request, key_prefix)
+            if entry is not None:
+                _, response, expires, delta = entry
+                if (not _expiring(expires, delta)
+                        or not cache.add(lock, True, LOCK_TIMEOUT)):
+                    return _filled(request, response)
+            elif not cache.add(lock, True, LOCK_TIMEOUT):
+                entry = _wait(request, key_prefix, lock)
+                if entry is not None:
+                    return _filled(request, entry[1])
+                # дождаться не удалось, страница считается без блокировки
+                lock = None
+            try:
+                response = _recompute(view, request, args, kwargs, tags,
+                                      timeout, key_prefix)
+            finally:
+                if lock is not None:
+                    cache.delete(lock)
+            if response.streaming:
+                return response
+            return _filled(request, response)
+        return wrapper
+    return decorator
+
+
+def _validators(request, tags, args, kwargs):
+    """ETag и Last-Modified страницы по версиям её тегов, без рендера.
+    Дырки страницы зависят от пользователя, поэтому в ETag входят его
+    id и CSRF-cookie, а Last-Modified отдаётся только анонимам. При
+    непоказанных сообщениях валидаторов нет: ответ должен их вывести."""
+    if not hasattr(request, 'validators'):
+        request.validators = None, None
+        messages = getattr(request, '_messages', None)
+        if messages is None or not len(messages):
+            stored = versions(tags(request, *args, **kwargs))
+            user_id = request.user.pk
+            digest = hashlib.md5(repr((
+                sorted(stored.items()), user_id,
+                request.COOKIES.get(settings.CSRF_COOKIE_NAME),
+            )).encode()).hexdigest()
+            last_modified = None
+            if user_id is None:
+                last_modified = timezone.datetime.fromtimestamp(
+                    max(stored.values()) / 10 ** 6, timezone.utc)
+            request.validators = f'W/"{digest}"', last_modified
+    return request.validators
+
+
+def conditional_view(tags):
+    """Отвечает 304 Not Modified, если страница не менялась с версии,
+    которая есть у клиента. Валидаторы считаются по версиям тегов
+    tags(request, *args, **kwargs) до вызова view; ответ помечается
+    private, no-cache, чтобы браузер спрашивал о свежести каждый раз."""
+    def etag(request, *args, **kwargs):
+        return _validators(request, tags, args, kwargs)[0]
+
+    def last_modified(request, *args, **kwargs):
+        return _validators(request, tags, args, kwargs)[1]
+
+    def decorator(view):
+        conditional = condition(etag, last_modified)(view)
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            response = conditional(request, *args, **kwargs)
+            if response.has_header('ETag'):
+                patch_cache_control(response, private=True, no_cache=True)
+            return response
+        return wrapper
+    return decorator
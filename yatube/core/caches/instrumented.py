@@ -0,0 +1,157 @@
+"""Кэш, считающий обращения к другому кэшу, см. core.cache_stats.
+
+Все операции передаются кэшу CACHE — другому алиасу из
+settings.CACHES; статистика пишется в SQLite-файл STATS.
+
+Размер записи — длина pickle значения: это ещё одна сериализация на
+каждую запись, цена измерений. Вытеснение бэкенды не сообщают,
+поэтому оно оценивается: промах по ключу, который этот процесс
+записал и срок которого не истёк, считается вытеснением. Такие ключи
+помнятся для последних TRACKED_KEYS записей.
+
+    CACHES = {
+        'default': {
+            'BACKEND': 'core.caches.instrumented.InstrumentedCache',
+            'OPTIONS': {'CACHE': 'backend', 'STATS': '/tmp/stats.db'},
+        },
+        'backend': {...},
+    }
+"""
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+from ..cache_stats import StatsStore, key_prefix
+
+TRACKED_KEYS = 10000
+
+_stores = {}
+_written = OrderedDict()
+_lock = threading.Lock()
+
+
+def _timed(operation):
+    """Записывает время операции под префиксом первого ключа."""
+    @wraps(operation)
+    def wrapper(self, keys, *args, **kwargs):
+        if not isinstance(keys, (str, dict, list)):
+            keys = list(keys)
+        started = time.perf_counter()
+        try:
+            return operation(self, keys, *args, **kwargs)
+        finally:
+            first = keys if isinstance(keys, str) else next(iter(keys), None)
+            if first is not None:
+                self.stats.record(
+                    key_prefix(first), f'op:{operation.__name__}',
+                    seconds=time.perf_counter() - started)
+    return wrapper
+
+
+class InstrumentedCache(BaseCache):
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self.alias = options['CACHE']
+        with _lock:
+            if options['STATS'] not in _stores:
+                _stores[options['STATS']] = StatsStore(options['STATS'])
+        self.stats = _stores[options['STATS']]
+
+    @property
+    def backend(self):
+        return caches[self.alias]
+
+    def _record_sets(self, data, timeout):
+        expires = self.backend.get_backend_timeout(timeout)
+        with _lock:
+            for key, value in data.items():
+                _written[key] = expires
+                _written.move_to_end(key)
+                self.stats.record(
+                    key_prefix(key), 'set',
+                    size=len(pickle.dumps(value, pickle.HIGHEST_PROTOCOL)))
+            while len(_written) > TRACKED_KEYS:
+                _written.popitem(last=False)
+
+    def _record_lookups(self, keys, found):
+        with _lock:
+            for key in keys:
+                prefix = key_prefix(key)
+                if key in found:
+                    self.stats.record(prefix, 'hit')
+                    continue
+                self.stats.record(prefix, 'miss')
+                expires = _written.pop(key, 0)
+                if expires is None or expires > time.time():
+                    self.stats.record(prefix, 'evict')
+
+    def _record_deletes(self, keys):
+        with _lock:
+            for key in keys:
+                _written.pop(key, None)
+                self.stats.record(key_prefix(key), 'delete')
+
+    @_timed
+    def get_many(self, keys, version=None):
+        keys = list(keys)
+        found = self.backend.get_many(keys, version)
+        self._record_lookups(keys, found)
+        return found
+
+    @_timed
+    def get(self, key, default=None, version=None):
+        found = self.backend.get(key, self, version)
+        self._record_lookups([key], {} if found is self else {key: found})
+        return default if found is self else found
+
+    @_timed
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        failed = self.backend.set_many(data, timeout, version)
+        self._record_sets({key: value for key, value in data.items()
+                           if key not in failed}, timeout)
+        return failed
+
+    @_timed
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.backend.set(key, value, timeout, version)
+        self._record_sets({key: value}, timeout)
+
+    @_timed
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        added = self.backend.add(key, value, timeout, version)
+        if added:
+            self._record_sets({key: value}, timeout)
+        return added
+
+    @_timed
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        return self.backend.touch(key, timeout, version)
+
+    @_timed
+    def delete_many(self, keys, version=None):
+        keys = list(keys)
+        self.backend.delete_many(keys, version)
+        self._record_deletes(keys)
+
+    @_timed
+    def delete(self, key, version=None):
+        self.backend.delete(key, version)
+        self._record_deletes([key])
+
+    @_timed
+    def incr(self, key, delta=1, version=None):
+        return self.backend.incr(key, delta, version)
+
+    def has_key(self, key, version=None):
+        return self.get(key, self, version) is not self
+
+    def clear(self):
+        self.backend.clear()
+        with _lock:
+            _written.clear()
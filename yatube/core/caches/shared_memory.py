@@ -0,0 +1,396 @@
+"""Кэш в файле, отображённом в память и общем для процессов машины.
+
+Файл LOCATION размером OPTIONS['SIZE'] байт состоит из заголовка,
+хэш-таблицы с открытой адресацией и области данных, поделённой на
+блоки по BLOCK_SIZE байт. Запись (ключ и pickle значения) хранится в
+цепочке блоков, свободные блоки связаны в список. Ячейка таблицы
+хранит хэш ключа, срок, первый блок, длину записи и отметку последнего
+обращения. Когда блоков или ячеек не хватает, вытесняется самая
+давняя по обращению из EVICTION_SAMPLES занятых ячеек, начиная со
+случайной (приближённый LRU, как в Redis), просроченные — в первую
+очередь.
+
+Дескриптор, отображение и блокировка потоков открываются одни на
+процесс и файл: Django создаёт экземпляр кэша в каждом потоке, и
+свои отображения у каждого копились бы без закрытия. Все операции
+выполняются под flock на файле (между процессами) и общей
+threading.RLock файла (между потоками процесса). После fork файл
+открывается заново: унаследованный дескриптор делит блокировку с
+родителем.
+"""
+import fcntl
+import hashlib
+import mmap
+import os
+import pickle
+import random
+import struct
+import threading
+import time
+from contextlib import contextmanager
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+MAGIC = b'YTSHMC01'
+# метка формата и геометрия: число ячеек, блоков и размер блока
+HEADER = struct.Struct('<8sIII')
+# первый свободный блок, число свободных блоков, часы обращений,
+# число записей
+STATE = struct.Struct('<IIQQ')
+# хэш ключа, срок (0 — бессрочно), отметка обращения, первый блок,
+# длина записи, состояние ячейки
+SLOT = struct.Struct('<QdQIII4x')
+NEXT = struct.Struct('<I')
+KEY_LENGTH = struct.Struct('<I')
+NIL = 0xFFFFFFFF
+EMPTY, USED = 0, 1
+MAX_LOAD = 0.75
+EVICTION_SAMPLES = 16
+
+# (путь, размер) -> SharedFile текущего процесса
+_files = {}
+_files_lock = threading.Lock()
+
+
+class SharedFile:
+    """Открытый файл кэша, общий для экземпляров в процессе."""
+
+    def __init__(self, fd, map):
+        self.fd = fd
+        self.map = map
+        self.lock = threading.RLock()
+
+
+def _forget_files():
+    # в дочернем процессе копии родительских файлов закрываются,
+    # а блокировки создаются заново: их мог держать другой поток
+    global _files_lock
+    for shared in _files.values():
+        shared.map.close()
+        os.close(shared.fd)
+    _files.clear()
+    _files_lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_forget_files)
+
+
+class SharedMemoryCache(BaseCache):
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self.path = location
+        self.size = options.get('SIZE', 64 * 1024 * 1024)
+        self.block_size = options.get('BLOCK_SIZE', 4096)
+        self.blocks = self.size // self.block_size
+        self.slots = 1 << max(self.blocks * 2 - 1, 1).bit_length()
+        self.slots_offset = HEADER.size + STATE.size
+        self.data_offset = self.slots_offset + self.slots * SLOT.size
+        self.file_size = self.data_offset + self.blocks * self.block_size
+        self.file = None
+        self.pid = None
+
+    # --- файл и блокировки ---
+
+    def _map_file(self):
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        self.fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        fcntl.flock(self.fd, fcntl.LOCK_EX)
+        try:
+            if os.fstat(self.fd).st_size != self.file_size:
+                os.ftruncate(self.fd, self.file_size)
+            self.map = mmap.mmap(self.fd, self.file_size)
+            if HEADER.unpack_from(self.map) != (
+                    MAGIC, self.slots, self.blocks, self.block_size):
+                self._format()
+        finally:
+            fcntl.flock(self.fd, fcntl.LOCK_UN)
+        return SharedFile(self.fd, self.map)
+
+    def _open(self):
+        with _files_lock:
+            key = (os.path.abspath(self.path), self.file_size)
+            if key not in _files:
+                _files[key] = self._map_file()
+            self.file = _files[key]
+        self.fd, self.map = self.file.fd, self.file.map
+        self.pid = os.getpid()
+
+    @contextmanager
+    def _locked(self):
+        if self.pid != os.getpid():
+            self._open()
+        with self.file.lock:
+            fcntl.flock(self.fd, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(self.fd, fcntl.LOCK_UN)
+
+    def _format(self):
+        self.map[self.slots_offset:self.data_offset] = bytes(
+            self.data_offset - self.slots_offset)
+        for block in range(self.blocks):
+            following = block + 1 if block + 1 < self.blocks else NIL
+            NEXT.pack_into(self.map, self._block(block), following)
+        STATE.pack_into(self.map, HEADER.size, 0, self.blocks, 0, 0)
+        HEADER.pack_into(self.map, 0, MAGIC, self.slots, self.blocks,
+                         self.block_size)
+
+    # --- заголовок, ячейки, блоки ---
+
+    def _state(self):
+        return STATE.unpack_from(self.map, HEADER.size)
+
+    def _put_state(self, free, free_count, clock, used):
+        STATE.pack_into(self.map, HEADER.size, free, free_count, clock, used)
+
+    def _tick(self):
+        free, free_count, clock, used = self._state()
+        self._put_state(free, free_count, clock + 1, used)
+        return clock + 1
+
+    def _slot(self, index):
+        return SLOT.unpack_from(
+            self.map, self.slots_offset + index * SLOT.size)
+
+    def _put_slot(self, index, *slot):
+        SLOT.pack_into(self.map, self.slots_offset + index * SLOT.size,
+                       *slot)
+
+    def _block(self, block):
+        return self.data_offset + block * self.block_size
+
+    def _read(self, block, length):
+        chunks = []
+        payload = self.block_size - NEXT.size
+        while length > 0:
+            start = self._block(block) + NEXT.size
+            chunks.append(self.map[start:start + min(length, payload)])
+            length -= payload
+            block = NEXT.unpack_from(self.map, self._block(block))[0]
+        return b''.join(chunks)
+
+    def _free_chain(self, block):
+        """Возвращает блоки записи в свободный список."""
+        free, free_count, clock, used = self._state()
+        last, count = block, 1
+        while True:
+            following = NEXT.unpack_from(self.map, self._block(last))[0]
+            if following == NIL:
+                break
+            last, count = following, count + 1
+        NEXT.pack_into(self.map, self._block(last), free)
+        self._put_state(block, free_count + count, clock, used - 1)
+
+    def _allocate(self, record):
+        """Пишет запись в свободные блоки, возвращает первый."""
+        payload = self.block_size - NEXT.size
+        count = -(-len(record) // payload)
+        free, free_count, clock, used = self._state()
+        first = block = free
+        for number in range(count):
+            following = NEXT.unpack_from(self.map, self._block(block))[0]
+            start = self._block(block) + NEXT.size
+            chunk = record[number * payload:(number + 1) * payload]
+            self.map[start:start + len(chunk)] = chunk
+            if number == count - 1:
+                NEXT.pack_into(self.map, self._block(block), NIL)
+            block = following
+        self._put_state(block, free_count - count, clock, used + 1)
+        return first
+
+    # --- хэш-таблица ---
+
+    @staticmethod
+    def _hash(key):
+        digest = hashlib.blake2b(key, digest_size=8).digest()
+        return int.from_bytes(digest, 'little') | 1
+
+    def _find(self, key, key_hash):
+        """Номер ячейки ключа или None."""
+        prefix = KEY_LENGTH.pack(len(key)) + key
+        mask = self.slots - 1
+        index = key_hash & mask
+        for _ in range(self.slots):
+            slot_hash, _, _, block, _, state = self._slot(index)
+            if state == EMPTY:
+                return None
+            if slot_hash == key_hash and self._read(
+                    block, len(prefix)) == prefix:
+                return index
+            index = (index + 1) & mask
+        return None
+
+    def _free_index(self, key_hash):
+        mask = self.slots - 1
+        index = key_hash & mask
+        while self._slot(index)[5] != EMPTY:
+            index = (index + 1) & mask
+        return index
+
+    def _remove(self, index):
+        """Освобождает запись и сдвигает назад следующие за ней ячейки
+        цепочки, чтобы в таблице не копились надгробия."""
+        self._free_chain(self._slot(index)[3])
+        mask = self.slots - 1
+        hole, index = index, (index + 1) & mask
+        while True:
+            slot = self._slot(index)
+            if slot[5] == EMPTY:
+                break
+            home = slot[0] & mask
+            if (index - home) & mask >= (index - hole) & mask:
+                self._put_slot(hole, *slot)
+                hole = index
+            index = (index + 1) & mask
+        self._put_slot(hole, 0, 0, 0, 0, 0, EMPTY)
+
+    def _evict(self):
+        """Вытесняет давнюю по обращению запись из выборки ячеек."""
+        now = time.time()
+        start = random.randrange(self.slots)
+        victim, oldest, seen = None, None, 0
+        for step in range(self.slots):
+            index = (start + step) & (self.slots - 1)
+            _, expires, stamp, _, _, state = self._slot(index)
+            if state == EMPTY:
+                continue
+            if expires and expires < now:
+                victim = index
+                break
+            if oldest is None or stamp < oldest:
+                victim, oldest = index, stamp
+            seen += 1
+            if seen == EVICTION_SAMPLES:
+                break
+        if victim is not None:
+            self._remove(victim)
+
+    def _expired(self, slot):
+        return slot[1] and slot[1] < time.time()
+
+    # --- операции под блокировкой ---
+
+    def _get(self, key):
+        """pickle значения или None."""
+        key_hash = self._hash(key)
+        index = self._find(key, key_hash)
+        if index is None:
+            return None
+        slot = self._slot(index)
+        if self._expired(slot):
+            self._remove(index)
+            return None
+        self._put_slot(index, slot[0], slot[1], self._tick(), *slot[3:])
+        record = self._read(slot[3], slot[4])
+        (key_length,) = KEY_LENGTH.unpack_from(record)
+        return record[KEY_LENGTH.size + key_length:]
+
+    def _set(self, key, pickled, expires):
+        """Записывает значение; expires — время истечения из
+        get_backend_timeout, None — бессрочно."""
+        record = KEY_LENGTH.pack(len(key)) + key + pickled
+        needed = -(-len(record) // (self.block_size - NEXT.size))
+        key_hash = self._hash(key)
+        index = self._find(key, key_hash)
+        if index is not None:
+            self._remove(index)
+        if needed > self.blocks or (expires and expires < time.time()):
+            return False
+        while True:
+            _, free_count, _, used = self._state()
+            if free_count >= needed and used < self.slots * MAX_LOAD:
+                break
+            self._evict()
+        first = self._allocate(record)
+        self._put_slot(self._free_index(key_hash), key_hash, expires or 0.0,
+                       self._tick(), first, len(record), USED)
+        return True
+
+    # --- API кэша Django ---
+
+    def _key(self, key, version):
+        key = self.make_key(key, version)
+        self.validate_key(key)
+        return key.encode()
+
+    def _dumps(self, value):
+        return pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+
+    def get(self, key, default=None, version=None):
+        key = self._key(key, version)
+        with self._locked():
+            pickled = self._get(key)
+        return default if pickled is None else pickle.loads(pickled)
+
+    def get_many(self, keys, version=None):
+        found = {}
+        with self._locked():
+            for key in keys:
+                pickled = self._get(self._key(key, version))
+                if pickled is not None:
+                    found[key] = pickled
+        return {key: pickle.loads(pickled) for key, pickled in found.items()}
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        pickled = self._dumps(value)
+        expires = self.get_backend_timeout(timeout)
+        with self._locked():
+            self._set(key, pickled, expires)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        records = {key: (self._key(key, version), self._dumps(value))
+                   for key, value in data.items()}
+        expires = self.get_backend_timeout(timeout)
+        with self._locked():
+            return [key for key, record in records.items()
+                    if not self._set(*record, expires)]
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        pickled = self._dumps(value)
+        expires = self.get_backend_timeout(timeout)
+        with self._locked():
+            if self._get(key) is not None:
+                return False
+            return self._set(key, pickled, expires)
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        expires = self.get_backend_timeout(timeout)
+        with self._locked():
+            index = self._find(key, self._hash(key))
+            if index is None or self._expired(self._slot(index)):
+                return False
+            slot = list(self._slot(index))
+            slot[1] = expires or 0.0
+            self._put_slot(index, *slot)
+            return True
+
+    def incr(self, key, delta=1, version=None):
+        key = self._key(key, version)
+        with self._locked():
+            pickled = self._get(key)
+            if pickled is None:
+                raise ValueError("Key '%s' not found" % key.decode())
+            index = self._find(key, self._hash(key))
+            expires = self._slot(index)[1]
+            value = pickle.loads(pickled) + delta
+            self._set(key, self._dumps(value), expires or None)
+        return value
+
+    def delete(self, key, version=None):
+        key = self._key(key, version)
+        with self._locked():
+            index = self._find(key, self._hash(key))
+            if index is not None:
+                self._remove(index)
+
+    def has_key(self, key, version=None):
+        return self.get(key, self, version) is not self
+
+    def clear(self):
+        with self._locked():
+            self._format()
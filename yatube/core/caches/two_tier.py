@@ -0,0 +1,288 @@
+"""Двухуровневый кэш: LRU в памяти процесса поверх общего кэша.
+
+Чтение сначала ищет ключ в локальном LRU (не больше MAX_ENTRIES
+записей, каждая живёт не дольше LOCAL_TIMEOUT секунд), затем в общем
+кэше SHARED — другом алиасе из settings.CACHES. Запись идёт в общий
+кэш и объявляет изменённые ключи в канале инвалидации: журнале в
+SQLite-файле CHANNEL, общем для процессов одной машины. Номер
+последней записи журнала дублируется в соседнем файле, отображённом
+в память, поэтому чтение из LRU проверяет свежесть одним сравнением
+чисел и обращается к журналу только после чужих записей.
+
+Django создаёт экземпляр бэкенда на каждый поток, LRU же один на
+процесс, как хранилище LocMemCache.
+
+    CACHES = {
+        'default': {
+            'BACKEND': 'core.caches.two_tier.TwoTierCache',
+            'OPTIONS': {'SHARED': 'shared', 'CHANNEL': '/tmp/yatube.log'},
+        },
+        'shared': {...},
+    }
+"""
+import mmap
+import os
+import pickle
+import sqlite3
+import struct
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+ALL_KEYS = '*'
+# сколько последних записей журнала хранить; отставший сильнее
+# процесс очищает свой LRU целиком. Старые записи удаляются не при
+# каждой записи, а раз в PRUNE_INTERVAL записей журнала
+LOG_SIZE = 10000
+PRUNE_INTERVAL = 1000
+GENERATION = struct.Struct('q')
+
+_tiers = {}
+_tiers_lock = threading.Lock()
+
+
+class InvalidationChannel:
+    """Журнал изменённых ключей, общий для процессов машины."""
+
+    def __init__(self, path):
+        self.path = path
+        self.local = threading.local()
+        self.generation = None
+
+    def _open(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        connection = sqlite3.connect(self.path, timeout=5,
+                                     isolation_level=None)
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute(
+            'CREATE TABLE IF NOT EXISTS invalidation (id INTEGER PRIMARY '
+            'KEY AUTOINCREMENT, origin TEXT, key TEXT)')
+        if self.generation is None:
+            with open(self.path + '.gen', 'ab') as generation:
+                if generation.tell() < GENERATION.size:
+                    generation.write(bytes(GENERATION.size))
+            with open(self.path + '.gen', 'r+b') as generation:
+                self.generation = mmap.mmap(generation.fileno(),
+                                            GENERATION.size)
+        return connection
+
+    @property
+    def connection(self):
+        # соединения SQLite не переносятся через fork и между потоками
+        connection = getattr(self.local, 'connection', None)
+        if connection is None or self.local.pid != os.getpid():
+            connection = self.local.connection = self._open()
+            self.local.pid = os.getpid()
+        return connection
+
+    def last_id(self):
+        if self.generation is None:
+            self.connection
+        return GENERATION.unpack_from(self.generation)[0]
+
+    def publish(self, origin, keys):
+        connection = self.connection
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            connection.executemany(
+                'INSERT INTO invalidation (origin, key) VALUES (?, ?)',
+                [(origin, key) for key in keys])
+            last_id = connection.execute(
+                'SELECT max(id) FROM invalidation').fetchone()[0]
+            # номера записей общие для процессов, так что чистит журнал
+            # тот, чья запись перешла очередную границу PRUNE_INTERVAL
+            if last_id // PRUNE_INTERVAL != (
+                    last_id - len(keys)) // PRUNE_INTERVAL:
+                connection.execute(
+                    'DELETE FROM invalidation WHERE id <= ?',
+                    (last_id - LOG_SIZE,))
+            GENERATION.pack_into(self.generation, 0, last_id)
+        finally:
+            connection.execute('COMMIT')
+
+    def read(self, origin, after):
+        """Ключи, изменённые другими процессами после записи after, и
+        номер последней записи. None вместо ключей — журнал уже
+        обрезан, и сбросить нужно всё."""
+        rows = self.connection.execute(
+            'SELECT id, origin, key FROM invalidation WHERE id > ? '
+            'ORDER BY id', (after,)).fetchall()
+        if not rows:
+            return [], after
+        if after and rows[0][0] != after + 1:
+            return None, rows[-1][0]
+        keys = [key for _, source, key in rows if source != origin]
+        return keys, rows[-1][0]
+
+
+class LocalTier:
+    """LRU процесса и его позиция в журнале инвалидации."""
+
+    def __init__(self, channel, max_entries, timeout):
+        self.channel = channel
+        self.max_entries = max_entries
+        self.timeout = timeout
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+        self.pid = None
+        self.sync()
+
+    def sync(self):
+        """Выбрасывает ключи, изменённые другими процессами."""
+        if self.pid != os.getpid():
+            # после fork у процесса своя память и своё имя в журнале
+            self.pid = os.getpid()
+            self.origin = uuid.uuid4().hex
+            self.entries.clear()
+            self.seen = self.channel.last_id()
+            return
+        if self.channel.last_id() == self.seen:
+            return
+        keys, self.seen = self.channel.read(self.origin, self.seen)
+        if keys is None or ALL_KEYS in keys:
+            self.entries.clear()
+        else:
+            for key in keys:
+                self.entries.pop(key, None)
+
+    def get(self, key):
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        expires, value = entry
+        if expires < time.monotonic():
+            del self.entries[key]
+            return None
+        self.entries.move_to_end(key)
+        return value
+
+    def set(self, key, value, timeout):
+        if timeout is None or timeout > self.timeout:
+            timeout = self.timeout
+        if timeout <= 0:
+            self.entries.pop(key, None)
+            return
+        # храним pickle, чтобы изменения полученного объекта не
+        # попадали в кэш, как в LocMemCache
+        self.entries[key] = (time.monotonic() + timeout,
+                             pickle.dumps(value, pickle.HIGHEST_PROTOCOL))
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def changed(self, keys, values=None, timeout=None):
+        """Объявляет об изменении ключей и запоминает новые значения."""
+        self.sync()
+        self.channel.publish(self.origin, keys)
+        self.sync()
+        for key in keys:
+            self.entries.pop(key, None)
+        for key, value in (values or {}).items():
+            self.set(key, value, timeout)
+
+
+class TwoTierCache(BaseCache):
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self.shared_alias = options['SHARED']
+        channel = options['CHANNEL']
+        with _tiers_lock:
+            if channel not in _tiers:
+                _tiers[channel] = LocalTier(
+                    InvalidationChannel(channel), self._max_entries,
+                    options.get('LOCAL_TIMEOUT', 60))
+        self.local = _tiers[channel]
+
+    @property
+    def shared(self):
+        return caches[self.shared_alias]
+
+    def _local_keys(self, keys, version):
+        local_keys = {}
+        for key in keys:
+            local_keys[key] = self.make_key(key, version)
+            self.validate_key(local_keys[key])
+        return local_keys
+
+    def get_many(self, keys, version=None):
+        local_keys = self._local_keys(keys, version)
+        found = {}
+        with self.local.lock:
+            self.local.sync()
+            seen = self.local.seen
+            for key, local_key in local_keys.items():
+                pickled = self.local.get(local_key)
+                if pickled is not None:
+                    found[key] = pickle.loads(pickled)
+        missing = [key for key in local_keys if key not in found]
+        if missing:
+            shared = self.shared.get_many(missing, version)
+            with self.local.lock:
+                self.local.sync()
+                # если за время чтения ключи менялись, прочитанное могло
+                # устареть ещё до записи в LRU
+                if self.local.seen == seen:
+                    timeout = self.local.timeout
+                    for key, value in shared.items():
+                        self.local.set(local_keys[key], value, timeout)
+            found.update(shared)
+        return found
+
+    def get(self, key, default=None, version=None):
+        return self.get_many([key], version).get(key, default)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        failed = self.shared.set_many(data, timeout, version)
+        local_keys = self._local_keys(data, version)
+        with self.local.lock:
+            self.local.changed(
+                list(local_keys.values()),
+                {local_keys[key]: value for key, value in data.items()
+                 if key not in failed},
+                self.get_backend_timeout(timeout))
+        return failed
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.set_many({key: value}, timeout, version)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        added = self.shared.add(key, value, timeout, version)
+        if added:
+            local_key = self.make_key(key, version)
+            with self.local.lock:
+                self.local.changed([local_key], {local_key: value},
+                                   self.get_backend_timeout(timeout))
+        return added
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        return self.shared.touch(key, timeout, version)
+
+    def delete_many(self, keys, version=None):
+        keys = list(keys)
+        self.shared.delete_many(keys, version)
+        with self.local.lock:
+            self.local.changed(
+                list(self._local_keys(keys, version).values()))
+
+    def delete(self, key, version=None):
+        self.delete_many([key], version)
+
+    def incr(self, key, delta=1, version=None):
+        value = self.shared.incr(key, delta, version)
+        with self.local.lock:
+            self.local.changed([self.make_key(key, version)])
+        return value
+
+    def has_key(self, key, version=None):
+        return self.get(key, self, version) is not self
+
+    def clear(self):
+        self.shared.clear()
+        with self.local.lock:
+            self.local.changed([ALL_KEYS])
+            self.local.entries.clear()
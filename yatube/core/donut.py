@@ -0,0 +1,50 @@
+"""Дырки в закэшированных страницах (donut caching).
+
+Тело страницы кэшируется одно на URL для всех пользователей, а части,
+зависящие от пользователя (шапка, сообщения, кнопки подписки, форма
+с CSRF-токеном), выводятся тегом {% hole 'имя' аргумент=значение %}.
+Пока страница рендерится для кэша, тег оставляет вместо части метку
+с именем дырки и её аргументами; fill() заполняет метки для каждого
+запроса функциями, зарегистрированными через register_hole. Вне
+кэшируемых view тег сразу выводит заполненную часть.
+
+Аргументы дырок попадают в метку как JSON, поэтому передавать в них
+нужно простые значения: числа, строки, id вместо объектов.
+"""
+import base64
+import json
+import re
+
+from django.utils.safestring import mark_safe
+
+HOLES = {}
+MARKER = '<!--hole:{}:{}-->'
+MARKER_RE = re.compile(r'<!--hole:(\w+):([\w=-]*)-->')
+
+
+def register_hole(name):
+    """Регистрирует функцию render(request, **kwargs) -> str."""
+    def decorator(render):
+        HOLES[name] = render
+        return render
+    return decorator
+
+
+def _render(request, name, kwargs):
+    return HOLES[name](request, **kwargs)
+
+
+def hole(request, name, kwargs):
+    if getattr(request, 'donut', False):
+        payload = base64.urlsafe_b64encode(
+            json.dumps(kwargs, separators=(',', ':')).encode()).decode()
+        return mark_safe(MARKER.format(name, payload))
+    return mark_safe(_render(request, name, kwargs))
+
+
+def fill(request, content):
+    """Заменяет метки в теле страницы частями для этого запроса."""
+    def replace(match):
+        kwargs = json.loads(base64.urlsafe_b64decode(match.group(2)))
+        return _render(request, match.group(1), kwargs)
+    return MARKER_RE.sub(replace, content)
@@ -0,0 +1,14 @@
+"""Общие дырки страниц: шапка с пользователем и flash-сообщения."""
+from django.template.loader import render_to_string
+
+from .donut import register_hole
+
+
+@register_hole('header')
+def header(request):
+    return render_to_string('includes/header.html', request=request)
+
+
+@register_hole('messages')
+def messages(request):
+    return render_to_string('includes/messages.html', request=request)
@@ -0,0 +1,97 @@
+"""Карта идентичности на время обработки одного запроса.
+
+Объект, найденный по ключу (модель, запрос и условия поиска),
+загружается из базы один раз за запрос: повторный поиск по тем же
+условиям вернёт тот же экземпляр, а поиск в простом менеджере модели —
+и экземпляр, найденный по pk любым запросом. Поиск в queryset с
+фильтрами, only() или select_related попадает в карту, только если
+тот же запрос уже выполнялся, — фильтры никогда не пропускаются. Карту
+создаёт и очищает IdentityMapMiddleware; вне запроса функции модуля
+просто обращаются к базе.
+"""
+from contextvars import ContextVar
+
+from django.core.exceptions import EmptyResultSet
+from django.http import Http404
+from django.shortcuts import _get_queryset
+
+_identity_map = ContextVar('identity_map', default=None)
+
+
+class IdentityMap:
+    def __init__(self):
+        self.objects = {}
+
+    @staticmethod
+    def key(model, lookup, scope=''):
+        pk_name = model._meta.pk.name
+        fields = (('pk' if name == pk_name else name, value)
+                  for name, value in lookup.items())
+        return model._meta.label_lower, scope, tuple(sorted(fields))
+
+    @staticmethod
+    def scope(queryset):
+        """'' для простого менеджера модели, иначе SQL queryset: его
+        фильтры, only() и select_related входят в ключ."""
+        sql = str(queryset.query)
+        if sql == str(queryset.model._base_manager.all().query):
+            return ''
+        return sql
+
+    def add(self, obj):
+        """Регистрирует объект по pk и возвращает экземпляр из карты.
+        Полностью загруженный объект заменяет урезанный only()."""
+        key = self.key(type(obj), {'pk': obj.pk})
+        known = self.objects.get(key)
+        if known is None or (known.get_deferred_fields()
+                             and not obj.get_deferred_fields()):
+            self.objects[key] = known = obj
+        return known
+
+    def get(self, klass, **lookup):
+        queryset = _get_queryset(klass)
+        try:
+            scope = self.scope(queryset)
+        except EmptyResultSet:
+            return queryset.get(**lookup)
+        key = self.key(queryset.model, lookup, scope)
+        known = self.objects.get(key)
+        # простой менеджер должен вернуть полный объект
+        if known is None or not scope and known.get_deferred_fields():
+            self.objects[key] = known = self.add(queryset.get(**lookup))
+        return known
+
+
+def current():
+    """Карта идентичности текущего запроса или None."""
+    return _identity_map.get()
+
+
+def get_object(klass, **lookup):
+    identity = current()
+    if identity is None:
+        return _get_queryset(klass).get(**lookup)
+    return identity.get(klass, **lookup)
+
+
+def get_object_or_404(klass, **lookup):
+    """Как django.shortcuts.get_object_or_404, но через карту
+    идентичности запроса."""
+    queryset = _get_queryset(klass)
+    try:
+        return get_object(queryset, **lookup)
+    except queryset.model.DoesNotExist:
+        raise Http404(
+            f'No {queryset.model._meta.object_name} matches the given query.')
+
+
+class IdentityMapMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = _identity_map.set(IdentityMap())
+        try:
+            return self.get_response(request)
+        finally:
+            _identity_map.reset(token)
@@ -0,0 +1,72 @@
+import multiprocessing
+import os
+import statistics
+import tempfile
+import time
+
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management.base import BaseCommand
+
+from core.caches.shared_memory import SharedMemoryCache
+
+SIZES = {'100 Б': 100, '30 КБ': 30 * 1024}
+
+
+def write_in_other_process(backend, keys):
+    for key in keys:
+        backend.set(key, key)
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает SharedMemoryCache с LocMemCache и FileBasedCache: '
+            'время set и get и доступность записей другому процессу.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--keys', type=int, default=500)
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def backends(self, directory):
+        params = {'OPTIONS': {'MAX_ENTRIES': 100000}}
+        yield 'locmem', LocMemCache('bench', params)
+        yield 'file', FileBasedCache(os.path.join(directory, 'file'), params)
+        yield 'shared_memory', SharedMemoryCache(
+            os.path.join(directory, 'shared.mmap'),
+            {'OPTIONS': {'SIZE': 64 * 1024 * 1024}})
+
+    def measure(self, operation, keys, repeat):
+        """Медиана времени одной операции в микросекундах."""
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            for key in keys:
+                operation(key)
+            timings.append((time.perf_counter() - started) / len(keys))
+        return statistics.median(timings) * 1e6
+
+    def shared_hits(self, backend, keys):
+        """Сколько записей другого процесса видит этот."""
+        keys = [f'{key}:other' for key in keys]
+        worker = multiprocessing.get_context('fork').Process(
+            target=write_in_other_process, args=(backend, keys))
+        worker.start()
+        worker.join()
+        return sum(backend.get(key) is not None for key in keys)
+
+    def handle(self, *args, **options):
+        keys = [f'bench:{number}' for number in range(options['keys'])]
+        repeat = options['repeat']
+        self.stdout.write(f'{"бэкенд":<14} {"размер":<7} {"set, мкс":>10} '
+                          f'{"get, мкс":>10} {"в другом процессе":>18}')
+        with tempfile.TemporaryDirectory() as directory:
+            for name, backend in self.backends(directory):
+                for size_name, size in SIZES.items():
+                    backend.clear()
+                    value = os.urandom(size)
+                    set_time = self.measure(
+                        lambda key: backend.set(key, value), keys, repeat)
+                    get_time = self.measure(backend.get, keys, repeat)
+                    hits = self.shared_hits(backend, keys)
+                    self.stdout.write(
+                        f'{name:<14} {size_name:<7} {set_time:10.1f} '
+                        f'{get_time:10.1f} {hits:>10}/{len(keys)}')
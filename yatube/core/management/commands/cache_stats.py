@@ -0,0 +1,34 @@
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+
+from core.cache_stats import summary
+
+
+class Command(BaseCommand):
+    help = ('Печатает статистику кэша по префиксам ключей и view: '
+            'попадания, промахи, записи, вытеснения, байты и время.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reset', action='store_true',
+                            help='Обнулить статистику.')
+
+    def handle(self, *args, **options):
+        stats = getattr(cache, 'stats', None)
+        if stats is None:
+            raise CommandError('Кэш default не InstrumentedCache.')
+        if options['reset']:
+            stats.reset()
+            return
+        self.stdout.write(
+            f'{"префикс":<28} {"view":<22} {"hit":>7} {"miss":>7} '
+            f'{"доля":>5} {"set":>6} {"evict":>6} {"КБ":>8} '
+            f'{"ср. мс":>7} {"макс. мс":>8}')
+        for line in summary(stats.rows()):
+            ratio = ('-' if line['hit_ratio'] is None
+                     else f'{line["hit_ratio"]:.0%}')
+            self.stdout.write(
+                f'{line["prefix"]:<28} {line["view"]:<22} '
+                f'{line["hit"]:>7} {line["miss"]:>7} {ratio:>5} '
+                f'{line["set"]:>6} {line["evict"]:>6} '
+                f'{line["bytes"] / 1024:>8.1f} {line["avg_ms"]:>7.2f} '
+                f'{line["max_ms"]:>8.2f}')
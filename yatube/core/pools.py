@@ -0,0 +1,90 @@
+"""Пулы процессов для тяжёлой работы вне процесса, обслуживающего
+запросы.
+
+ProcessPool создаёт ProcessPoolExecutor при первой задаче. Процессы
+запускаются через forkserver: fork из потока, обслуживающего запросы,
+унаследовал бы блокировки и соединения других потоков. Если процесс
+пула погиб (например, его убил OOM killer), executor больше не
+принимает задач; такой пул выбрасывается и создаётся заново, как и
+пул с зависшим процессом, результата которого не дождались.
+
+Процесс forkserver ничего не наследует от родителя: задачам, которым
+нужен Django, initializer setup_django настраивает его с переданными
+настройками родителя, например тестовыми базой и MEDIA_ROOT.
+"""
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+import django
+from django.conf import settings
+
+
+def setup_django(overrides):
+    """initializer: настраивает Django в процессе пула, подменив
+    настройки из overrides."""
+    for name, value in overrides.items():
+        setattr(settings, name, value)
+    django.setup()
+
+
+def current_settings(names=(), prefixes=()):
+    """Текущие значения настроек names и настроек, начинающихся
+    с prefixes, для setup_django."""
+    return {name: getattr(settings, name) for name in dir(settings)
+            if name in names or name.startswith(tuple(prefixes))}
+
+
+class ProcessPool:
+    def __init__(self, workers, initializer=None, initargs=None):
+        # workers — имя настройки с числом процессов; initargs —
+        # функция, возвращающая аргументы initializer при создании пула
+        self.workers = workers
+        self.initializer = initializer
+        self.initargs = initargs
+        self.executor = None
+        self.lock = threading.Lock()
+
+    def _executor(self):
+        with self.lock:
+            if self.executor is None:
+                self.executor = ProcessPoolExecutor(
+                    max_workers=getattr(settings, self.workers),
+                    mp_context=multiprocessing.get_context('forkserver'),
+                    initializer=self.initializer,
+                    initargs=self.initargs() if self.initargs else ())
+            return self.executor
+
+    def discard(self, executor):
+        """Выбрасывает executor; следующая задача создаст новый."""
+        with self.lock:
+            if self.executor is executor:
+                self.executor = None
+        # зависший процесс сам не завершится
+        for process in list((executor._processes or {}).values()):
+            process.terminate()
+        executor.shutdown(wait=False)
+
+    def submit(self, fn, *args):
+        """Как ProcessPoolExecutor.submit, но пул, сломанный прошлыми
+        задачами, сначала создаётся заново."""
+        executor = self._executor()
+        try:
+            future = executor.submit(fn, *args)
+        except BrokenProcessPool:
+            self.discard(executor)
+            executor = self._executor()
+            future = executor.submit(fn, *args)
+        future.executor = executor
+        return future
+
+    def result(self, future, timeout=None):
+        """Результат задачи. Если её процесс погиб или не уложился
+        в timeout секунд, пул выбрасывается, а исключение
+        (BrokenProcessPool или TimeoutError) пробрасывается."""
+        try:
+            return future.result(timeout)
+        except (BrokenProcessPool, TimeoutError):
+            self.discard(future.executor)
+            raise
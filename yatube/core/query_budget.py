@@ -0,0 +1,119 @@
+"""Бюджет SQL-запросов на обработку одного запроса к view.
+
+QueryBudgetMiddleware записывает запросы, выполненные во время
+обработки, и сравнивает их число с бюджетом view: из декоратора
+query_budget или settings.QUERY_BUDGET_DEFAULT. При превышении в лог
+пишутся отпечатки запросов (SQL без значений параметров) с местами
+вызова, включая строку шаблона, а при settings.QUERY_BUDGET_STRICT
+поднимается QueryBudgetExceeded: так N+1 в шаблонах ловится тестами.
+
+Место вызова ищется обходом стека, поэтому при DEBUG и в строгом режиме
+оно запоминается для каждого запроса, а иначе — только для запросов
+сверх бюджета.
+"""
+import logging
+import os
+import re
+import sys
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.db import connection
+
+logger = logging.getLogger(__name__)
+
+IN_LIST = re.compile(r'IN \((?:%s, )*%s\)')
+CALL_SITE_DEPTH = 4
+# аргументы execute_wrapper: такие функции местом вызова не считаются
+WRAPPER_ARGS = ('execute', 'sql', 'params', 'many', 'context')
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+def query_budget(limit):
+    """Задаёт view собственный бюджет запросов."""
+    def decorator(view):
+        view.query_budget = limit
+        return view
+    return decorator
+
+
+def fingerprint(sql):
+    return IN_LIST.sub('IN (...)', sql)
+
+
+def _call_site():
+    """Строки проекта и шаблонов, из которых выполнен запрос."""
+    site = []
+    frame = sys._getframe(2)
+    while frame and len(site) < CALL_SITE_DEPTH:
+        code = frame.f_code
+        if code is QueryBudgetMiddleware.__call__.__code__:
+            break
+        if code.co_varnames[:code.co_argcount][-5:] == WRAPPER_ARGS:
+            frame = frame.f_back
+            continue
+        node = frame.f_locals.get('self')
+        if code.co_name == 'render_annotated' and hasattr(node, 'origin'):
+            site.append(f'{node.origin.template_name}:{node.token.lineno}')
+        elif (code.co_filename.startswith(settings.BASE_DIR)
+              and os.sep + 'site-packages' + os.sep not in code.co_filename):
+            path = os.path.relpath(code.co_filename, settings.BASE_DIR)
+            site.append(f'{path}:{frame.f_lineno} in {code.co_name}')
+        frame = frame.f_back
+    return tuple(site)
+
+
+class QueryRecorder:
+    """execute_wrapper, запоминающий отпечатки и места вызова запросов
+    при обработке request."""
+
+    def __init__(self, request):
+        self.request = request
+        self.trace = settings.DEBUG or settings.QUERY_BUDGET_STRICT
+        self.count = 0
+        self.fingerprints = Counter()
+        self.call_sites = defaultdict(Counter)
+
+    def __call__(self, execute, sql, params, many, context):
+        key = fingerprint(sql)
+        self.count += 1
+        self.fingerprints[key] += 1
+        if self.trace or self.count > self.request.query_budget:
+            self.call_sites[key][_call_site()] += 1
+        return execute(sql, params, many, context)
+
+    def report(self):
+        lines = []
+        for key, count in self.fingerprints.most_common():
+            lines.append(f'{count} x {key}')
+            for site, calls in self.call_sites[key].most_common():
+                lines.append(f'    {calls} x ' + ' <- '.join(site))
+        return '\n'.join(lines)
+
+
+class QueryBudgetMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.query_budget = settings.QUERY_BUDGET_DEFAULT
+        recorder = QueryRecorder(request)
+        with connection.execute_wrapper(recorder):
+            response = self.get_response(request)
+        if recorder.count > request.query_budget:
+            message = (
+                f'{request.method} {request.path}: {recorder.count} '
+                f'SQL-запросов при бюджете {request.query_budget}\n'
+                f'{recorder.report()}'
+            )
+            if settings.QUERY_BUDGET_STRICT:
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.query_budget = getattr(
+            view_func, 'query_budget', request.query_budget)
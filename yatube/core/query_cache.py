@@ -0,0 +1,155 @@
+"""Кэш результатов запросов ORM с инвалидацией по таблицам.
+
+Кэширование включается явно: cached(queryset) возвращает копию
+queryset, результаты которой (список объектов, exists(), count())
+берутся из кэша по ключу из базы, SQL, параметров и версий всех
+таблиц, упомянутых в SQL. Версия таблицы — тег core.cache_tags
+'table:<имя>'.
+
+Кэшируются только запросы к таблицам из settings.QUERY_CACHE_TABLES,
+остальные cached() выполняет как обычно. Версии меняет
+execute_wrapper, который CoreConfig ставит на каждое соединение с
+базой: INSERT, UPDATE или DELETE в такую таблицу — из save(), delete(),
+QuerySet.update(), bulk_create() или каскадного удаления — меняет её
+версию, и следующее чтение пойдёт в базу. Записи в другие таблицы
+(сессии, ленты, комментарии) и UPDATE только столбцов из
+settings.QUERY_CACHE_IGNORED_COLUMNS (вроде auth_user.last_login)
+версий не меняют.
+
+Пока транзакция соединения не завершена, записанные в ней таблицы
+читаются мимо кэша: незафиксированные данные не должны попасть к
+другим процессам, даже если транзакцию откатят.
+"""
+import hashlib
+import re
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import EmptyResultSet
+from django.db import connections
+
+from . import cache_tags
+
+TIMEOUT = 60 * 60
+QUERY_KEY = 'query:{}'
+TABLE_TAG = 'table:{}'
+WRITE_RE = re.compile(
+    r'^\s*(?:INSERT\s+INTO|UPDATE|DELETE\s+FROM)\s+["`]?(\w+)', re.I)
+TABLES_RE = re.compile(r'\b(?:FROM|JOIN)\s+["`]?(\w+)', re.I)
+SET_RE = re.compile(r'\bSET\s+(.*?)\s+WHERE\b', re.I | re.S)
+COLUMN_RE = re.compile(r'["`]?(\w+)["`]?\s*=')
+
+_classes = {}
+
+
+def track_writes(execute, sql, params, many, context):
+    """execute_wrapper: меняет версию таблицы после записи в неё."""
+    result = execute(sql, params, many, context)
+    match = WRITE_RE.match(sql)
+    if match and _tracked(match.group(1), sql):
+        table = match.group(1)
+        connection = context['connection']
+        if connection.in_atomic_block:
+            _dirty(connection).add(table)
+        cache_tags.bump(TABLE_TAG.format(table))
+    return result
+
+
+def _tracked(table, sql):
+    """Меняет ли запись sql в table результаты кэшируемых запросов."""
+    if table not in settings.QUERY_CACHE_TABLES:
+        return False
+    ignored = settings.QUERY_CACHE_IGNORED_COLUMNS.get(table)
+    columns = SET_RE.search(sql)
+    if not ignored or not columns:
+        return True
+    return not set(COLUMN_RE.findall(columns.group(1))) <= set(ignored)
+
+
+def install(connection, **kwargs):
+    """Обработчик connection_created."""
+    if track_writes not in connection.execute_wrappers:
+        connection.execute_wrappers.append(track_writes)
+
+
+def _dirty(connection):
+    """Таблицы, записанные в текущей транзакции соединения."""
+    if not hasattr(connection, 'query_cache_dirty'):
+        connection.query_cache_dirty = set()
+    return connection.query_cache_dirty
+
+
+def _key(queryset, kind):
+    """Ключ результата или None, если запрос кэшировать нельзя."""
+    if queryset.query.select_for_update:
+        return None
+    connection = connections[queryset.db]
+    try:
+        sql, params = queryset.query.get_compiler(queryset.db).as_sql()
+    except EmptyResultSet:
+        return None
+    tables = set(TABLES_RE.findall(sql))
+    if not tables <= set(settings.QUERY_CACHE_TABLES):
+        # записи в эти таблицы не меняют версий
+        return None
+    dirty = _dirty(connection)
+    if not connection.in_atomic_block:
+        dirty.clear()
+    elif tables & dirty:
+        return None
+    versions = cache_tags.versions(
+        TABLE_TAG.format(table) for table in tables)
+    digest = hashlib.md5(repr((
+        kind, queryset.db, connection.settings_dict['NAME'],
+        queryset._iterable_class.__name__, sql, params,
+        sorted(versions.items()))).encode()).hexdigest()
+    return QUERY_KEY.format(digest)
+
+
+def _cached_result(queryset, kind, compute):
+    key = _key(queryset, kind)
+    if key is None:
+        return compute()
+    found = cache.get(key)
+    if found is None:
+        # кортеж, чтобы отличить закэшированный None от промаха
+        found = (compute(),)
+        cache.set(key, found, queryset.cache_timeout)
+    return found[0]
+
+
+class CachedQuerySetMixin:
+    cache_timeout = TIMEOUT
+
+    def _clone(self):
+        clone = super()._clone()
+        clone.cache_timeout = self.cache_timeout
+        return clone
+
+    def _fetch_all(self):
+        if self._result_cache is None:
+            self._result_cache = _cached_result(
+                self, 'all', lambda: list(self._iterable_class(self)))
+        super()._fetch_all()
+
+    def exists(self):
+        if self._result_cache is not None:
+            return super().exists()
+        return _cached_result(self, 'exists', super().exists)
+
+    def count(self):
+        if self._result_cache is not None:
+            return super().count()
+        return _cached_result(self, 'count', super().count)
+
+
+def cached(queryset, timeout=TIMEOUT):
+    """Копия queryset (или менеджера), результаты которой кэшируются."""
+    queryset = queryset.all()
+    klass = type(queryset)
+    if klass not in _classes:
+        _classes[klass] = type(f'Cached{klass.__name__}',
+                               (CachedQuerySetMixin, klass), {})
+    queryset.__class__ = _classes[klass]
+    queryset.cache_timeout = timeout
+    return queryset
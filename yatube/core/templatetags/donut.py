@@ -0,0 +1,10 @@
+from django import template
+
+from core import donut
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def hole(context, name, **kwargs):
+    return donut.hole(context.get('request'), name, kwargs)
@@ -0,0 +1,28 @@
+from django.test import override_settings
+from django.urls import URLPattern, URLResolver
+
+
+def iter_patterns(patterns, namespace=None):
+    """Именованные URL-шаблоны с их view, включая вложенные."""
+    for pattern in patterns:
+        if isinstance(pattern, URLResolver):
+            yield from iter_patterns(
+                pattern.url_patterns, pattern.namespace or namespace)
+        elif isinstance(pattern, URLPattern) and pattern.name:
+            name = f'{namespace}:{pattern.name}' if namespace else pattern.name
+            yield name, pattern.callback
+
+
+class QueryBudgetTestMixin:
+    """Проверки бюджета SQL-запросов для TestCase.
+
+    Запросы выполняются в строгом режиме QueryBudgetMiddleware, поэтому
+    превышение бюджета view падает с QueryBudgetExceeded, в сообщении
+    которого перечислены запросы и строки шаблонов, откуда они пришли.
+    """
+
+    def assertWithinBudget(self, address, method='get', data=None,
+                           client=None):
+        client = client or self.client
+        with override_settings(QUERY_BUDGET_STRICT=True):
+            return getattr(client, method)(address, data)
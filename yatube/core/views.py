@@ -1,5 +1,10 @@
+from django.contrib.admin.views.decorators import staff_member_required
+from django.core.cache import cache
+from django.http import Http404, JsonResponse
 from django.shortcuts import render
 
+from .cache_stats import summary
+
 
 def page_not_found(request, exception):
     # Переменная exception содержит отладочную информацию;
@@ -14,3 +19,11 @@ def csrf_failure(request, reason=''):
 
 def internal_error(request):
     return render(request, 'core/500.html')
+
+
+@staff_member_required
+def cache_stats(request):
+    stats = getattr(cache, 'stats', None)
+    if stats is None:
+        raise Http404('Кэш default не InstrumentedCache.')
+    return JsonResponse({'stats': summary(stats.rows())})
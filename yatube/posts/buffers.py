@@ -0,0 +1,184 @@
+"""Лента подписок, собранная из буферов последних постов авторов.
+
+Для каждого автора в кэше лежит ограниченный список его последних
+постов: плоский массив пар (время публикации в микросекундах, id).
+Страница ленты собирается k-путевым слиянием буферов авторов,
+на которых подписан пользователь. Холодный буфер заполняется одним
+запросом по автору и живёт BUFFER_TIMEOUT секунд, а страницы глубже,
+чем покрывают буферы, читаются обычным SQL-запросом.
+
+Новый или удалённый пост правит буфер автора на месте после фиксации
+транзакции. Чтобы конкурирующие записи и заполнение холодного буфера
+не затирали друг друга, у буфера автора есть версия — счётчик в кэше,
+который каждая запись увеличивает атомарным incr. Буфер хранится с
+версией, которую он отражает, и читается, только пока она совпадает
+с текущей. Запись правит буфер, лишь если он был ровно на версию
+старше, иначе оставляет его устаревшим, и чтение заполнит его заново.
+"""
+import heapq
+import time
+from array import array
+
+from django.core.cache import cache
+from django.db import transaction
+
+from .consts import AUTHOR_BUFFER_SIZE, BUFFER_TIMEOUT
+from .models import Follow, Post
+
+BUFFER_KEY = 'posts:author_buffer:{}'
+VERSION_KEY = 'posts:author_buffer_version:{}'
+
+
+def _key(post):
+    return int(post.pub_date.timestamp() * 1000000), post.pk
+
+
+def _pack(version, rows, complete):
+    packed = array('q')
+    for stamp, pk in rows:
+        packed.extend((stamp, pk))
+    return version, complete, packed.tobytes()
+
+
+def _unpack(raw):
+    _, complete, data = raw
+    packed = array('q')
+    packed.frombytes(data)
+    return list(zip(packed[0::2], packed[1::2])), complete
+
+
+def _load(author_id):
+    posts = (Post.objects.filter(author=author_id)
+             .order_by('-pub_date', '-pk')
+             .only('pk', 'pub_date')[:AUTHOR_BUFFER_SIZE + 1])
+    rows = [_key(post) for post in posts]
+    complete = len(rows) <= AUTHOR_BUFFER_SIZE
+    return rows[:AUTHOR_BUFFER_SIZE], complete
+
+
+def _start_version(key):
+    # версия начинается со времени в микросекундах: если счётчик
+    # вытеснят из кэша, новый не совпадёт со старыми буферами
+    cache.add(key, time.time_ns() // 1000, None)
+    return cache.get(key)
+
+
+def get_buffers(author_ids):
+    """Буферы авторов; холодные и устаревшие заполняются из базы."""
+    keys = {author_id: (BUFFER_KEY.format(author_id),
+                        VERSION_KEY.format(author_id))
+            for author_id in author_ids}
+    found = cache.get_many([key for pair in keys.values() for key in pair])
+    buffers = {}
+    cold = {}
+    for author_id, (key, version_key) in keys.items():
+        raw, version = found.get(key), found.get(version_key)
+        if raw is not None and version is not None and raw[0] == version:
+            buffers[author_id] = _unpack(raw)
+            continue
+        if version is None:
+            version = _start_version(version_key)
+        # версия прочитана до загрузки: если пост появится во время
+        # неё, буфер сразу окажется устаревшим
+        buffers[author_id] = _load(author_id)
+        cold[key] = _pack(version, *buffers[author_id])
+    if cold:
+        cache.set_many(cold, BUFFER_TIMEOUT)
+    return buffers
+
+
+def _update(author_id, change):
+    try:
+        version = cache.incr(VERSION_KEY.format(author_id))
+    except ValueError:
+        # без счётчика нет и годного буфера
+        return
+    key = BUFFER_KEY.format(author_id)
+    raw = cache.get(key)
+    if raw is None or raw[0] != version - 1:
+        return
+    changed = change(*_unpack(raw))
+    if changed is not None:
+        cache.set(key, _pack(version, *changed), BUFFER_TIMEOUT)
+
+
+def _pushed(post, rows, complete):
+    row = _key(post)
+    if row in rows or not complete and rows and row < rows[-1]:
+        return rows, complete
+    rows.insert(0, row)
+    rows.sort(reverse=True)
+    if len(rows) > AUTHOR_BUFFER_SIZE:
+        rows, complete = rows[:AUTHOR_BUFFER_SIZE], False
+    return rows, complete
+
+
+def _discarded(post, rows, complete):
+    rows = [row for row in rows if row[1] != post.pk]
+    if not rows and not complete:
+        # пустой неполный буфер не задаёт границу слияния
+        return None
+    return rows, complete
+
+
+def push(post):
+    """После фиксации транзакции добавляет новый пост в буфер
+    автора."""
+    transaction.on_commit(
+        lambda: _update(post.author_id,
+                        lambda rows, complete: _pushed(post, rows, complete)))
+
+
+def discard(post):
+    """После фиксации транзакции убирает удалённый пост из буфера
+    автора."""
+    transaction.on_commit(
+        lambda: _update(post.author_id,
+                        lambda rows, complete: _discarded(post, rows,
+                                                          complete)))
+
+
+class BufferedFeed:
+    """Последовательность постов ленты для Paginator.
+
+    Слияние буферов верно до самого старого поста среди неполных
+    буферов: дальше у таких авторов могут быть посты, не попавшие
+    в буфер. Срезы за этой границей и подсчёт читаются из базы.
+    """
+
+    def __init__(self, user):
+        self.author_ids = list(
+            Follow.objects.filter(user=user).values_list('author', flat=True)
+        )
+        buffers = get_buffers(self.author_ids).values()
+        merged = heapq.merge(*(rows for rows, _ in buffers), reverse=True)
+        bounds = [rows[-1] for rows, complete in buffers
+                  if not complete and rows]
+        self.complete = not bounds
+        boundary = max(bounds) if bounds else None
+        self.merged = [row[1] for row in merged
+                       if boundary is None or row >= boundary]
+
+    def _query(self):
+        return Post.objects.for_listing().filter(
+            author__in=self.author_ids).order_by('-pub_date', '-pk')
+
+    def __len__(self):
+        if self.complete:
+            return len(self.merged)
+        return self._query().count()
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        start, stop = index.start or 0, index.stop
+        if not self.complete and (stop is None or stop > len(self.merged)):
+            return list(self._query()[index])
+        ids = self.merged[start:stop]
+        posts = Post.objects.for_listing().in_bulk(ids)
+        return [posts[pk] for pk in ids if pk in posts]
+
+
+def feed(user):
+    """Посты ленты подписок пользователя, новые сверху."""
+    return BufferedFeed(user)
@@ -0,0 +1,91 @@
+"""Теги, от которых зависят закэшированные страницы с постами.
+
+'listing' — главная страница, 'groups' — названия групп на карточках,
+'group:<slug>', 'author:<username>' и 'post:<id>' — страницы группы,
+профиля и поста. Обработчики из signals сдвигают версии тегов при
+изменении постов, комментариев и групп.
+
+'viewer:<id>' не кэширует страниц: он входит в валидаторы conditional
+GET, потому что дырки страниц зависят от подписок пользователя.
+"""
+from core.cache_tags import bump
+from core.identity import get_object_or_404
+
+from .models import Group, Post, User
+
+LISTING = 'listing'
+GROUPS = 'groups'
+
+
+def post_tag(post_id):
+    return f'post:{post_id}'
+
+
+def author_tag(username):
+    return f'author:{username}'
+
+
+def group_tag(slug):
+    return f'group:{slug}'
+
+
+def viewer_tag(user_id):
+    return f'viewer:{user_id}'
+
+
+def with_viewer(tags):
+    """Теги страницы и теги пользователя, который её смотрит."""
+    def viewer_tags(request, *args, **kwargs):
+        page_tags = tags(request, *args, **kwargs)
+        if request.user.is_authenticated:
+            return [*page_tags, viewer_tag(request.user.pk)]
+        return page_tags
+    return viewer_tags
+
+
+def index_tags(request):
+    return [LISTING, GROUPS]
+
+
+def group_posts_tags(request, slug):
+    return [group_tag(slug)]
+
+
+def profile_tags(request, username):
+    return [author_tag(username), GROUPS]
+
+
+def post_detail_tags(request, post_id):
+    # автор нужен ради счётчика его постов на странице поста; пост
+    # загружается так же, как во view, и view берёт его из карты
+    # идентичности запроса
+    post = get_object_or_404(Post.objects.for_detail(), id=post_id)
+    return [post_tag(post_id), author_tag(post.author.username), GROUPS]
+
+
+def _username(user_id):
+    return (User.objects.filter(pk=user_id)
+            .values_list('username', flat=True).first())
+
+
+def invalidate_post(post, *group_ids):
+    """Сбрасывает страницы, на которых выводится пост: его собственную,
+    профиль автора, главную и страницы групп post.group_id и
+    group_ids."""
+    group_ids = {post.group_id, *group_ids} - {None}
+    slugs = (Group.objects.filter(pk__in=group_ids)
+             .values_list('slug', flat=True) if group_ids else [])
+    if Post.author.is_cached(post):
+        username = post.author.username
+    else:
+        username = _username(post.author_id)
+    bump(LISTING, post_tag(post.pk), author_tag(username),
+         *map(group_tag, slugs))
+
+
+def invalidate_group(group):
+    bump(GROUPS, group_tag(group.slug))
+
+
+def invalidate_viewer(user_id):
+    bump(viewer_tag(user_id))
@@ -0,0 +1,57 @@
+"""Кэш отрендеренных карточек постов includes/post_template.html.
+
+Ключ карточки — хэш всех полей, которые она выводит: текста отрывка,
+картинки и её сведений, даты, числа комментариев, имени автора, слага
+и названия группы. Изменённый пост, переименованная группа или автор дают новый
+ключ, поэтому записи не нужно сбрасывать. Карточки страницы читаются
+одним get_many, рендерятся только недостающие; миниатюры для них
+ищутся разом и передаются шаблону в post.card_thumbnail. Карточка, в
+которой вместо неготовой миниатюры выведен оригинал картинки, не
+кэшируется.
+"""
+import hashlib
+
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from . import thumbnails
+from .consts import PAGE_CACHE_TIMEOUT
+
+CARD_KEY = 'posts:card:{}:{}'
+CARD_TEMPLATE = 'includes/post_template.html'
+CARD_THUMBNAIL = 'card'
+
+
+def card_key(post):
+    group = post.group
+    fields = (
+        post.excerpt, post.image.name, post.image_placeholder,
+        post.image_width, post.image_height, post.pub_date.isoformat(),
+        post.comments_count, post.author.username,
+        group and group.slug, group and group.title,
+    )
+    digest = hashlib.md5(repr(fields).encode()).hexdigest()
+    return CARD_KEY.format(post.pk, digest)
+
+
+def render_cards(posts):
+    """Список HTML карточек постов в их порядке."""
+    keys = {card_key(post): post for post in posts}
+    cards = cache.get_many(keys)
+    pending = [post for key, post in keys.items() if key not in cards]
+    ready = thumbnails.lookup_many(
+        [post.image for post in pending], CARD_THUMBNAIL)
+    for post in pending:
+        post.card_thumbnail = ready.get(post.image.name)
+    missing = {
+        card_key(post): render_to_string(CARD_TEMPLATE, {'post': post})
+        for post in pending
+    }
+    if missing:
+        cache.set_many({
+            key: card for key, card in missing.items()
+            if not keys[key].image or keys[key].card_thumbnail
+        }, PAGE_CACHE_TIMEOUT)
+        cards.update(missing)
+    return [mark_safe(cards[key]) for key in keys]
@@ -2,3 +2,22 @@
 META_STR_LEN = 15
 POSTS_COUNT = 10
 TITLE_LENGTH = 30
+# Длина отрывка текста, который выводит карточка поста в списках
+EXCERPT_LENGTH = 300
+# Лента подписок: авторы с большим числом подписчиков не раскладываются
+# по лентам при публикации, их посты подтягиваются при чтении
+FANOUT_FOLLOWERS_LIMIT = 1000
+FANOUT_BATCH_SIZE = 500
+# Сколько последних постов автора держит буфер ленты подписок
+AUTHOR_BUFFER_SIZE = 200
+# Сколько живёт буфер, к которому не обращались
+BUFFER_TIMEOUT = 60 * 60 * 24
+# Кэш итогов для пагинации: холодный подсчёт останавливается на COUNT_CAP
+COUNT_CAP = POSTS_COUNT * 100
+COUNT_CACHE_TIMEOUT = 60 * 60
+# Страницы с постами сбрасываются по тегам, таймаут лишь ограничивает
+# время жизни записей, к которым давно не обращались
+PAGE_CACHE_TIMEOUT = 60 * 60 * 24
+# Окно номеров страниц: соседей текущей и страниц по краям
+PAGE_WINDOW_SIDE = 3
+PAGE_WINDOW_ENDS = 1
@@ -0,0 +1,66 @@
+"""Кэш общего числа постов для пагинации.
+
+Итоги хранятся по области выборки: вся лента ('all'), группа
+('group:<id>'), автор ('author:<id>'). Итог ленты подписок
+('follow:<id>') складывается из итогов авторов, поэтому новый пост
+сбрасывает только ключи своего автора и группы, а не ключи всех
+его подписчиков. Холодный подсчёт останавливается на COUNT_CAP + 1
+строке, такой итог помечается приблизительным (постов не меньше).
+"""
+from django.core.cache import cache
+from django.db.models import Count
+
+from .consts import COUNT_CACHE_TIMEOUT, COUNT_CAP
+from .models import Follow, Post
+
+COUNT_KEY = 'posts:count:{}'
+
+
+def _capped_count(queryset):
+    total = queryset.order_by()[:COUNT_CAP + 1].count()
+    return total, total > COUNT_CAP
+
+
+def _follow_total(user_id, authors=None):
+    if authors is None:
+        authors = list(Follow.objects.filter(user=user_id)
+                       .values_list('author', flat=True))
+    keys = {COUNT_KEY.format(f'author:{author}'): author
+            for author in authors}
+    found = cache.get_many(keys)
+    missing = [author for key, author in keys.items() if key not in found]
+    if missing:
+        counted = dict.fromkeys(missing, 0)
+        counted.update(
+            Post.objects.filter(author__in=missing).order_by()
+            .values_list('author').annotate(total=Count('pk'))
+        )
+        fresh = {COUNT_KEY.format(f'author:{author}'): (total, False)
+                 for author, total in counted.items()}
+        cache.set_many(fresh, COUNT_CACHE_TIMEOUT)
+        found.update(fresh)
+    return (sum(total for total, _ in found.values()),
+            any(approximate for _, approximate in found.values()))
+
+
+def get_total(scope, queryset):
+    """Итог (число, приблизительный ли) для области выборки. Лента
+    подписок, которая уже знает авторов (author_ids, как у
+    buffers.BufferedFeed), не читает подписки заново."""
+    if scope.startswith('follow:'):
+        return _follow_total(int(scope.split(':')[1]),
+                             getattr(queryset, 'author_ids', None))
+    key = COUNT_KEY.format(scope)
+    total = cache.get(key)
+    if total is None:
+        total = _capped_count(queryset)
+        cache.set(key, total, COUNT_CACHE_TIMEOUT)
+    return total
+
+
+def invalidate(post, *group_ids):
+    """Сбрасывает итоги областей, в которые входит пост."""
+    scopes = ['all', f'author:{post.author_id}']
+    scopes += [f'group:{group_id}'
+               for group_id in {post.group_id, *group_ids} if group_id]
+    cache.delete_many([COUNT_KEY.format(scope) for scope in scopes])
@@ -0,0 +1,14 @@
+from django.conf import settings
+
+from . import buffers, timeline
+
+ENGINES = {
+    'timeline': timeline.feed,
+    'buffers': buffers.feed,
+}
+
+
+def follow_feed(user):
+    """Посты авторов, на которых подписан пользователь,
+    из движка, выбранного в settings.FOLLOW_FEED_ENGINE."""
+    return ENGINES[settings.FOLLOW_FEED_ENGINE](user)
@@ -1,5 +1,7 @@
 from django import forms
+from django.core.files.uploadedfile import UploadedFile
 
+from . import image_info, uploads
 from .models import Comment, Post
 
 
@@ -13,6 +15,28 @@ class PostForm(forms.ModelForm):
             'image': 'Изображение'
         }
 
+    def clean_image(self):
+        # ImageField к этому моменту прочитал только заголовок картинки,
+        # декодирует её пул процессов uploads
+        image = self.cleaned_data['image']
+        if isinstance(image, UploadedFile):
+            uploads.check(image)
+            return uploads.process(image)
+        return image
+
+    def save(self, commit=True):
+        # новая или удалённая картинка меняет её сведения в посте;
+        # у загрузки их уже вычислил пул uploads
+        if 'image' in self.changed_data:
+            image = self.cleaned_data['image']
+            fields = image_info.EMPTY
+            if image:
+                fields = (getattr(image, 'image_info', None)
+                          or image_info.describe(image))
+            for name, value in fields.items():
+                setattr(self.instance, name, value)
+        return super().save(commit)
+
 
 class CommentForm(forms.ModelForm):
     class Meta:
@@ -0,0 +1,43 @@
+"""Дырки страниц с постами: части, зависящие от пользователя."""
+from django.template.loader import render_to_string
+
+from core.donut import register_hole
+from core.query_cache import cached
+
+from .forms import CommentForm
+from .models import Follow
+
+
+@register_hole('switcher')
+def switcher(request):
+    return render_to_string('posts/includes/switcher.html',
+                            request=request)
+
+
+@register_hole('follow_button')
+def follow_button(request, author_id, username):
+    user = request.user
+    context = dict(
+        username=username,
+        show=user.is_authenticated and user.pk != author_id,
+    )
+    if context['show']:
+        context['following'] = cached(Follow.objects.filter(
+            user=user, author=author_id)).exists()
+    return render_to_string('posts/includes/follow_button.html', context,
+                            request=request)
+
+
+@register_hole('edit_button')
+def edit_button(request, post_id, author_id):
+    context = dict(post_id=post_id,
+                   imposter=request.user.pk != author_id)
+    return render_to_string('posts/includes/edit_button.html', context,
+                            request=request)
+
+
+@register_hole('comment_form')
+def comment_form(request, post_id):
+    context = dict(post_id=post_id, form=CommentForm())
+    return render_to_string('posts/includes/comment_form.html', context,
+                            request=request)
@@ -0,0 +1,54 @@
+"""Сведения о картинке поста, вычисляемые один раз при загрузке.
+
+PostForm сохраняет в пост размеры картинки (с учётом поворота из
+EXIF), её основной цвет и крошечное размытое превью — JPEG шириной
+PLACEHOLDER_SIZE в data: URI. Шаблоны выводят по ним заглушку нужного
+размера, пока грузится картинка, не открывая файл; старым постам поля
+заполняет команда image_info_backfill.
+"""
+import base64
+from io import BytesIO
+
+from PIL import Image, ImageOps
+
+PLACEHOLDER_SIZE = 16
+PLACEHOLDER_QUALITY = 40
+# основной цвет — самый частый из стольких цветов превью
+PALETTE_COLORS = 4
+EXIF_ORIENTATION = 0x0112
+# повороты на 90 и 270 градусов меняют ширину с высотой
+ROTATED = (5, 6, 7, 8)
+
+EMPTY = {
+    'image_width': None,
+    'image_height': None,
+    'image_color': '',
+    'image_placeholder': '',
+}
+
+
+def describe(file):
+    """Поля Post для картинки file: image_width, image_height,
+    image_color ('#rrggbb') и image_placeholder."""
+    file.seek(0)
+    with Image.open(file) as image:
+        width, height = image.size
+        if image.getexif().get(EXIF_ORIENTATION) in ROTATED:
+            width, height = height, width
+        # JPEG сразу декодируется в уменьшенном в 2–8 раз виде
+        image.draft('RGB', (PLACEHOLDER_SIZE * 8, PLACEHOLDER_SIZE * 8))
+        small = ImageOps.exif_transpose(image).convert('RGB')
+    file.seek(0)
+    small.thumbnail((PLACEHOLDER_SIZE, PLACEHOLDER_SIZE))
+    palette = small.quantize(colors=PALETTE_COLORS)
+    _, index = max(palette.getcolors())
+    red, green, blue = palette.getpalette()[index * 3:index * 3 + 3]
+    buffer = BytesIO()
+    small.save(buffer, 'JPEG', quality=PLACEHOLDER_QUALITY)
+    return {
+        'image_width': width,
+        'image_height': height,
+        'image_color': f'#{red:02x}{green:02x}{blue:02x}',
+        'image_placeholder': 'data:image/jpeg;base64,'
+                             + base64.b64encode(buffer.getvalue()).decode(),
+    }
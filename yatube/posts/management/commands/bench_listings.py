@@ -0,0 +1,83 @@
+import statistics
+import time
+from functools import partial
+
+from django.core.management.base import BaseCommand
+from django.db.models import QuerySet
+
+from posts.consts import POSTS_COUNT
+from posts.feeds import follow_feed
+from posts.models import Comment, Follow, Group, Post, User
+
+
+class Command(BaseCommand):
+    help = ('Замеряет запросы страниц со списками постов на текущей базе '
+            'и печатает их планы выполнения.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--page', type=int, default=50,
+                            help='Номер «глубокой» страницы.')
+        parser.add_argument('--plans', action='store_true',
+                            help='Печатать EXPLAIN для каждого запроса.')
+
+    @staticmethod
+    def follow_page(reader, window):
+        # лента из буферов — не QuerySet, её срез сразу список постов
+        return follow_feed(reader)[window]
+
+    def listings(self, page):
+        """Замеряемые выборки: QuerySet или функция, которая её строит.
+        Выборки по группе, автору или читателю пропускаются, если в базе
+        таких нет."""
+        group = Group.objects.order_by('-posts_count').first()
+        author = User.objects.order_by('-stats__posts_count').first()
+        reader = User.objects.order_by('-stats__following_count').first()
+        post = Post.objects.order_by('-comments_count').first()
+        offset = (page - 1) * POSTS_COUNT
+        pages = {'первая': slice(0, POSTS_COUNT),
+                 f'{page}-я': slice(offset, offset + POSTS_COUNT)}
+        for name, window in pages.items():
+            yield f'index, {name}', Post.objects.all()[window]
+            if group is not None:
+                yield f'group, {name}', group.posts_by_group.all()[window]
+            if author is not None:
+                yield (f'profile, {name}',
+                       author.posts_by_author.all()[window])
+            if reader is not None:
+                yield f'follow, {name}', partial(self.follow_page, reader,
+                                                 window)
+        if post is not None:
+            yield 'comments', post.comments.all()
+        if author is not None and reader is not None:
+            yield 'following', Follow.objects.filter(author=author,
+                                                     user=reader)
+
+    def measure(self, listing, repeat):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            if isinstance(listing, QuerySet):
+                list(listing._clone())
+            else:
+                list(listing())
+            timings.append((time.perf_counter() - started) * 1000)
+        return statistics.median(timings)
+
+    def plan(self, listing):
+        if not isinstance(listing, QuerySet):
+            listing = listing()
+        if isinstance(listing, QuerySet):
+            return listing.explain()
+        return 'Плана нет: выборка собрана не одним запросом.'
+
+    def handle(self, *args, **options):
+        self.stdout.write(
+            f'Постов: {Post.objects.count()}, '
+            f'комментариев: {Comment.objects.count()}, '
+            f'подписок: {Follow.objects.count()}')
+        for name, listing in self.listings(options['page']):
+            median = self.measure(listing, options['repeat'])
+            self.stdout.write(f'{name:<24} {median:8.2f} мс')
+            if options['plans']:
+                self.stdout.write(self.plan(listing))
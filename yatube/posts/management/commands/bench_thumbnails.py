@@ -0,0 +1,86 @@
+import os
+import time
+
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+from django.core.management.base import BaseCommand
+from sorl.thumbnail import default
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.images import ImageFile
+from sorl.thumbnail.parsers import parse_geometry
+
+from posts import thumbnails
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает форматы вариантов миниатюр: суммарный размер '
+            'файлов по ширинам относительно формата по умолчанию и время '
+            'кодирования. Картинки — файлы из аргументов или картинки '
+            'последних постов.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('paths', nargs='*')
+        parser.add_argument('--limit', type=int, default=20)
+        parser.add_argument('--size', default='card',
+                            choices=list(settings.THUMBNAIL_SIZES))
+
+    def sources(self, paths, limit):
+        for path in paths:
+            path = os.path.abspath(path)
+            yield ImageFile(os.path.basename(path),
+                            FileSystemStorage(os.path.dirname(path)))
+        if not paths:
+            posts = Post.objects.exclude(image='').order_by('-pub_date')
+            for post in posts.only('image')[:limit]:
+                yield ImageFile(post.image)
+
+    def encode(self, source, source_image, geometry, options):
+        """Размер варианта в байтах и время его кодирования в секундах
+        (без масштабирования, одинакового для всех форматов)."""
+        engine = default.engine
+        options = thumbnails._options(source, options)
+        ratio = engine.get_image_ratio(source_image, options)
+        image = engine.create(
+            source_image, parse_geometry(geometry, ratio), options)
+        started = time.perf_counter()
+        data = engine._get_raw_data(
+            image, options['format'], options['quality'],
+            image_info=engine.get_image_info(source_image),
+            progressive=options.get(
+                'progressive', sorl_settings.THUMBNAIL_PROGRESSIVE))
+        return len(data), time.perf_counter() - started
+
+    def handle(self, *args, **options):
+        variants = thumbnails.variants(options['size'])
+        skipped = set(settings.THUMBNAIL_FORMATS) - set(thumbnails.formats())
+        if skipped:
+            self.stdout.write('Нет кодировщика для форматов: '
+                              + ', '.join(sorted(skipped)))
+        totals = {}
+        count = 0
+        for source in self.sources(options['paths'], options['limit']):
+            source_image = default.engine.get_image(source)
+            count += 1
+            try:
+                for format, width, geometry, variant in variants:
+                    size, seconds = self.encode(
+                        source, source_image, geometry, variant)
+                    total = totals.setdefault((format, width), [0, 0.0])
+                    total[0] += size
+                    total[1] += seconds
+            finally:
+                default.engine.cleanup(source_image)
+        if not count:
+            self.stdout.write('Нет картинок для сравнения.')
+            return
+        self.stdout.write(f'Картинок: {count}')
+        self.stdout.write(f'{"формат":<10} {"ширина":>7} {"КБ":>10} '
+                          f'{"от формата по умолчанию":>24} '
+                          f'{"кодирование, мс":>16}')
+        for (format, width), (size, seconds) in totals.items():
+            base = totals[None, width][0]
+            self.stdout.write(
+                f'{format or "default":<10} {width:>7} {size / 1024:10.1f} '
+                f'{size / base if base else 0:24.0%} '
+                f'{seconds * 1000 / count:16.1f}')
@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand
+
+from posts import cache_tags, image_info
+from posts.models import Post
+
+BATCH_SIZE = 200
+
+
+class Command(BaseCommand):
+    help = ('Заполняет размеры, основной цвет и превью картинок постов, '
+            'загруженных до того, как PostForm стал их сохранять.')
+
+    def handle(self, *args, **options):
+        posts = (Post.objects.exclude(image='').filter(image_placeholder='')
+                 .select_related('author')
+                 .only('image', 'group', 'author__username').iterator())
+        batch = []
+        done = 0
+        for post in posts:
+            try:
+                with post.image.open('rb') as file:
+                    fields = image_info.describe(file)
+            except (OSError, SyntaxError) as error:
+                self.stderr.write(f'{post.image.name}: {error}')
+                continue
+            for name, value in fields.items():
+                setattr(post, name, value)
+            batch.append(post)
+            if len(batch) == BATCH_SIZE:
+                done += self.save(batch)
+                batch = []
+        done += self.save(batch)
+        self.stdout.write(f'Картинок обработано: {done}')
+
+    def save(self, posts):
+        # bulk_update не вызывает сигналы, страницы сбрасываются здесь
+        Post.objects.bulk_update(posts, list(image_info.EMPTY))
+        for post in posts:
+            cache_tags.invalidate_post(post)
+        return len(posts)
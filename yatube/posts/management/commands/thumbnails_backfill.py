@@ -0,0 +1,31 @@
+from concurrent.futures import as_completed
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from posts import thumbnails
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = ('Создаёт в пуле процессов миниатюры всех размеров из '
+            'settings.THUMBNAIL_SIZES для картинок уже сохранённых постов.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true',
+                            help='Не пропускать посты с готовыми '
+                                 'миниатюрами.')
+
+    def missing(self, post):
+        return any(thumbnails.lookup(post.image, size) is None
+                   for size in settings.THUMBNAIL_SIZES)
+
+    def handle(self, *args, **options):
+        posts = Post.objects.exclude(image='').only('image').iterator()
+        post_ids = [post.pk for post in posts
+                    if options['all'] or self.missing(post)]
+        futures = thumbnails.schedule(post_ids)
+        for done, _ in enumerate(as_completed(futures), 1):
+            if done % 100 == 0 or done == len(futures):
+                self.stdout.write(f'{done}/{len(futures)}')
+        self.stdout.write(f'Постов с картинками обработано: {len(post_ids)}')
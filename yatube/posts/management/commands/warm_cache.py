@@ -0,0 +1,32 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts.warmup import hot_urls, warm
+
+
+class Command(BaseCommand):
+    help = ('Рендерит в кэш самые посещаемые страницы: главную, '
+            'крупнейшие группы, популярных авторов и свежие посты.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--pages', type=int, default=3,
+                            help='Сколько первых страниц главной.')
+        parser.add_argument('--top', type=int, default=10,
+                            help='Сколько групп, авторов и постов.')
+        parser.add_argument('--workers', type=int, default=4)
+        parser.add_argument('--host', help='Хост в адресах страниц, '
+                            'по умолчанию settings.WARM_CACHE_HOST.')
+        parser.add_argument('--secure', action='store_const', const=True,
+                            help='Запрашивать страницы по https, '
+                            'по умолчанию settings.WARM_CACHE_SECURE.')
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        urls = hot_urls(options['pages'], options['top'])
+        results = warm(urls, options['workers'], options['host'],
+                       options['secure'])
+        for url, status, seconds in results:
+            self.stdout.write(f'{status} {seconds * 1000:8.1f} мс  {url}')
+        self.stdout.write(f'Страниц: {len(results)}, '
+                          f'{time.monotonic() - started:.1f} с')
@@ -0,0 +1,47 @@
+# Generated by Django 2.2.16 on 2026-10-18 09:12
+
+from django.db import migrations, models
+
+TITLE_LENGTH = 30
+EXCERPT_LENGTH = 300
+BATCH_SIZE = 500
+
+
+def fill_excerpts(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    posts = []
+    for post in Post.objects.only('text').iterator():
+        post.title = post.text[:TITLE_LENGTH]
+        if len(post.title) == TITLE_LENGTH:
+            post.title += '...'
+        post.excerpt = post.text
+        if len(post.text) > EXCERPT_LENGTH:
+            post.excerpt = post.text[:EXCERPT_LENGTH].rstrip() + '…'
+        posts.append(post)
+        if len(posts) == BATCH_SIZE:
+            Post.objects.bulk_update(posts, ['title', 'excerpt'])
+            posts = []
+    Post.objects.bulk_update(posts, ['title', 'excerpt'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0021_listing_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='excerpt',
+            field=models.CharField(default='', editable=False, max_length=301, verbose_name='Отрывок'),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='title',
+            field=models.CharField(db_index=True, default='', editable=False, max_length=33, verbose_name='Заголовок'),
+            preserve_default=False,
+        ),
+        migrations.RunPython(fill_excerpts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 2.2.16 on 2026-10-18 07:19
+
+from django.db import migrations, models
+from django.db.models import Min, OuterRef, Subquery
+
+FANOUT_FOLLOWERS_LIMIT = 1000
+
+
+def fill_pulled_since(apps, schema_editor):
+    # когда авторы стали подтягиваться, неизвестно: считаем, что
+    # с первого поста, и при возврате под лимит их лента дополнится
+    # целиком, как раньше
+    AuthorStats = apps.get_model('posts', 'AuthorStats')
+    Post = apps.get_model('posts', 'Post')
+    AuthorStats.objects.filter(
+        followers_count__gt=FANOUT_FOLLOWERS_LIMIT,
+    ).update(pulled_since=Subquery(
+        Post.objects.filter(author=OuterRef('user')).order_by()
+        .values('author').annotate(first=Min('pub_date')).values('first')
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0023_post_image_info'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='authorstats',
+            name='pulled_since',
+            field=models.DateTimeField(blank=True, help_text='Когда подписчиков стало больше лимита раскладки', null=True, verbose_name='Подтягивается в ленты с'),
+        ),
+        migrations.RunPython(fill_pulled_since, migrations.RunPython.noop),
+    ]
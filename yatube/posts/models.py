@@ -2,7 +2,7 @@ from django.contrib.auth import get_user_model
 from django.db import models
 from django.db.models import CheckConstraint, F, Q
 
-from .consts import META_STR_LEN
+from .consts import EXCERPT_LENGTH, META_STR_LEN, TITLE_LENGTH
 
 User = get_user_model()
 
@@ -11,6 +11,8 @@ class Group(models.Model):
     title = models.CharField(max_length=200)
     slug = models.SlugField(verbose_name='Group', unique=True)
     description = models.TextField()
+    posts_count = models.PositiveIntegerField(
+        default=0, editable=False, verbose_name='Число постов')
 
     class Meta:
         verbose_name = 'Группа'
@@ -20,8 +22,36 @@ class Group(models.Model):
         return self.title
 
 
+class PostQuerySet(models.QuerySet):
+    # поля, которые выводит карточка поста includes/post_template.html
+    LISTING_FIELDS = (
+        'excerpt', 'pub_date', 'image', 'image_width', 'image_height',
+        'image_color', 'image_placeholder', 'comments_count',
+        'author__username', 'group__slug', 'group__title',
+    )
+
+    def for_listing(self):
+        """Посты для списков: автор и группа в том же запросе,
+        без полей, которые карточка не выводит, в том числе без полного
+        текста — карточка выводит отрывок excerpt."""
+        return self.select_related('author', 'group').only(
+            *self.LISTING_FIELDS)
+
+    def for_detail(self):
+        """Пост для отдельной страницы: как в списке, с полным текстом,
+        заголовком и счётчиками автора."""
+        return self.for_listing().select_related('author__stats').only(
+            *self.LISTING_FIELDS, 'text', 'title',
+            'author__stats__posts_count')
+
+
 class Post(models.Model):
     text = models.TextField(verbose_name='Текст поста')
+    # заголовок и отрывок вычисляются из text при сохранении
+    title = models.CharField(max_length=TITLE_LENGTH + 3, db_index=True,
+                             editable=False, verbose_name='Заголовок')
+    excerpt = models.CharField(max_length=EXCERPT_LENGTH + 1,
+                               editable=False, verbose_name='Отрывок')
     pub_date = models.DateTimeField(auto_now_add=True,
                                     verbose_name='Дата публикации')
     author = models.ForeignKey(
@@ -43,15 +73,59 @@ class Post(models.Model):
         upload_to='posts/',
         blank=True
     )
+    # сведения о картинке заполняет PostForm, см. posts.image_info
+    image_width = models.PositiveIntegerField(
+        null=True, editable=False, verbose_name='Ширина картинки')
+    image_height = models.PositiveIntegerField(
+        null=True, editable=False, verbose_name='Высота картинки')
+    image_color = models.CharField(
+        max_length=7, blank=True, editable=False,
+        verbose_name='Основной цвет картинки')
+    image_placeholder = models.TextField(
+        blank=True, editable=False, verbose_name='Превью картинки')
+    comments_count = models.PositiveIntegerField(
+        default=0, editable=False, verbose_name='Число комментариев')
+
+    objects = PostQuerySet.as_manager()
 
     class Meta:
-        ordering = ('-pub_date',)
+        ordering = ('-pub_date', '-id')
         verbose_name = 'Пост'
         verbose_name_plural = 'Посты'
+        indexes = [
+            models.Index(fields=['-pub_date', '-id'],
+                         name='post_date_idx'),
+            models.Index(fields=['author', '-pub_date', '-id'],
+                         name='post_author_date_idx'),
+            models.Index(fields=['group', '-pub_date', '-id'],
+                         name='post_group_date_idx'),
+        ]
 
     def __str__(self):
         return self.text[:META_STR_LEN]
 
+    @staticmethod
+    def make_title(text):
+        title = text[:TITLE_LENGTH]
+        if len(title) == TITLE_LENGTH:
+            title += '...'
+        return title
+
+    @staticmethod
+    def make_excerpt(text):
+        if len(text) <= EXCERPT_LENGTH:
+            return text
+        return text[:EXCERPT_LENGTH].rstrip() + '…'
+
+    def save(self, *args, **kwargs):
+        if 'text' not in self.get_deferred_fields():
+            self.title = self.make_title(self.text)
+            self.excerpt = self.make_excerpt(self.text)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'text' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'title', 'excerpt'}
+        super().save(*args, **kwargs)
+
 
 # sprint 6
 class Comment(models.Model):
@@ -72,8 +146,13 @@ class Comment(models.Model):
                                    verbose_name='Дата комментирования')
 
     class Meta:
+        ordering = ('created', 'id')
         verbose_name = 'Комментарий'
         verbose_name_plural = 'Комментарии'
+        indexes = [
+            models.Index(fields=['post', 'created', 'id'],
+                         name='comment_post_created_idx'),
+        ]
 
 
 class Follow(models.Model):
@@ -93,10 +172,83 @@ class Follow(models.Model):
     class Meta:
         verbose_name = 'Подписка'
         verbose_name_plural = 'Подписки'
+        # (user, author) индексирует unique_together
         unique_together = ['user', 'author']
+        indexes = [
+            models.Index(fields=['author', 'user'],
+                         name='follow_author_user_idx'),
+        ]
         constraints = [
             CheckConstraint(name='not_same', check=~Q(author=F('user')))
         ]
 
     def __str__(self):
         return f'{self.user} подписан на {self.author}'
+
+
+class AuthorStats(models.Model):
+    """Счётчики пользователя, которые обновляются вместе с постами
+    и подписками, чтобы страницы не считали их через COUNT."""
+    user = models.OneToOneField(
+        User,
+        primary_key=True,
+        related_name='stats',
+        verbose_name='Пользователь',
+        on_delete=models.CASCADE,
+    )
+    posts_count = models.PositiveIntegerField(
+        default=0, verbose_name='Число постов')
+    followers_count = models.PositiveIntegerField(
+        default=0, verbose_name='Число подписчиков')
+    following_count = models.PositiveIntegerField(
+        default=0, verbose_name='Число подписок')
+    pulled_since = models.DateTimeField(
+        null=True, blank=True,
+        verbose_name='Подтягивается в ленты с',
+        help_text='Когда подписчиков стало больше лимита раскладки',
+    )
+
+    class Meta:
+        verbose_name = 'Счётчики автора'
+        verbose_name_plural = 'Счётчики авторов'
+
+    def __str__(self):
+        return f'Счётчики {self.user}'
+
+
+class TimelineEntry(models.Model):
+    """Запись персональной ленты подписок: пост автора, на которого
+    подписан пользователь. Заполняется при публикации поста."""
+    user = models.ForeignKey(
+        User,
+        related_name='timeline',
+        verbose_name='Читатель',
+        on_delete=models.CASCADE,
+    )
+    post = models.ForeignKey(
+        Post,
+        related_name='timeline_entries',
+        verbose_name='Пост',
+        on_delete=models.CASCADE,
+    )
+    author = models.ForeignKey(
+        User,
+        related_name='+',
+        verbose_name='Автор',
+        on_delete=models.CASCADE,
+    )
+    pub_date = models.DateTimeField(verbose_name='Дата публикации')
+
+    class Meta:
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Записи ленты'
+        unique_together = ['user', 'post']
+        indexes = [
+            models.Index(fields=['user', '-pub_date', '-post'],
+                         name='timeline_user_date_idx'),
+            models.Index(fields=['user', 'author'],
+                         name='timeline_user_author_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.post_id} в ленте {self.user_id}'
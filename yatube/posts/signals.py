@@ -0,0 +1,97 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import buffers, cache_tags, counts, stats, thumbnails, timeline
+from .models import AuthorStats, Comment, Follow, Group, Post, User
+
+
+@receiver(post_save, sender=User)
+def create_stats(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        AuthorStats.objects.get_or_create(user=instance)
+
+
+@receiver(pre_save, sender=Post)
+def remember_saved(sender, instance, raw=False, **kwargs):
+    # при редактировании пост может уйти из старой группы или сменить
+    # картинку
+    if instance.pk and not raw:
+        instance._saved_group_id, instance._saved_image = (
+            Post.objects.filter(pk=instance.pk)
+            .values_list('group', 'image').first() or (None, None)
+        )
+
+
+@receiver(post_save, sender=Post)
+def fan_out_post(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    saved_group_id = getattr(instance, '_saved_group_id', None)
+    counts.invalidate(instance, saved_group_id)
+    cache_tags.invalidate_post(instance, saved_group_id)
+    if created:
+        stats.bump_author(instance.author_id, 1, 'posts_count')
+        stats.bump_group(instance.group_id, 1)
+        timeline.fan_out(instance)
+        buffers.push(instance)
+    elif saved_group_id != instance.group_id:
+        stats.bump_group(saved_group_id, -1)
+        stats.bump_group(instance.group_id, 1)
+
+
+@receiver(post_save, sender=Post)
+def make_thumbnails(sender, instance, raw=False, **kwargs):
+    saved_image = getattr(instance, '_saved_image', None)
+    if instance.image and not raw and instance.image.name != saved_image:
+        transaction.on_commit(lambda: thumbnails.schedule([instance.pk]))
+
+
+@receiver(post_delete, sender=Post)
+def discard_post(sender, instance, **kwargs):
+    stats.bump_author(instance.author_id, -1, 'posts_count')
+    stats.bump_group(instance.group_id, -1)
+    counts.invalidate(instance)
+    cache_tags.invalidate_post(instance)
+    buffers.discard(instance)
+
+
+@receiver(post_save, sender=Comment)
+def count_comment(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        stats.bump_post(instance.post_id, 1)
+    cache_tags.invalidate_post(instance.post)
+
+
+@receiver(post_delete, sender=Comment)
+def uncount_comment(sender, instance, **kwargs):
+    stats.bump_post(instance.post_id, -1)
+    cache_tags.invalidate_post(instance.post)
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def invalidate_group(sender, instance, raw=False, **kwargs):
+    if not raw:
+        cache_tags.invalidate_group(instance)
+
+
+@receiver(post_save, sender=Follow)
+def backfill_timeline(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        stats.bump_author(instance.author_id, 1, 'followers_count')
+        stats.bump_author(instance.user_id, 1, 'following_count')
+        timeline.backfill(instance.user_id, instance.author_id)
+        timeline.mark_pulled(instance.author_id)
+        cache_tags.invalidate_viewer(instance.user_id)
+
+
+@receiver(post_delete, sender=Follow)
+def prune_timeline(sender, instance, **kwargs):
+    stats.bump_author(instance.author_id, -1, 'followers_count')
+    stats.bump_author(instance.user_id, -1, 'following_count')
+    timeline.prune(instance.user_id, instance.author_id)
+    timeline.settle(instance.author_id)
+    cache_tags.invalidate_viewer(instance.user_id)
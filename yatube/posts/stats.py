@@ -0,0 +1,70 @@
+"""Денормализованные счётчики постов, комментариев и подписок.
+
+Счётчики меняются одним UPDATE с F-выражением при создании и удалении
+Post, Comment и Follow, так что конкурирующие запросы не теряют
+изменений. Уменьшение не опускает счётчик ниже нуля, даже если он
+разошёлся с данными (например, после bulk_create без сигналов). Если
+счётчики разошлись с данными, их пересчитывает команда
+rebuild_counters.
+"""
+from django.db.models import Count, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest
+
+from .models import AuthorStats, Comment, Follow, Group, Post, User
+
+
+def _shift(queryset, delta, *fields):
+    if delta < 0:
+        return queryset.update(**{
+            field: Greatest(F(field) + delta, Value(0)) for field in fields})
+    return queryset.update(
+        **{field: F(field) + delta for field in fields})
+
+
+def following_count(user):
+    """Число подписок пользователя одним запросом. Без строки
+    счётчиков — 0: чтение страницы её не создаёт."""
+    return AuthorStats.objects.filter(user=user).values_list(
+        'following_count', flat=True).first() or 0
+
+
+def bump_author(user_id, delta, *fields):
+    """Сдвигает счётчики пользователя; строка счётчиков создаётся,
+    если её ещё нет."""
+    stats = AuthorStats.objects.filter(user=user_id)
+    if not _shift(stats, delta, *fields) and delta > 0:
+        AuthorStats.objects.get_or_create(user_id=user_id)
+        _shift(stats, delta, *fields)
+
+
+def bump_group(group_id, delta):
+    if group_id:
+        _shift(Group.objects.filter(pk=group_id), delta, 'posts_count')
+
+
+def bump_post(post_id, delta):
+    _shift(Post.objects.filter(pk=post_id), delta, 'comments_count')
+
+
+def _counted(model, field, **filters):
+    return Coalesce(Subquery(
+        model.objects.filter(**{field: OuterRef('pk')}, **filters)
+        .order_by().values(field).annotate(total=Count('pk'))
+        .values('total')
+    ), 0)
+
+
+def rebuild():
+    """Пересчитывает все счётчики по данным."""
+    AuthorStats.objects.bulk_create(
+        [AuthorStats(user_id=pk) for pk in User.objects.filter(
+            stats__isnull=True).values_list('pk', flat=True)],
+        ignore_conflicts=True,
+    )
+    AuthorStats.objects.update(
+        posts_count=_counted(Post, 'author'),
+        followers_count=_counted(Follow, 'author'),
+        following_count=_counted(Follow, 'user'),
+    )
+    Group.objects.update(posts_count=_counted(Post, 'group'))
+    Post.objects.update(comments_count=_counted(Comment, 'post'))
@@ -0,0 +1,12 @@
+from django import template
+
+from posts import thumbnails
+
+register = template.Library()
+
+
+@register.simple_tag
+def ready_thumbnail(image, size):
+    """Готовые варианты миниатюры картинки (posts.thumbnails.Picture)
+    или None: тег не создаёт миниатюр и не открывает файлов."""
+    return thumbnails.lookup(image, size)
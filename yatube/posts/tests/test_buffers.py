@@ -0,0 +1,124 @@
+from io import StringIO
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+
+from .. import buffers
+from ..models import Follow, Post, User
+from .consts import ANOTHER_NAME_USER, NAME_USER, POST_TEXT
+
+
+class BufferedFeedTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username=NAME_USER)
+        cls.author1 = User.objects.create_user(username=ANOTHER_NAME_USER)
+        cls.author2 = User.objects.create_user(username='ThirdAuthor')
+        Follow.objects.create(user=cls.reader, author=cls.author1)
+        Follow.objects.create(user=cls.reader, author=cls.author2)
+        for author in (cls.author1, cls.author2, cls.author1):
+            Post.objects.create(text=POST_TEXT, author=author)
+
+    def setUp(self):
+        cache.clear()
+
+    def expected(self):
+        return list(Post.objects.filter(
+            author__in=[self.author1, self.author2]
+        ).order_by('-pub_date', '-pk'))
+
+    def test_merge_matches_sql(self):
+        """Слияние буферов совпадает с выборкой из базы."""
+        feed = buffers.feed(self.reader)
+        self.assertTrue(feed.complete)
+        self.assertEqual(len(feed), 3)
+        self.assertEqual(feed[0:3], self.expected())
+
+    @mock.patch.object(buffers, 'AUTHOR_BUFFER_SIZE', 1)
+    def test_deep_page_falls_back_to_sql(self):
+        """За границей неполных буферов лента читается из базы."""
+        feed = buffers.feed(self.reader)
+        self.assertFalse(feed.complete)
+        self.assertEqual(len(feed), 3)
+        self.assertEqual(feed[0:3], self.expected())
+
+    @override_settings(FOLLOW_FEED_ENGINE='buffers')
+    def test_follow_index_uses_buffers(self):
+        """Страница подписок работает на буферах."""
+        self.client.force_login(self.reader)
+        response = self.client.get(reverse('posts:follow_index'))
+        self.assertEqual(list(response.context['page_obj']),
+                         self.expected())
+
+
+class BufferWritesTests(TransactionTestCase):
+    # записи правят буферы после фиксации транзакции
+    def setUp(self):
+        cache.clear()
+        self.reader = User.objects.create_user(username=NAME_USER)
+        self.author1 = User.objects.create_user(username=ANOTHER_NAME_USER)
+        self.author2 = User.objects.create_user(username='ThirdAuthor')
+        Follow.objects.create(user=self.reader, author=self.author1)
+        Follow.objects.create(user=self.reader, author=self.author2)
+        for author in (self.author1, self.author2, self.author1):
+            Post.objects.create(text=POST_TEXT, author=author)
+
+    def expected(self):
+        return list(Post.objects.filter(
+            author__in=[self.author1, self.author2]
+        ).order_by('-pub_date', '-pk'))
+
+    def test_buffers_follow_writes(self):
+        """Создание и удаление поста правят тёплый буфер автора, и
+        лента не обращается к базе за буферами."""
+        buffers.feed(self.reader)
+        post = Post.objects.create(text=POST_TEXT, author=self.author2)
+        with self.assertNumQueries(2):
+            feed = buffers.feed(self.reader)
+            self.assertEqual(feed[0:1], [post])
+        post.delete()
+        expected = self.expected()
+        with self.assertNumQueries(2):
+            self.assertEqual(buffers.feed(self.reader)[0:3], expected)
+
+    def test_stale_cold_load_not_served(self):
+        """Буфер, загруженный до появления нового поста, не читается,
+        даже если записан в кэш после него."""
+        load = buffers._load
+        posts = []
+
+        def load_then_post(author_id):
+            rows = load(author_id)
+            if not posts:
+                posts.append(Post.objects.create(text=POST_TEXT,
+                                                 author_id=author_id))
+            return rows
+
+        with mock.patch.object(buffers, '_load', load_then_post):
+            buffers.feed(self.reader)
+        self.assertEqual(buffers.feed(self.reader)[0:1], posts)
+        self.assertEqual(buffers.feed(self.reader)[0:4], self.expected())
+
+
+class BenchListingsTests(TestCase):
+    def bench(self):
+        out = StringIO()
+        call_command('bench_listings', '--repeat=1', '--plans', stdout=out)
+        return out.getvalue()
+
+    def test_empty_database(self):
+        """На пустой базе замеряется только главная."""
+        self.assertNotIn('group', self.bench())
+
+    @override_settings(FOLLOW_FEED_ENGINE='buffers')
+    def test_buffered_feed(self):
+        """Лента из буферов замеряется, хотя её срез — список."""
+        reader = User.objects.create_user(username=NAME_USER)
+        author = User.objects.create_user(username=ANOTHER_NAME_USER)
+        Follow.objects.create(user=reader, author=author)
+        Post.objects.create(text=POST_TEXT, author=author)
+        self.assertIn('follow, первая', self.bench())
@@ -0,0 +1,74 @@
+import os
+import tempfile
+from unittest import mock
+
+from django.core.cache import cache, caches
+from django.test import TestCase
+from django.urls import reverse
+
+from core.cache_stats import StatsStore, key_prefix, summary
+
+from ..models import Post, User
+from .consts import NAME_USER, POST_TEXT
+
+
+class CacheStatsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username=NAME_USER)
+        Post.objects.create(text=POST_TEXT, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.stats = StatsStore(os.path.join(directory.name, 'stats.db'))
+        patcher = mock.patch.object(cache, 'stats', self.stats)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def line(self, prefix, view):
+        for line in summary(self.stats.rows()):
+            if (line['prefix'], line['view']) == (prefix, view):
+                return line
+        self.fail(f'Нет статистики для {prefix}, {view}')
+
+    def test_key_prefix(self):
+        """Префикс отбрасывает изменяемую часть ключа."""
+        keys = {
+            'posts:card:12:abc': 'posts:card',
+            'tag:listing': 'tag:listing',
+            'query:4f1a': 'query',
+            'views.decorators.cache.cache_page.index_page.GET.1a.2b':
+                'cache_page.index_page',
+        }
+        for key, prefix in keys.items():
+            with self.subTest(key=key):
+                self.assertEqual(key_prefix(key), prefix)
+
+    def test_page_cache_counted_per_view(self):
+        """Попадания в кэш страницы записываются на её view."""
+        for _ in range(2):
+            self.client.get(reverse('posts:index'))
+        line = self.line('cache_page.index_page', 'posts:index')
+        self.assertEqual((line['hit'], line['set']), (1, 1))
+        self.assertGreater(line['bytes'], 0)
+        self.assertGreater(line['calls'], 0)
+
+    def test_eviction_estimated(self):
+        """Промах по записанному и не истёкшему ключу — вытеснение."""
+        cache.set('posts:card:1', 'card')
+        caches['two_tier'].delete('posts:card:1')
+        self.assertIsNone(cache.get('posts:card:1'))
+        line = self.line('posts:card', '-')
+        self.assertEqual((line['miss'], line['evict']), (1, 1))
+
+    def test_endpoint_for_staff_only(self):
+        """Страница статистики доступна только персоналу."""
+        address = reverse('cache_stats')
+        self.client.force_login(self.author)
+        self.assertEqual(self.client.get(address).status_code, 302)
+        User.objects.filter(pk=self.author.pk).update(is_staff=True)
+        response = self.client.get(address)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('stats', response.json())
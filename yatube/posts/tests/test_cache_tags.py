@@ -0,0 +1,179 @@
+import threading
+import time
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import Client, RequestFactory, TestCase
+from django.utils.cache import get_cache_key
+from django.urls import reverse
+
+from core import cache_tags
+
+from ..models import Comment, Follow, Group, Post, User
+from .consts import (ANOTHER_NAME_USER, NAME_GROUP, NAME_USER, POST_TEXT,
+                     SLUG)
+
+
+class CacheTagsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username=NAME_USER)
+        cls.reader = User.objects.create_user(username=ANOTHER_NAME_USER)
+        cls.group = Group.objects.create(title=NAME_GROUP, slug=SLUG)
+        cls.post = Post.objects.create(text=POST_TEXT, author=cls.author,
+                                       group=cls.group)
+
+    def setUp(self):
+        cache.clear()
+        self.guest = Client()
+        self.client.force_login(self.reader)
+
+    def test_unchanged_page_served_from_cache(self):
+        """Повторный запрос без изменений данных не рендерит страницу,
+        в том числе для другого пользователя."""
+        pages = {
+            reverse('posts:index'): 'posts/index.html',
+            reverse('posts:group_list', kwargs={'slug': SLUG}):
+                'posts/group_list.html',
+            reverse('posts:profile', kwargs={'username': NAME_USER}):
+                'posts/profile.html',
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}):
+                'posts/post_detail.html',
+        }
+        for address, template in pages.items():
+            with self.subTest(address=address):
+                self.assertTemplateUsed(self.client.get(address), template)
+                self.assertTemplateNotUsed(self.client.get(address),
+                                           template)
+                self.assertTemplateNotUsed(self.guest.get(address),
+                                           template)
+
+    def test_holes_filled_per_user(self):
+        """Шапка, кнопки и форма комментария в общей странице свои
+        у каждого пользователя."""
+        detail = reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        profile = reverse('posts:profile', kwargs={'username': NAME_USER})
+        for address in (detail, profile):
+            self.client.get(address)
+        response = self.guest.get(detail)
+        self.assertNotContains(response, ANOTHER_NAME_USER)
+        self.assertNotContains(response, 'csrfmiddlewaretoken')
+        self.assertContains(response, 'Вы не можете редактировать')
+        self.assertNotContains(self.guest.get(profile), 'Подписаться')
+        author = Client()
+        author.force_login(self.author)
+        response = author.get(detail)
+        self.assertContains(response, f'Пользователь: {NAME_USER}')
+        self.assertContains(response, 'csrfmiddlewaretoken')
+        self.assertNotContains(response, 'Вы не можете редактировать')
+        self.assertContains(self.client.get(profile), 'Подписаться')
+
+    def test_comment_invalidates_pages(self):
+        """Комментарий сразу виден на странице поста, а его счётчик —
+        в списках."""
+        addresses = [
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': SLUG}),
+            reverse('posts:profile', kwargs={'username': NAME_USER}),
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}),
+        ]
+        for address in addresses:
+            self.client.get(address)
+        Comment.objects.create(post=self.post, author=self.reader,
+                               text='Свежий комментарий')
+        for address in addresses:
+            with self.subTest(address=address):
+                self.assertContains(self.client.get(address),
+                                    'Комментариев: 1'
+                                    if 'posts' not in address
+                                    else 'Свежий комментарий')
+
+    def test_group_rename_invalidates_pages(self):
+        """Новое название группы видно на карточках постов."""
+        address = reverse('posts:profile', kwargs={'username': NAME_USER})
+        self.client.get(address)
+        self.group.title = 'Новое название'
+        self.group.save()
+        self.assertContains(self.client.get(address), 'Новое название')
+
+    def test_follow_invalidates_profile(self):
+        """После подписки закэшированный профиль показывает кнопку
+        отписки."""
+        address = reverse('posts:profile', kwargs={'username': NAME_USER})
+        self.assertNotContains(self.client.get(address), 'Отписаться')
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.assertContains(self.client.get(address), 'Отписаться')
+
+    def test_not_modified(self):
+        """Неизменная страница отвечает 304 без рендера, новый пост
+        и подписка меняют ETag."""
+        index = reverse('posts:index')
+        etag = self.guest.get(index)['ETag']
+        response = self.guest.get(index, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertTemplateNotUsed(response, 'posts/index.html')
+        Post.objects.create(text=POST_TEXT, author=self.author)
+        self.assertEqual(
+            self.guest.get(index, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+        profile = reverse('posts:profile', kwargs={'username': NAME_USER})
+        etag = self.client.get(profile)['ETag']
+        self.assertEqual(self.client.get(
+            profile, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.assertEqual(self.client.get(
+            profile, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_expired_page_while_recomputing(self):
+        """Пока страницу с истёкшим сроком пересчитывает другой запрос,
+        отдаётся устаревшая запись, а не второй пересчёт."""
+        address = reverse('posts:index')
+        request = RequestFactory().get(address)
+        self.client.get(address)
+        key = get_cache_key(request, 'index_page', 'GET', cache)
+        stored, response, _, delta = cache.get(key)
+        cache.set(key, (stored, response, 0, delta))
+        lock = cache_tags._lock_key(request, 'index_page')
+        cache.set(lock, True)
+        self.assertTemplateNotUsed(self.client.get(address),
+                                   'posts/index.html')
+        cache.delete(lock)
+        self.assertTemplateUsed(self.client.get(address), 'posts/index.html')
+
+    def test_changed_page_not_served_stale(self):
+        """После записи устаревшая страница не отдаётся и во время
+        чужого пересчёта: запрос дожидается его и видит новый пост."""
+        address = reverse('posts:index')
+        self.client.get(address)
+        Post.objects.create(text='Новый пост', author=self.author)
+        lock = cache_tags._lock_key(RequestFactory().get(address),
+                                    'index_page')
+        cache.set(lock, True)
+        threading.Timer(0.2, cache.delete, [lock]).start()
+        self.assertContains(self.client.get(address), 'Новый пост')
+
+    def test_early_refresh(self):
+        """Свежая запись может быть пересчитана заранее."""
+        address = reverse('posts:index')
+        self.client.get(address)
+        # срок записи — сутки, рендер — миллисекунды: досрочное
+        # обновление возможно, лишь если его вес очень велик
+        with mock.patch.object(cache_tags, 'EARLY_REFRESH_BETA', 10 ** 9), \
+                mock.patch.object(cache_tags.random, 'random',
+                                  return_value=0.5):
+            self.assertTemplateUsed(self.client.get(address),
+                                    'posts/index.html')
+        self.assertTemplateNotUsed(self.client.get(address),
+                                   'posts/index.html')
+
+    def test_uncacheable_page_not_awaited(self):
+        """Когда блокировку снимают, не положив запись (404), ожидающие
+        запросы сразу считают страницу сами."""
+        address = reverse('posts:group_list', kwargs={'slug': 'nope'})
+        lock = cache_tags._lock_key(RequestFactory().get(address),
+                                    'group_posts')
+        cache.set(lock, True)
+        threading.Timer(0.2, cache.delete, [lock]).start()
+        started = time.monotonic()
+        self.assertEqual(self.client.get(address).status_code, 404)
+        self.assertLess(time.monotonic() - started,
+                        cache_tags.LOCK_TIMEOUT / 2)
@@ -0,0 +1,76 @@
+from types import SimpleNamespace
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase
+
+from ..cards import card_key, render_cards
+from ..models import Comment, Group, Post, User
+from .consts import NAME_GROUP, NAME_USER, POST_TEXT, SLUG
+
+
+class CardsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username=NAME_USER)
+        cls.group = Group.objects.create(title=NAME_GROUP, slug=SLUG)
+        for _ in range(3):
+            Post.objects.create(text=POST_TEXT, author=cls.author,
+                                group=cls.group, image='posts/none.jpg')
+
+    def setUp(self):
+        cache.clear()
+
+    def listing(self):
+        return list(Post.objects.for_listing())
+
+    @mock.patch('posts.thumbnails.lookup_many', lambda images, size: {
+        image.name: SimpleNamespace(url='/media/cache/card.jpg')
+        for image in images})
+    def test_cards_rendered_once(self):
+        """Закэшированные карточки не рендерятся и не обращаются
+        к хранилищу миниатюр."""
+        cards = render_cards(self.listing())
+        self.assertEqual(len(cards), 3)
+        self.assertIn('/media/cache/card.jpg', cards[0])
+        posts = self.listing()
+        with self.assertNumQueries(0):
+            with self.assertTemplateNotUsed('includes/post_template.html'):
+                self.assertEqual(render_cards(posts), cards)
+
+    def test_pending_thumbnail_not_cached(self):
+        """Карточка без готовой миниатюры выводит оригинал картинки
+        и рендерится заново, пока миниатюра не появится."""
+        posts = self.listing()
+        with self.assertNumQueries(1):
+            # хранилище миниатюр спрашивается один раз на все карточки
+            cards = render_cards(posts)
+        self.assertIn('/media/posts/none.jpg', cards[0])
+        with self.assertTemplateUsed('includes/post_template.html'):
+            render_cards(self.listing())
+
+    def test_key_follows_card_fields(self):
+        """Комментарий и новое название группы меняют ключ карточки."""
+        post = self.listing()[0]
+        key = card_key(post)
+        Comment.objects.create(post=post, author=self.author,
+                               text=POST_TEXT)
+        post = self.listing()[0]
+        self.assertNotEqual(card_key(post), key)
+        key = card_key(post)
+        self.group.title = 'Новое название'
+        self.group.save()
+        post = self.listing()[0]
+        self.assertNotEqual(card_key(post), key)
+        self.assertIn('Новое название', render_cards([post])[0])
+
+    def test_placeholder(self):
+        """Пока картинка грузится, карточка занимает её размер и
+        показывает основной цвет и превью."""
+        Post.objects.update(
+            image_width=300, image_height=100, image_color='#c81e1e',
+            image_placeholder='data:image/jpeg;base64,AAAA')
+        card = render_cards(self.listing())[0]
+        self.assertIn('width="300" height="100"', card)
+        self.assertIn(
+            'background: #c81e1e url(data:image/jpeg;base64,AAAA)', card)
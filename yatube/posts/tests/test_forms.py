@@ -106,6 +106,28 @@ class PostsFormTests(TestCase):
         expected_pic = Image.open(self.picture)
         result = ImageChops.difference(actual_pic, expected_pic).getbbox()
         self.assertEqual(None, result)
+        self.assertEqual(
+            (check_post.image_width, check_post.image_height), (2, 1))
+        self.assertRegex(check_post.image_color, r'^#[0-9a-f]{6}$')
+        self.assertTrue(check_post.image_placeholder.startswith(
+            'data:image/jpeg;base64,'))
+
+    def test_edit_post_clears_image_info(self):
+        """Удалённая из поста картинка удаляет и её сведения."""
+        self.post0.image = 'posts/none.jpg'
+        self.post0.image_width = self.post0.image_height = 10
+        self.post0.image_color = '#ffffff'
+        self.post0.image_placeholder = 'data:image/jpeg;base64,'
+        self.post0.save()
+        self.authorized_client.post(
+            self.url_reverse['post_edit'],
+            data={'text': POST_TEXT, 'image-clear': 'on'})
+        self.post0.refresh_from_db()
+        self.assertFalse(self.post0.image)
+        self.assertEqual(
+            (self.post0.image_width, self.post0.image_height,
+             self.post0.image_color, self.post0.image_placeholder),
+            (None, None, '', ''))
 
     def test_edit_post(self):
         """Валидная форма редактирования обновляет запись в Post."""
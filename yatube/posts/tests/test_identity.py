@@ -0,0 +1,77 @@
+from django.core.cache import cache
+from django.db import connection
+from django.http import Http404
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from core import identity
+
+from ..models import Post, User
+from .consts import NAME_USER, POST_TEXT
+
+
+class IdentityMapTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username=NAME_USER)
+        cls.post = Post.objects.create(text=POST_TEXT, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_object_loaded_once(self):
+        """Повторный поиск, в том числе по pk, не обращается к базе."""
+        identity_map = identity.IdentityMap()
+        with self.assertNumQueries(1):
+            author = identity_map.get(User, username=NAME_USER)
+            self.assertIs(identity_map.get(User, username=NAME_USER), author)
+            self.assertIs(identity_map.get(User, id=self.author.pk), author)
+            self.assertIs(identity_map.get(User, pk=self.author.pk), author)
+
+    def test_full_object_replaces_deferred(self):
+        """Полная загрузка вытесняет урезанный only() экземпляр."""
+        identity_map = identity.IdentityMap()
+        identity_map.add(User.objects.only('username').get())
+        author = identity_map.get(User, username=NAME_USER)
+        self.assertIs(identity_map.get(User, pk=self.author.pk), author)
+        self.assertFalse(author.get_deferred_fields())
+
+    def test_queryset_filters_respected(self):
+        """Поиск в queryset с фильтрами не берёт объект, найденный без
+        них, а простой менеджер не отдаёт урезанный экземпляр."""
+        identity_map = identity.IdentityMap()
+        other = User.objects.create_user(username='other')
+        identity_map.get(Post, id=self.post.pk)
+        with self.assertRaises(Post.DoesNotExist):
+            identity_map.get(Post.objects.filter(author=other),
+                             id=self.post.pk)
+        identity_map = identity.IdentityMap()
+        identity_map.get(Post.objects.only('id'), id=self.post.pk)
+        self.assertFalse(
+            identity_map.get(Post, id=self.post.pk).get_deferred_fields())
+
+    def test_get_object_or_404(self):
+        """Вне запроса функции модуля обращаются к базе напрямую."""
+        self.assertIsNone(identity.current())
+        self.assertEqual(
+            identity.get_object_or_404(Post, id=self.post.pk), self.post)
+        with self.assertRaises(Http404):
+            identity.get_object_or_404(Post, id=self.post.pk + 1)
+
+    def test_views_load_objects_once(self):
+        """Автор профиля и пост загружаются из базы по одному разу."""
+        pages = {
+            reverse('posts:profile', kwargs={'username': NAME_USER}):
+                '"auth_user"."username" =',
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}):
+                '"posts_post"."id" =',
+        }
+        for address, lookup in pages.items():
+            with self.subTest(address=address):
+                with CaptureQueriesContext(connection) as queries:
+                    self.client.get(address)
+                lookups = [query['sql'] for query in queries
+                           if lookup in query['sql']]
+                self.assertEqual(len(lookups), 1)
+                self.assertIsNone(identity.current())
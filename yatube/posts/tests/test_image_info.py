@@ -0,0 +1,39 @@
+import base64
+from io import BytesIO
+
+from django.test import SimpleTestCase
+from PIL import Image
+
+from ..image_info import EXIF_ORIENTATION, describe
+
+
+def image_file(image, format, **params):
+    file = BytesIO()
+    image.save(file, format, **params)
+    return file
+
+
+class ImageInfoTests(SimpleTestCase):
+    def test_describe(self):
+        """Размеры, основной цвет и превью картинки."""
+        image = Image.new('RGB', (300, 100), (200, 30, 30))
+        image.paste((0, 0, 255), (0, 0, 60, 100))
+        info = describe(image_file(image, 'PNG'))
+        self.assertEqual((info['image_width'], info['image_height']),
+                         (300, 100))
+        self.assertEqual(info['image_color'], '#c81e1e')
+        placeholder = Image.open(BytesIO(base64.b64decode(
+            info['image_placeholder'].split(',', 1)[1])))
+        self.assertEqual(placeholder.size, (16, 5))
+
+    def test_exif_rotation(self):
+        """Повёрнутая по EXIF картинка описывается так, как её покажет
+        браузер."""
+        exif = Image.Exif()
+        exif[EXIF_ORIENTATION] = 6
+        file = image_file(Image.new('RGB', (300, 100), 'white'), 'JPEG',
+                          exif=exif.tobytes())
+        info = describe(file)
+        self.assertEqual((info['image_width'], info['image_height']),
+                         (100, 300))
+        self.assertEqual(file.tell(), 0)
@@ -1,5 +1,6 @@
 from django.test import TestCase
 
+from ..consts import EXCERPT_LENGTH, TITLE_LENGTH
 from ..models import Group, Post, User, META_STR_LEN
 from .consts import (NAME_USER,
                      DESCRIPTION,
@@ -34,3 +35,20 @@ class PostModelTest(TestCase):
         actual_result = self.group.__str__()
         expected_result = self.group.title
         self.assertEqual(expected_result, actual_result)
+
+    def test_post_title_and_excerpt(self):
+        """Заголовок и отрывок поста пересчитываются при сохранении."""
+        post = Post.objects.get(pk=self.post.pk)
+        self.assertEqual(post.excerpt, POST_TEXT)
+        post.text = 'слово ' * EXCERPT_LENGTH
+        post.save(update_fields=['text'])
+        post.refresh_from_db()
+        self.assertEqual(post.title, post.text[:TITLE_LENGTH] + '...')
+        self.assertEqual(post.excerpt,
+                         post.text[:EXCERPT_LENGTH].rstrip() + '…')
+
+    def test_listing_defers_text(self):
+        """Списки не загружают полный текст поста."""
+        post = Post.objects.for_listing().get(pk=self.post.pk)
+        self.assertIn('text', post.get_deferred_fields())
+        self.assertNotIn('excerpt', post.get_deferred_fields())
@@ -0,0 +1,107 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+
+from core.query_budget import QueryBudgetExceeded, QueryRecorder
+from core.testing import QueryBudgetTestMixin, iter_patterns
+
+from .. import urls, views
+from ..consts import POSTS_COUNT
+from ..models import AuthorStats, Comment, Follow, Group, Post, User
+from .consts import ANOTHER_NAME_USER, NAME_GROUP, NAME_USER, POST_TEXT, SLUG
+
+
+class QueryBudgetTests(QueryBudgetTestMixin, TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username=NAME_USER)
+        cls.reader = User.objects.create_user(username=ANOTHER_NAME_USER)
+        cls.group = Group.objects.create(title=NAME_GROUP, slug=SLUG)
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        for _ in range(POSTS_COUNT + 1):
+            cls.post = Post.objects.create(text=POST_TEXT, author=cls.author,
+                                           group=cls.group)
+            Comment.objects.create(post=cls.post, author=cls.reader,
+                                   text=POST_TEXT)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_every_view_has_budget(self):
+        """У каждого view из posts.urls задан бюджет запросов."""
+        for name, view in iter_patterns(urls.urlpatterns):
+            with self.subTest(name=name):
+                self.assertTrue(hasattr(view, 'query_budget'))
+
+    def test_views_within_budget(self):
+        """Страницы укладываются в бюджет запросов."""
+        post = {'post_id': self.post.pk}
+        author = {'username': self.author.username}
+        requests = [
+            ('get', reverse('posts:index'), None),
+            ('get', reverse('posts:group_list', kwargs={'slug': SLUG}), None),
+            ('get', reverse('posts:profile', kwargs=author), None),
+            ('get', reverse('posts:post_detail', kwargs=post), None),
+            ('get', reverse('posts:post_create'), None),
+            ('post', reverse('posts:post_create'), {'text': POST_TEXT}),
+            ('get', reverse('posts:post_edit', kwargs=post), None),
+            ('post', reverse('posts:post_edit', kwargs=post),
+             {'text': POST_TEXT}),
+            ('post', reverse('posts:add_comment', kwargs=post),
+             {'text': POST_TEXT}),
+            ('get', reverse('posts:follow_index'), None),
+            ('get', reverse('posts:profile_unfollow', kwargs=author), None),
+            ('get', reverse('posts:profile_follow', kwargs=author), None),
+        ]
+        for user in (None, self.reader, self.author):
+            if user:
+                self.client.force_login(user)
+            for method, address, data in requests:
+                with self.subTest(user=user, method=method, address=address):
+                    self.assertWithinBudget(address, method, data)
+
+    def test_follow_index_within_budget(self):
+        """Страница подписок укладывается в бюджет на любом движке
+        ленты и без строки счётчиков пользователя."""
+        self.client.force_login(self.reader)
+        for count in (1, 0):
+            if not count:
+                AuthorStats.objects.filter(user=self.reader).delete()
+            for engine in ('timeline', 'buffers'):
+                with self.subTest(engine=engine, count=count), \
+                        override_settings(FOLLOW_FEED_ENGINE=engine):
+                    cache.clear()
+                    response = self.assertWithinBudget(
+                        reverse('posts:follow_index'))
+                    self.assertEqual(response.context['count'], count)
+
+    @mock.patch.object(views.post_detail, 'query_budget', 1)
+    def test_exceeded_budget_names_call_site(self):
+        """Превышение бюджета сообщает запросы и строку шаблона,
+        из которой они выполнены."""
+        # миниатюра ищется в хранилище sorl-thumbnail из шаблона
+        Post.objects.filter(pk=self.post.pk).update(image='posts/none.jpg')
+        with self.assertRaises(QueryBudgetExceeded) as raised:
+            self.assertWithinBudget(reverse(
+                'posts:post_detail', kwargs={'post_id': self.post.pk}))
+        self.assertIn('posts/post_detail.html:', str(raised.exception))
+        # execute_wrapper'ы, как core.query_cache, местом вызова не считаются
+        self.assertNotIn('track_writes', str(raised.exception))
+
+    def test_call_sites_over_budget_only(self):
+        """Вне строгого режима места вызова ищутся только для запросов
+        сверх бюджета."""
+        request = RequestFactory().get('/')
+        request.query_budget = 1
+        recorder = QueryRecorder(request)
+        with connection.execute_wrapper(recorder):
+            User.objects.count()
+            Group.objects.count()
+        self.assertEqual(recorder.count, 2)
+        (key, sites), = recorder.call_sites.items()
+        self.assertIn('posts_group', key)
+        self.assertIn('test_call_sites_over_budget_only', str(sites))
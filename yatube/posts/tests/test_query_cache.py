@@ -0,0 +1,77 @@
+from unittest import mock
+
+from django.db import connection, transaction
+from django.test import TransactionTestCase
+
+from core import cache_tags
+from core.query_cache import TABLE_TAG, cached
+
+from ..models import Follow, Group, Post, User
+from .consts import NAME_GROUP, NAME_USER, POST_TEXT, SLUG
+
+
+class QueryCacheTests(TransactionTestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username=NAME_USER)
+        self.reader = User.objects.create_user(username='reader')
+        self.group = Group.objects.create(title=NAME_GROUP, slug=SLUG)
+
+    def test_repeated_read_skips_database(self):
+        """Повторный запрос берётся из кэша."""
+        self.assertEqual(cached(Group.objects).get(slug=SLUG), self.group)
+        self.assertEqual(cached(Group.objects).count(), 1)
+        with self.assertNumQueries(0):
+            self.assertEqual(cached(Group.objects).get(slug=SLUG),
+                             self.group)
+            self.assertEqual(cached(Group.objects).count(), 1)
+
+    def test_other_database_not_shared(self):
+        """База с тем же алиасом, но другим именем, не получает чужих
+        результатов."""
+        cached(Group.objects).count()
+        with mock.patch.dict(connection.settings_dict, NAME='other.sqlite3'):
+            with self.assertNumQueries(1):
+                cached(Group.objects).count()
+
+    def test_write_to_any_table_invalidates(self):
+        """Запись в таблицу запроса, в том числе через update()
+        и счётчики в связанной таблице, сбрасывает результат."""
+        authors = cached(User.objects.select_related('stats'))
+        self.assertEqual(
+            authors.get(username=NAME_USER).stats.posts_count, 0)
+        Post.objects.create(text=POST_TEXT, author=self.author)
+        self.assertEqual(
+            authors.get(username=NAME_USER).stats.posts_count, 1)
+        Group.objects.filter(slug=SLUG).update(title='Новое название')
+        self.assertEqual(cached(Group.objects).get(slug=SLUG).title,
+                         'Новое название')
+
+    def test_uncommitted_writes_not_cached(self):
+        """Незафиксированная запись не попадает в кэш."""
+        following = cached(Follow.objects.filter(user=self.reader,
+                                                 author=self.author))
+        self.assertFalse(following.exists())
+        with self.assertRaises(RuntimeError):
+            with transaction.atomic():
+                Follow.objects.create(user=self.reader, author=self.author)
+                self.assertTrue(following.exists())
+                raise RuntimeError
+        self.assertFalse(following.exists())
+
+    def test_untracked_writes_keep_versions(self):
+        """Записи в таблицы без кэшированных запросов и в
+        неотображаемые столбцы не меняют версий."""
+        tag = TABLE_TAG.format(User._meta.db_table)
+        version = cache_tags.versions([tag])[tag]
+        self.client.force_login(self.author)
+        Post.objects.create(text=POST_TEXT, author=self.reader)
+        self.assertEqual(cache_tags.versions([tag])[tag], version)
+        User.objects.filter(pk=self.author.pk).update(username='renamed')
+        self.assertNotEqual(cache_tags.versions([tag])[tag], version)
+
+    def test_untracked_tables_not_cached(self):
+        """Запросы к таблицам не из QUERY_CACHE_TABLES не кэшируются:
+        записи в них версий не меняют."""
+        cached(Post.objects).count()
+        with self.assertNumQueries(1):
+            cached(Post.objects).count()
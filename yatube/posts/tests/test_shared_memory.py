@@ -0,0 +1,88 @@
+import multiprocessing
+import os
+import tempfile
+import threading
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from core.caches import shared_memory
+from core.caches.shared_memory import SharedMemoryCache
+
+
+def write_in_other_process(backend, key, value):
+    backend.set(key, value)
+
+
+class SharedMemoryCacheTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'cache.mmap')
+        self.params = {'OPTIONS': {'SIZE': 64 * 1024, 'BLOCK_SIZE': 1024}}
+        self.cache = SharedMemoryCache(self.path, self.params)
+
+    def run_threads(self, target, count=8):
+        threads = [threading.Thread(target=target) for _ in range(count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    def test_operations(self):
+        """Бэкенд поддерживает операции кэша Django."""
+        cache = self.cache
+        cache.set('key', {'value': 1})
+        self.assertEqual(cache.get('key'), {'value': 1})
+        self.assertFalse(cache.add('key', 2))
+        self.assertEqual(cache.get_many(['key', 'missing']),
+                         {'key': {'value': 1}})
+        cache.set('counter', 1)
+        self.assertEqual(cache.incr('counter', 2), 3)
+        cache.delete('key')
+        self.assertIsNone(cache.get('key'))
+        self.assertEqual(cache.set_many({'big': 'x' * 100 * 1024}), ['big'])
+        cache.set('expired', 1, -1)
+        self.assertFalse(cache.has_key('expired'))
+        cache.clear()
+        self.assertIsNone(cache.get('counter'))
+
+    def test_threads_share_one_mapping(self):
+        """Экземпляры кэша в разных потоках, как их создаёт Django,
+        не открывают файл заново и не мешают друг другу."""
+        self.cache.set('counter', 0)
+        fds = len(os.listdir('/proc/self/fd'))
+
+        def increment():
+            cache = SharedMemoryCache(self.path, self.params)
+            for _ in range(100):
+                cache.incr('counter')
+
+        self.run_threads(increment)
+        self.assertEqual(len(os.listdir('/proc/self/fd')), fds)
+        self.assertEqual(self.cache.get('counter'), 800)
+
+    def test_lru_eviction_within_budget(self):
+        """При нехватке места вытесняются давно не читанные записи."""
+        cache = self.cache
+        value = 'x' * 3000
+        cache.set('hot', value)
+        with mock.patch.object(shared_memory, 'EVICTION_SAMPLES',
+                               cache.slots):
+            for number in range(50):
+                cache.set(f'key{number}', value)
+                cache.get('hot')
+        self.assertEqual(cache.get('hot'), value)
+        self.assertIsNone(cache.get('key0'))
+        self.assertEqual(cache.get('key49'), value)
+
+    def test_other_process_write_visible(self):
+        """Запись другого процесса видна сразу."""
+        self.cache.set('shared', 'old')
+        worker = multiprocessing.get_context('fork').Process(
+            target=write_in_other_process,
+            args=(self.cache, 'shared', 'new'))
+        worker.start()
+        worker.join()
+        self.assertEqual(worker.exitcode, 0)
+        self.assertEqual(self.cache.get('shared'), 'new')
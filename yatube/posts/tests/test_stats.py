@@ -0,0 +1,87 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+
+from ..models import AuthorStats, Comment, Follow, Group, Post, User
+from .consts import (ANOTHER_NAME_USER, ANOTHER_SLUG, NAME_GROUP,
+                     NAME_USER, POST_TEXT, SLUG)
+
+
+class CountersTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username=NAME_USER)
+        cls.reader = User.objects.create_user(username=ANOTHER_NAME_USER)
+        cls.group = Group.objects.create(title=NAME_GROUP, slug=SLUG)
+        cls.another_group = Group.objects.create(title=NAME_GROUP,
+                                                 slug=ANOTHER_SLUG)
+
+    def assertCounters(self, instance, **expected):
+        instance.refresh_from_db()
+        for field, value in expected.items():
+            with self.subTest(field=field):
+                self.assertEqual(getattr(instance, field), value)
+
+    def test_post_counters(self):
+        """Счётчики постов автора и группы следуют за постами."""
+        post = Post.objects.create(text=POST_TEXT, author=self.author,
+                                   group=self.group)
+        self.assertCounters(self.author.stats, posts_count=1)
+        self.assertCounters(self.group, posts_count=1)
+        post.group = self.another_group
+        post.save()
+        self.assertCounters(self.group, posts_count=0)
+        self.assertCounters(self.another_group, posts_count=1)
+        post.delete()
+        self.assertCounters(self.author.stats, posts_count=0)
+        self.assertCounters(self.another_group, posts_count=0)
+
+    def test_comment_and_follow_counters(self):
+        """Счётчики комментариев и подписок следуют за данными."""
+        post = Post.objects.create(text=POST_TEXT, author=self.author)
+        comment = Comment.objects.create(post=post, author=self.reader,
+                                         text=POST_TEXT)
+        self.assertCounters(post, comments_count=1)
+        comment.delete()
+        self.assertCounters(post, comments_count=0)
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.assertCounters(self.author.stats, followers_count=1)
+        self.assertCounters(self.reader.stats, following_count=1)
+        Follow.objects.filter(user=self.reader).delete()
+        self.assertCounters(self.author.stats, followers_count=0)
+        self.assertCounters(self.reader.stats, following_count=0)
+
+    def test_rebuild_counters(self):
+        """Команда rebuild_counters исправляет разошедшиеся счётчики."""
+        Post.objects.create(text=POST_TEXT, author=self.author,
+                            group=self.group)
+        Follow.objects.create(user=self.reader, author=self.author)
+        AuthorStats.objects.update(posts_count=7, followers_count=7,
+                                   following_count=7)
+        Group.objects.update(posts_count=7)
+        call_command('rebuild_counters', stdout=StringIO())
+        self.assertCounters(self.author.stats, posts_count=1,
+                            followers_count=1, following_count=0)
+        self.assertCounters(self.reader.stats, following_count=1)
+        self.assertCounters(self.group, posts_count=1)
+
+    def test_drifted_counter_not_negative(self):
+        """Удаление комментария, созданного в обход сигналов, не опускает
+        счётчик ниже нуля."""
+        post = Post.objects.create(text=POST_TEXT, author=self.author)
+        Comment.objects.bulk_create(
+            [Comment(post=post, author=self.reader, text=POST_TEXT)])
+        Comment.objects.get(post=post).delete()
+        self.assertCounters(post, comments_count=0)
+
+    def test_follow_index_without_stats(self):
+        """Страница подписок открывается у пользователя без строки
+        счётчиков."""
+        AuthorStats.objects.filter(user=self.reader).delete()
+        self.client.force_login(User.objects.get(pk=self.reader.pk))
+        response = self.client.get(reverse('posts:follow_index'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['count'], 0)
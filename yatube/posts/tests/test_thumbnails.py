@@ -0,0 +1,169 @@
+import os
+import shutil
+import tempfile
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+
+from core import cache_tags as tags
+
+from .. import cache_tags, thumbnails
+from ..models import Post, User
+from .consts import NAME_USER, POST_TEXT, TEST_GIF
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ThumbnailsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username=NAME_USER)
+        cls.post = Post.objects.create(
+            text=POST_TEXT, author=cls.author,
+            image=SimpleUploadedFile('pic.gif', TEST_GIF, 'image/gif'))
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_generate(self):
+        """generate создаёт миниатюры, lookup их находит, а страницы
+        поста сбрасываются."""
+        self.assertIsNone(thumbnails.lookup(self.post.image, 'card'))
+        tag = cache_tags.post_tag(self.post.pk)
+        version = tags.versions([tag])[tag]
+        thumbnails.generate(self.post.pk)
+        picture = thumbnails.lookup(self.post.image, 'card')
+        self.assertIsNotNone(picture)
+        self.assertEqual((picture.width, picture.height), (960, 339))
+        for width in settings.THUMBNAIL_WIDTHS:
+            self.assertIn(f' {width}w', picture.srcset)
+        self.assertEqual(
+            [mime_type for mime_type, _ in picture.sources],
+            [thumbnails.MIME_TYPES[format] for format in thumbnails.formats()])
+        self.assertNotEqual(tags.versions([tag])[tag], version)
+
+    @override_settings(THUMBNAIL_FORMATS=('PNG', 'NOSUCHFORMAT'))
+    def test_picture_markup(self):
+        """Варианты современных форматов выводятся в <source> со
+        srcset, форматы без кодировщика пропускаются."""
+        thumbnails.generate(self.post.pk)
+        response = self.client.get(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}))
+        picture = thumbnails.lookup(self.post.image, 'card')
+        self.assertEqual(picture.sources, [
+            ('image/png', ', '.join(
+                f'{file.url} {width}w' for format, width, file
+                in picture.files if format == 'PNG'))])
+        self.assertContains(response, '<source type="image/png" srcset="')
+        self.assertContains(response, f'srcset="{picture.srcset}"')
+        self.assertContains(response, 'width="960" height="339"')
+
+    def test_lookup_many(self):
+        """lookup_many ищет миниатюры всех картинок одним запросом,
+        а повторно — только в кэше."""
+        thumbnails.create(self.post.image)
+        cache.clear()
+        images = [self.post.image, Post(image='posts/none.jpg').image]
+        with self.assertNumQueries(1):
+            found = thumbnails.lookup_many(images, 'card')
+        with self.assertNumQueries(0):
+            again = thumbnails.lookup_many(images, 'card')
+        picture = thumbnails.lookup(self.post.image, 'card')
+        for result in found, again:
+            self.assertEqual(
+                {name: picture and picture.srcset
+                 for name, picture in result.items()},
+                {self.post.image.name: picture.srcset,
+                 'posts/none.jpg': None})
+
+    def test_lookup_does_not_generate(self):
+        """lookup не создаёт миниатюру сам."""
+        with mock.patch('PIL.Image.open') as image_open:
+            self.assertIsNone(thumbnails.lookup(self.post.image, 'card'))
+        image_open.assert_not_called()
+        self.assertIsNone(thumbnails.lookup(self.post.image, 'card'))
+
+
+class ScheduleTests(TransactionTestCase):
+    def test_scheduled_on_commit(self):
+        """Пост с картинкой уходит в пул после фиксации транзакции."""
+        author = User.objects.create_user(username=NAME_USER)
+        with mock.patch('posts.thumbnails.schedule') as schedule:
+            Post.objects.create(text=POST_TEXT, author=author)
+            post = Post.objects.create(text=POST_TEXT, author=author,
+                                       image='posts/none.jpg')
+        schedule.assert_called_once_with([post.pk])
+
+    def test_not_scheduled_without_new_image(self):
+        """Правка поста без новой картинки не отправляет его в пул."""
+        author = User.objects.create_user(username=NAME_USER)
+        with mock.patch('posts.thumbnails.schedule') as schedule:
+            post = Post.objects.create(text=POST_TEXT, author=author,
+                                       image='posts/old.jpg')
+            schedule.reset_mock()
+            post.text = 'Новый текст'
+            post.save()
+            schedule.assert_not_called()
+            post.image = 'posts/new.jpg'
+            post.save()
+        schedule.assert_called_once_with([post.pk])
+
+    @override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+    def test_workers_get_parent_settings(self):
+        """Процессы пула работают с базой, кэшами и MEDIA_ROOT
+        родителя, а не с настройками по умолчанию."""
+        overrides, = thumbnails.pool.initargs()
+        self.assertEqual(overrides['MEDIA_ROOT'], TEMP_MEDIA_ROOT)
+        self.assertEqual(overrides['DATABASES'], settings.DATABASES)
+        self.assertEqual(overrides['CACHES'], settings.CACHES)
+        self.assertIn('THUMBNAIL_SIZES', overrides)
+
+    def test_dead_worker_replaced(self):
+        """После гибели процесса пула посты снова уходят в пул."""
+        future = thumbnails.pool.submit(os._exit, 1)
+        with self.assertRaises(BrokenProcessPool):
+            future.result()
+        with mock.patch.object(thumbnails, 'generate', abs):
+            future, = thumbnails.schedule([-1])
+        self.assertEqual(future.result(30), 1)
+
+    def test_failures_logged(self):
+        """Ошибки задачи, в том числе до создания миниатюр, пишутся
+        в лог."""
+        with mock.patch('posts.models.Post.objects.filter',
+                        side_effect=RuntimeError), \
+                self.assertLogs('posts.thumbnails', 'ERROR'):
+            thumbnails.generate(1)
+        future = Future()
+        future.set_exception(BrokenProcessPool())
+        with self.assertLogs('posts.thumbnails', 'ERROR'):
+            thumbnails._check(1, future)
+
+    def test_backfill_skips_ready(self):
+        """thumbnails_backfill отправляет в пул только посты без
+        готовых миниатюр."""
+        author = User.objects.create_user(username=NAME_USER)
+        with mock.patch('posts.thumbnails.schedule',
+                        return_value=[]) as schedule:
+            ready, pending = (
+                Post.objects.create(text=POST_TEXT, author=author,
+                                    image=f'posts/{name}.jpg')
+                for name in ('ready', 'pending'))
+            with mock.patch('posts.thumbnails.lookup',
+                            lambda image, size: image == ready.image or None):
+                call_command('thumbnails_backfill', stdout=StringIO())
+        schedule.assert_called_with([pending.pk])
@@ -0,0 +1,121 @@
+from unittest import mock
+
+from django.test import TestCase, TransactionTestCase
+from django.urls import reverse
+
+from .. import timeline
+from ..models import AuthorStats, Follow, Post, TimelineEntry, User
+from .consts import ANOTHER_NAME_USER, NAME_USER, POST_TEXT
+
+
+class TimelineTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username=NAME_USER)
+        cls.author = User.objects.create_user(username=ANOTHER_NAME_USER)
+        cls.old_post = Post.objects.create(text=POST_TEXT, author=cls.author)
+
+    def test_follow_backfills_and_unfollow_prunes(self):
+        """Подписка добавляет старые посты в ленту, отписка убирает."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=self.reader, post=self.old_post).exists())
+        Follow.objects.filter(user=self.reader, author=self.author).delete()
+        self.assertFalse(
+            TimelineEntry.objects.filter(user=self.reader).exists())
+
+    def test_new_post_fans_out(self):
+        """Новый пост раскладывается по лентам подписчиков."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        post = Post.objects.create(text=POST_TEXT, author=self.author)
+        self.assertEqual(list(timeline.feed(self.reader)),
+                         [post, self.old_post])
+
+    @mock.patch.object(timeline, 'FANOUT_FOLLOWERS_LIMIT', 0)
+    def test_popular_author_is_pulled(self):
+        """Посты популярного автора не раскладываются,
+        а подтягиваются при чтении ленты."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        post = Post.objects.create(text=POST_TEXT, author=self.author)
+        self.assertFalse(TimelineEntry.objects.filter(post=post).exists())
+        self.assertEqual(list(timeline.feed(self.reader)),
+                         [post, self.old_post])
+
+    @mock.patch.object(timeline, 'FANOUT_FOLLOWERS_LIMIT', 1)
+    def test_author_below_limit_again_is_pulled_until_spread(self):
+        """Посты, опубликованные, пока автор подтягивался, остаются в
+        лентах, когда подписчиков снова становится не больше лимита,
+        а новые посты снова раскладываются."""
+        other = User.objects.create_user(username='other')
+        Follow.objects.create(user=self.reader, author=self.author)
+        Follow.objects.create(user=other, author=self.author)
+        post = Post.objects.create(text=POST_TEXT, author=self.author)
+        Follow.objects.filter(user=other).delete()
+        new_post = Post.objects.create(text=POST_TEXT, author=self.author)
+        self.assertTrue(TimelineEntry.objects.filter(post=new_post).exists())
+        self.assertEqual(list(timeline.feed(self.reader)),
+                         [new_post, post, self.old_post])
+
+    @mock.patch.object(timeline, 'FANOUT_BATCH_SIZE', 1)
+    @mock.patch.object(timeline, 'FANOUT_FOLLOWERS_LIMIT', 2)
+    def test_spread_copies_only_posts_since_switch(self):
+        """spread раскладывает по лентам всех подписчиков только посты,
+        опубликованные после перехода лимита, и перестаёт подтягивать
+        автора."""
+        others = [User.objects.create_user(username=f'other{number}')
+                  for number in range(2)]
+        Follow.objects.create(user=self.reader, author=self.author)
+        for other in others:
+            Follow.objects.create(user=other, author=self.author)
+        since = AuthorStats.objects.get(user=self.author).pulled_since
+        self.assertIsNotNone(since)
+        post = Post.objects.create(text=POST_TEXT, author=self.author)
+        Follow.objects.filter(user=others[0]).delete()
+        # в запросе только читается pulled_since
+        with self.assertNumQueries(1):
+            timeline.settle(self.author.pk)
+        TimelineEntry.objects.filter(post=self.old_post).delete()
+        timeline.spread(self.author.pk, since)
+        self.assertEqual(
+            set(TimelineEntry.objects.values_list('user', 'post')),
+            {(self.reader.pk, post.pk), (others[1].pk, post.pk)})
+        self.assertIsNone(
+            AuthorStats.objects.get(user=self.author).pulled_since)
+        self.assertEqual(list(timeline.pulled_authors(self.reader)), [])
+
+    @mock.patch.object(timeline, 'FANOUT_FOLLOWERS_LIMIT', 0)
+    def test_spread_keeps_author_over_limit_again_pulled(self):
+        """Если за время раскладки автор снова перешёл лимит, он
+        продолжает подтягиваться."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        since = AuthorStats.objects.get(user=self.author).pulled_since
+        timeline.spread(self.author.pk, since)
+        self.assertEqual(
+            AuthorStats.objects.get(user=self.author).pulled_since, since)
+
+    def test_follow_index_reads_timeline(self):
+        """Страница подписок показывает посты из ленты."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.client.force_login(self.reader)
+        response = self.client.get(reverse('posts:follow_index'))
+        self.assertEqual(list(response.context['page_obj']),
+                         [self.old_post])
+
+
+class SettleTests(TransactionTestCase):
+    @mock.patch.object(timeline, 'FANOUT_FOLLOWERS_LIMIT', 1)
+    def test_settle_scheduled_on_commit(self):
+        """Раскладка постов уходит в пул после фиксации отписки, а не
+        выполняется в запросе."""
+        author = User.objects.create_user(username=ANOTHER_NAME_USER)
+        readers = [User.objects.create_user(username=f'reader{number}')
+                   for number in range(2)]
+        for reader in readers:
+            Follow.objects.create(user=reader, author=author)
+        since = AuthorStats.objects.get(user=author).pulled_since
+        with mock.patch.object(timeline, 'schedule') as schedule, \
+                mock.patch.object(timeline, 'spread') as spread:
+            Follow.objects.filter(user=readers[0]).delete()
+        spread.assert_not_called()
+        schedule.assert_called_once_with(author.pk, since)
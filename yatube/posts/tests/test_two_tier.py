@@ -0,0 +1,63 @@
+import multiprocessing
+import os
+import tempfile
+from unittest import mock
+
+from django.core.cache import caches
+from django.test import SimpleTestCase
+
+from core.caches import two_tier
+
+
+def write_in_other_process(key, value):
+    caches['two_tier'].set(key, value)
+
+
+class TwoTierCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.cache = caches['two_tier']
+        self.cache.clear()
+
+    def test_hot_key_served_from_memory(self):
+        """Повторное чтение не обращается к общему кэшу."""
+        self.cache.set('hot', [1, 2])
+        with mock.patch.object(self.cache.shared, 'get_many') as shared_get:
+            value = self.cache.get('hot')
+            value.append(3)
+            self.assertEqual(self.cache.get('hot'), [1, 2])
+        shared_get.assert_not_called()
+
+    def test_other_process_write_invalidates(self):
+        """Запись другого процесса сбрасывает ключ в LRU."""
+        self.cache.set('shared', 'old')
+        self.assertEqual(self.cache.get('shared'), 'old')
+        worker = multiprocessing.get_context('fork').Process(
+            target=write_in_other_process, args=('shared', 'new'))
+        worker.start()
+        worker.join()
+        self.assertEqual(worker.exitcode, 0)
+        self.assertEqual(self.cache.get('shared'), 'new')
+
+    def test_local_tier_bounded(self):
+        """LRU процесса не растёт больше MAX_ENTRIES."""
+        local = self.cache.local
+        with mock.patch.object(local, 'max_entries', 5):
+            self.cache.set_many({f'key{i}': i for i in range(10)})
+            self.assertEqual(len(local.entries), 5)
+        self.assertNotIn(self.cache.make_key('key0'), local.entries)
+        self.assertIn(self.cache.make_key('key9'), local.entries)
+
+    @mock.patch.object(two_tier, 'PRUNE_INTERVAL', 5)
+    @mock.patch.object(two_tier, 'LOG_SIZE', 3)
+    def test_channel_pruned_periodically(self):
+        """Журнал обрезается до LOG_SIZE записей раз в PRUNE_INTERVAL
+        записей, а не при каждой."""
+        counts = []
+        with tempfile.TemporaryDirectory() as directory:
+            channel = two_tier.InvalidationChannel(
+                os.path.join(directory, 'invalidation.sqlite3'))
+            for number in range(12):
+                channel.publish('origin', [f'key{number}'])
+                counts.append(channel.connection.execute(
+                    'SELECT count(*) FROM invalidation').fetchone()[0])
+        self.assertEqual(counts, [1, 2, 3, 4, 3, 4, 5, 6, 7, 3, 4, 5])
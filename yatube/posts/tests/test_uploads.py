@@ -0,0 +1,151 @@
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from io import BytesIO
+from unittest import mock
+
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import SimpleTestCase, TestCase, override_settings
+from PIL import Image
+
+from .. import uploads
+from ..forms import PostForm
+from ..image_info import EXIF_ORIENTATION
+from ..models import User
+from .consts import NAME_USER, POST_TEXT
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+def upload(image, name, format, **params):
+    file = BytesIO()
+    image.save(file, format, **params)
+    return SimpleUploadedFile(name, file.getvalue())
+
+
+class NormalizeTests(SimpleTestCase):
+    def test_jpeg(self):
+        """JPEG уменьшается, поворачивается по EXIF, теряет EXIF и
+        сохраняется прогрессивным."""
+        exif = Image.Exif()
+        exif[EXIF_ORIENTATION] = 6
+        file = upload(Image.new('RGB', (3000, 1000), 'red'), 'pic.jpg',
+                      'JPEG', exif=exif.tobytes())
+        data, image_format, _ = uploads.normalize(
+            file.read(), 10 ** 7, (500, 500), 85)
+        self.assertEqual(image_format, 'JPEG')
+        with Image.open(BytesIO(data)) as image:
+            self.assertEqual(image.size, (167, 500))
+            self.assertTrue(image.info.get('progressive'))
+            self.assertNotIn('exif', image.info)
+
+    def test_pixel_limit(self):
+        """Рабочий процесс не декодирует картинку больше лимита."""
+        file = upload(Image.new('RGB', (100, 100)), 'pic.png', 'PNG')
+        with self.assertRaises(uploads.ImageTooLarge):
+            uploads.normalize(file.read(), 100, (500, 500), 85)
+
+    def animation(self, size, frames=2):
+        file = BytesIO()
+        images = [Image.new('P', size, color) for color in range(frames)]
+        images[0].save(file, 'GIF', save_all=True, append_images=images[1:],
+                       duration=[100, 200][:frames], comment=b'secret')
+        return file.getvalue()
+
+    def test_animated(self):
+        """У анимации уменьшается каждый кадр, а метаданные теряются."""
+        data, image_format, fields = uploads.normalize(
+            self.animation((10, 10)), 10 ** 7, (5, 5), 85)
+        self.assertEqual(image_format, 'GIF')
+        self.assertEqual((fields['image_width'], fields['image_height']),
+                         (5, 5))
+        with Image.open(BytesIO(data)) as image:
+            self.assertEqual((image.size, image.n_frames), ((5, 5), 2))
+            self.assertNotIn('comment', image.info)
+
+    def test_animated_pixel_limit(self):
+        """Лимит пикселей действует на все кадры анимации вместе."""
+        with self.assertRaises(uploads.ImageTooLarge):
+            uploads.normalize(self.animation((10, 10)), 150, (5, 5), 85)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class PostFormUploadTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def form(self, file):
+        return PostForm({'text': POST_TEXT}, {'image': file})
+
+    @override_settings(UPLOAD_IMAGE_MAX_SIZE=(50, 50))
+    def test_normalized_in_pool(self):
+        """Форма сохраняет уменьшенную в пуле процессов копию, и там же
+        вычисляются сведения о картинке."""
+        form = self.form(upload(
+            Image.new('RGB', (200, 100), 'red'), 'pic.gif', 'GIF'))
+        with mock.patch('posts.image_info.describe') as describe:
+            self.assertTrue(form.is_valid(), form.errors)
+            form.instance.author = User.objects.create_user(NAME_USER)
+            post = form.save()
+        describe.assert_not_called()
+        self.assertEqual((post.image_width, post.image_height), (50, 25))
+        image = form.cleaned_data['image']
+        self.assertEqual(image.name, 'pic.png')
+        with Image.open(image) as stored:
+            self.assertEqual((stored.format, stored.size), ('PNG', (50, 25)))
+
+    def test_dead_worker_replaced(self):
+        """Пул, процесс которого погиб, создаётся заново, и загрузка
+        проходит."""
+        future = uploads.pool.submit(os._exit, 1)
+        with self.assertRaises(BrokenProcessPool):
+            future.result()
+        form = self.form(upload(Image.new('RGB', (2, 2)), 'pic.png', 'PNG'))
+        self.assertTrue(form.is_valid(), form.errors)
+
+    def test_hung_worker_replaced(self):
+        """Пул с процессом, не уложившимся в срок, выбрасывается вместе
+        с процессом."""
+        future = uploads.pool.submit(time.sleep, 60)
+        executor = future.executor
+        processes = list(executor._processes.values())
+        with self.assertRaises(TimeoutError):
+            uploads.pool.result(future, 0.1)
+        self.assertIsNot(uploads.pool._executor(), executor)
+        for process in processes:
+            process.join(5)
+            self.assertFalse(process.is_alive())
+
+    def test_hung_worker_is_form_error(self):
+        """Не дождавшись процесса пула, форма сообщает об ошибке."""
+        form = self.form(upload(Image.new('RGB', (2, 2)), 'pic.png', 'PNG'))
+        with mock.patch.object(uploads.pool, 'result',
+                               side_effect=TimeoutError):
+            self.assertFalse(form.is_valid())
+        self.assertEqual(form.errors.as_data()['image'][0].code,
+                         'processing_failed')
+
+    @override_settings(UPLOAD_IMAGE_MAX_PIXELS=100)
+    def test_header_checked_before_decoding(self):
+        """Слишком большая картинка отклоняется по заголовку, не
+        попадая в пул."""
+        with mock.patch('posts.uploads.process') as process:
+            form = self.form(upload(Image.new('RGB', (20, 20)),
+                                    'pic.png', 'PNG'))
+            self.assertFalse(form.is_valid())
+        process.assert_not_called()
+        self.assertEqual(form.errors.as_data()['image'][0].code,
+                         'too_many_pixels')
+
+    def test_format_checked(self):
+        """Форматы не из UPLOAD_IMAGE_FORMATS отклоняются."""
+        form = self.form(upload(Image.new('RGB', (2, 2)), 'pic.bmp', 'BMP'))
+        self.assertFalse(form.is_valid())
+        self.assertEqual(form.errors.as_data()['image'][0].code,
+                         'invalid_format')
@@ -1,3 +1,4 @@
+from django.core.cache import cache
 from django.test import TestCase, Client
 
 from datetime import datetime as dt
@@ -41,6 +42,8 @@ class PostsURLTests(TestCase):
         }
 
     def setUp(self):
+        # чистим кэш, чтобы главная страница не отдавалась из кэша
+        cache.clear()
         # Создаем неавторизованный клиент
         self.guest_client = Client()
 
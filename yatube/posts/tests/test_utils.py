@@ -0,0 +1,95 @@
+import base64
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.paginator import EmptyPage
+from django.test import RequestFactory, TestCase
+
+from .. import counts
+from ..consts import POSTS_COUNT
+from ..models import Group, Post, User
+from ..utils import CachedCountPaginator, decode_cursor, paginator
+from .consts import NAME_GROUP, NAME_USER, POST_TEXT, SLUG
+
+
+class CachedCountPaginatorTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username=NAME_USER)
+        cls.group = Group.objects.create(title=NAME_GROUP, slug=SLUG)
+        Post.objects.bulk_create(
+            Post(text=POST_TEXT, author=cls.author, group=cls.group)
+            for _ in range(POSTS_COUNT * 3)
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.request = RequestFactory().get('/')
+
+    def test_total_is_cached(self):
+        """Итог считается один раз и берётся из кэша."""
+        posts = self.group.posts_by_group.all()
+        scope = f'group:{self.group.pk}'
+        self.assertEqual(paginator(self.request, posts, scope).paginator.count,
+                         POSTS_COUNT * 3)
+        with self.assertNumQueries(0):
+            page_obj = CachedCountPaginator(posts, POSTS_COUNT, scope)
+            self.assertEqual(page_obj.count, POSTS_COUNT * 3)
+
+    def test_total_is_invalidated_on_write(self):
+        """Новый пост сбрасывает итоги своих областей."""
+        posts = self.group.posts_by_group.all()
+        paginator(self.request, posts, f'group:{self.group.pk}')
+        Post.objects.create(text=POST_TEXT, author=self.author,
+                            group=self.group)
+        page_obj = paginator(self.request, posts, f'group:{self.group.pk}')
+        self.assertEqual(page_obj.paginator.count, POSTS_COUNT * 3 + 1)
+
+    @mock.patch.object(counts, 'COUNT_CAP', POSTS_COUNT)
+    def test_approximate_total(self):
+        """Холодный подсчёт с упором в предел даёт приблизительный итог,
+        а страницы за ним остаются доступны."""
+        request = RequestFactory().get('/', {'page': 3})
+        page_obj = paginator(request, Post.objects.all(), 'all')
+        self.assertTrue(page_obj.paginator.approximate)
+        self.assertEqual(page_obj.number, 3)
+        self.assertEqual(len(page_obj), POSTS_COUNT)
+        self.assertEqual(page_obj.page_window[-1],
+                         CachedCountPaginator.ELLIPSIS)
+        # «Следующая» ведёт на номер за последней известной страницей
+        self.assertTrue(page_obj.has_more)
+        self.assertEqual(page_obj.next_page_number(), 4)
+
+    @mock.patch.object(counts, 'COUNT_CAP', POSTS_COUNT)
+    def test_approximate_total_past_data(self):
+        """Номер страницы за данными при приблизительном итоге ведёт
+        на последнюю страницу, как при точном."""
+        request = RequestFactory().get('/', {'page': 100})
+        page_obj = paginator(request, Post.objects.all(), 'all')
+        self.assertFalse(page_obj.paginator.approximate)
+        self.assertEqual(page_obj.number, 3)
+        self.assertEqual(len(page_obj), POSTS_COUNT)
+        pages = CachedCountPaginator(Post.objects.all(), POSTS_COUNT, 'all')
+        with self.assertRaises(EmptyPage):
+            pages.page(100)
+
+    def test_page_window(self):
+        """В окне номеров есть только соседи текущей страницы и края."""
+        pages = CachedCountPaginator(range(1000), POSTS_COUNT)
+        self.assertEqual(
+            list(pages.get_elided_page_range(50)),
+            [1, '…', 47, 48, 49, 50, 51, 52, 53, '…', 100])
+        self.assertEqual(list(pages.get_elided_page_range(2)),
+                         [1, 2, 3, 4, 5, '…', 100])
+
+    def test_out_of_range_cursor(self):
+        """Токен с позицией вне допустимых дат и id считается битым,
+        лента открывается с начала."""
+        for raw in (f'{10 ** 20}:1', f'{10 ** 18}:1', f'{-10 ** 17}:1',
+                    f'0:{2 ** 64}'):
+            token = base64.urlsafe_b64encode(raw.encode()).decode()
+            with self.subTest(raw=raw):
+                self.assertIsNone(decode_cursor(token))
+                response = self.client.get('/', {'after': token})
+                self.assertEqual(response.status_code, 200)
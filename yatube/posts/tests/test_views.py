@@ -4,6 +4,8 @@ from django.db import models
 from django.conf import settings
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 
 from datetime import datetime as dt
 import tempfile
@@ -20,7 +22,8 @@ from .consts import (NAME_USER,
                      TEST_GIF)
 from ..consts import POSTS_COUNT
 from ..forms import PostForm
-from ..models import Group, Follow, Post, User
+from ..models import Comment, Group, Follow, Post, User
+from ..utils import encode_cursor
 
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
 
@@ -100,9 +103,8 @@ class PostsViewsTests(TestCase):
             reverse('posts:post_detail', kwargs={'post_id': self.post.pk}))
         context_types = {
             'post': Post,
-            'posts': models.query.QuerySet,
             'short_post': str,
-            'imposter': bool
+            'comments': models.query.QuerySet,
         }
         for value, expected in context_types.items():
             with self.subTest(f'Проверяется {value}'):
@@ -206,6 +208,7 @@ class PostsViewsTests(TestCase):
         response = self.authorized_client.get(
             URL_REVERSE['group2'])
         self.assertEqual(len(response.context['posts']), 0)
+        group2_content = response.content
 
         # делаем новый пост
         Post.objects.create(
@@ -219,10 +222,11 @@ class PostsViewsTests(TestCase):
         response = self.authorized_client.get(
             URL_REVERSE['group1'])
         self.assertEqual(len(response.context['posts']), 2)
-        # проверка появления в неправильной группе (подсчёт, сколько стало)
+        # в неправильной группе пост не появился: её страница не
+        # сброшена и отдаётся из кэша
         response = self.authorized_client.get(
             URL_REVERSE['group2'])
-        self.assertEqual(len(response.context['posts']), 0)
+        self.assertEqual(response.content, group2_content)
 
     def test_image_in_context(self):
         """Проверяет наличие картинки в контексте страницы."""
@@ -244,19 +248,20 @@ class PostsViewsTests(TestCase):
                 self.assertEqual(None, result)
 
     def test_cache_index(self):
-        """Проверяем, что index кэшируется."""
+        """Проверяем, что index кэшируется и сбрасывается при записи."""
         check1 = self.authorized_client.get(
             URL_REVERSE['index']).content
-        # делаем новый пост
+        # изменение в обход сигналов не сбрасывает кэш
+        Post.objects.update(excerpt=POST_TEXT + '!')
+        check2 = self.authorized_client.get(
+            URL_REVERSE['index']).content
+        self.assertEqual(check1, check2)
+        # новый пост виден сразу
         Post.objects.create(
             text=POST_TEXT,
             author=self.user,
             group=self.group
         )
-        check2 = self.authorized_client.get(
-            URL_REVERSE['index']).content
-        self.assertEqual(check1, check2)
-        cache.clear()
         check3 = self.authorized_client.get(
             URL_REVERSE['index']).content
         self.assertNotEqual(check3, check1)
@@ -390,3 +395,80 @@ class PaginatorViewsTest(TestCase):
                     response = self.client.get(
                         reverse(reverse_name) + '?page=2')
                 self.assertEqual(len(response.context['page_obj']), 1)
+
+    def test_cursor_paginator(self):
+        """Курсорная пагинация проходит ленту без пропусков и повторов
+        и не сдвигается при появлении новых постов."""
+        expected = list(Post.objects.order_by('-pub_date', '-pk'))
+        response = self.client.get(
+            reverse('posts:profile',
+                    kwargs={'username': self.my_author.username}))
+        page_obj = response.context['page_obj']
+        self.assertContains(response, '?page=2')
+        self.assertNotContains(response, '?after=')
+        token = encode_cursor(page_obj[-1])
+        Post.objects.create(text=POST_TEXT, author=self.my_author)
+        response = self.client.get(
+            reverse('posts:profile',
+                    kwargs={'username': self.my_author.username}),
+            {'after': token})
+        page_obj = response.context['page_obj']
+        self.assertEqual(list(page_obj), expected[POSTS_COUNT:])
+        self.assertContains(response, '?before=')
+        self.assertTrue(page_obj.has_previous())
+        self.assertFalse(page_obj.has_next())
+        response = self.client.get(
+            reverse('posts:profile',
+                    kwargs={'username': self.my_author.username}),
+            {'before': page_obj.previous_cursor})
+        self.assertEqual(list(response.context['page_obj']),
+                         expected[:POSTS_COUNT])
+
+
+class ListingQueriesTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username=NAME_USER)
+        cls.group = Group.objects.create(title=NAME_GROUP, slug=SLUG)
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.reader)
+
+    def add_posts(self, count):
+        start = Group.objects.count()
+        for i in range(start, start + count):
+            author = User.objects.create_user(username=f'author{i}')
+            Follow.objects.create(user=self.reader, author=author)
+            group = Group.objects.create(title=f'group{i}', slug=f'group{i}')
+            Post.objects.create(text=POST_TEXT, author=author, group=group)
+            Comment.objects.create(post=Post.objects.create(
+                text=POST_TEXT, author=author, group=self.group),
+                author=self.reader, text=POST_TEXT)
+
+    def count_queries(self, address):
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(address)
+        return len(queries)
+
+    def test_listing_queries_do_not_grow(self):
+        """Число запросов страниц со списками не растёт с числом
+        авторов и групп на странице."""
+        self.add_posts(1)
+        post = Post.objects.first()
+        addresses = [
+            URL_REVERSE['index'],
+            URL_REVERSE['group1'],
+            URL_REVERSE['posts_follow'],
+            reverse('posts:profile', kwargs={'username': 'author1'}),
+            reverse('posts:post_detail', kwargs={'post_id': post.pk}),
+        ]
+        before = [self.count_queries(address) for address in addresses]
+        self.add_posts(POSTS_COUNT)
+        Comment.objects.bulk_create(
+            Comment(post=post, author=author, text=POST_TEXT)
+            for author in User.objects.all())
+        after = [self.count_queries(address) for address in addresses]
+        self.assertEqual(before, after)
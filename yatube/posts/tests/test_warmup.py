@@ -0,0 +1,47 @@
+from django.core.cache import cache
+from django.test import TransactionTestCase, override_settings
+from django.urls import reverse
+
+from ..models import Group, Post, User
+from ..warmup import hot_urls, warm
+from .consts import NAME_GROUP, NAME_USER, POST_TEXT, SLUG
+
+
+class WarmupTests(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        author = User.objects.create_user(username=NAME_USER)
+        group = Group.objects.create(title=NAME_GROUP, slug=SLUG)
+        self.post = Post.objects.create(text=POST_TEXT, author=author,
+                                        group=group)
+
+    def test_hot_pages_rendered_into_cache(self):
+        """После прогрева популярные страницы отдаются из кэша."""
+        pages = {
+            reverse('posts:index'): 'posts/index.html',
+            reverse('posts:group_list', kwargs={'slug': SLUG}):
+                'posts/group_list.html',
+            reverse('posts:profile', kwargs={'username': NAME_USER}):
+                'posts/profile.html',
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}):
+                'posts/post_detail.html',
+        }
+        urls = hot_urls(pages=1, top=1)
+        self.assertEqual(set(urls), set(pages))
+        results = warm(urls, workers=2, host='testserver')
+        self.assertEqual([status for _, status, _ in results],
+                         [200] * len(urls))
+        for address, template in pages.items():
+            with self.subTest(address=address):
+                self.assertTemplateNotUsed(self.client.get(address),
+                                           template)
+
+    @override_settings(WARM_CACHE_SECURE=True)
+    def test_secure_pages_warmed(self):
+        """При WARM_CACHE_SECURE прогреваются страницы, которые отдаются
+        по https."""
+        address = reverse('posts:index')
+        warm([address], workers=1, host='testserver')
+        self.assertTemplateUsed(self.client.get(address), 'posts/index.html')
+        self.assertTemplateNotUsed(self.client.get(address, secure=True),
+                                   'posts/index.html')
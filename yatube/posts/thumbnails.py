@@ -0,0 +1,258 @@
+"""Миниатюры картинок постов, подготовленные заранее.
+
+Размеры миниатюр объявлены в settings.THUMBNAIL_SIZES: имя размера ->
+(геометрия 'ШxВ', опции sorl-thumbnail). Каждый размер создаётся в
+нескольких вариантах: шириной из settings.THUMBNAIL_WIDTHS (не больше
+ширины размера, которая добавляется всегда) в формате sorl по
+умолчанию и в каждом современном формате из THUMBNAIL_FORMATS, который
+умеет кодировать установленный Pillow. AVIF появляется, если
+установлен pillow-avif-plugin. Шаблоны выводят варианты разметкой
+<picture> со srcset, и формат и ширину выбирает браузер: кэшированные
+страницы не зависят от заголовка Accept.
+
+После сохранения поста с картинкой schedule() отправляет его в пул
+процессов, который декодирует картинку один раз, создаёт все варианты
+всех размеров и сдвигает теги страниц поста, чтобы они
+перерендерились уже с миниатюрами. Пул (core.pools) получает базу,
+кэши, MEDIA_ROOT и настройки миниатюр родителя; ошибки задач пишутся
+в лог. Для старых картинок есть команда
+thumbnails_backfill, для сравнения форматов — bench_thumbnails.
+
+lookup() только ищет готовые варианты в хранилище ключей sorl и
+никогда не открывает картинку: пока готовы не все варианты, шаблоны
+выводят оригинал. lookup_many() ищет миниатюры всех картинок страницы
+сразу: одним get_many кэша sorl и одним запросом к его таблице для
+промахов.
+"""
+import logging
+from functools import partial
+
+from django.conf import settings
+from PIL import Image
+from sorl.thumbnail import default
+from sorl.thumbnail.base import EXTENSIONS
+from sorl.thumbnail.conf import defaults as sorl_defaults
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.images import ImageFile, deserialize_image_file
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.kvstores.cached_db_kvstore import (
+    EMPTY_VALUE, KVStore as CachedDbKVStore)
+from sorl.thumbnail.models import KVStore
+
+from core.pools import ProcessPool, current_settings, setup_django
+
+try:
+    import pillow_avif  # noqa: F401 регистрирует AVIF в Pillow
+except ImportError:
+    pass
+else:
+    EXTENSIONS.setdefault('AVIF', 'avif')
+
+logger = logging.getLogger(__name__)
+
+MIME_TYPES = {'AVIF': 'image/avif', 'WEBP': 'image/webp'}
+# настройки родителя, с которыми работают процессы пула
+WORKER_SETTINGS = ('DATABASES', 'CACHES', 'MEDIA_ROOT', 'MEDIA_URL')
+
+pool = ProcessPool(
+    'THUMBNAIL_WORKERS', initializer=setup_django,
+    initargs=lambda: (current_settings(WORKER_SETTINGS, ['THUMBNAIL_']),))
+
+
+def formats():
+    """Современные форматы из THUMBNAIL_FORMATS, доступные Pillow
+    и sorl, в порядке предпочтения."""
+    Image.init()
+    return [format for format in settings.THUMBNAIL_FORMATS
+            if format in Image.SAVE and format in EXTENSIONS]
+
+
+def variants(size):
+    """Варианты размера size: (формат, ширина, геометрия, опции).
+    Формат None — формат sorl по умолчанию, для старых браузеров."""
+    geometry, options = settings.THUMBNAIL_SIZES[size]
+    width, height = map(int, geometry.split('x'))
+    widths = sorted({
+        *(value for value in settings.THUMBNAIL_WIDTHS if value < width),
+        width,
+    })
+    return [
+        (format, value, f'{value}x{round(height * value / width)}',
+         dict(options, format=format) if format else options)
+        for format in (None, *formats()) for value in widths
+    ]
+
+
+class Picture:
+    """Готовые варианты миниатюры одной картинки."""
+
+    def __init__(self, files):
+        # [(формат, ширина, ImageFile)] в порядке variants()
+        self.files = files
+
+    def _srcset(self, format):
+        return ', '.join(f'{file.url} {width}w'
+                         for file_format, width, file in self.files
+                         if file_format == format)
+
+    @property
+    def fallback(self):
+        """Самый широкий вариант в формате по умолчанию."""
+        return [file for format, _, file in self.files if format is None][-1]
+
+    @property
+    def url(self):
+        return self.fallback.url
+
+    @property
+    def width(self):
+        return self.fallback.width
+
+    @property
+    def height(self):
+        return self.fallback.height
+
+    @property
+    def srcset(self):
+        return self._srcset(None)
+
+    @property
+    def sources(self):
+        """(MIME-тип, srcset) современных форматов для <source>."""
+        found = {format for format, _, _ in self.files}
+        return [(MIME_TYPES.get(format, f'image/{format.lower()}'),
+                 self._srcset(format))
+                for format in formats() if format in found]
+
+
+def _options(source, options):
+    """Опции миниатюры с умолчаниями, как их дополняет
+    ThumbnailBackend.get_thumbnail: от них зависит имя файла."""
+    backend = default.backend
+    options = dict(options)
+    if sorl_settings.THUMBNAIL_PRESERVE_FORMAT:
+        options.setdefault('format', backend._get_format(source))
+    for key, value in backend.default_options.items():
+        options.setdefault(key, value)
+    for key, attr in backend.extra_options:
+        value = getattr(sorl_settings, attr)
+        if value != getattr(sorl_defaults, attr):
+            options.setdefault(key, value)
+    return options
+
+
+def _thumbnail_file(source, geometry, options):
+    """Файл варианта миниатюры, может быть ещё не созданный."""
+    name = default.backend._get_thumbnail_filename(
+        source, geometry, _options(source, options))
+    return ImageFile(name, default.storage)
+
+
+def lookup(image, size):
+    """Готовая миниатюра размера size (Picture) или None."""
+    if not image:
+        return None
+    return lookup_many([image], size)[image.name]
+
+
+def _load(files):
+    """Записи хранилища sorl для файлов: {ключ: ImageFile или None}."""
+    kvstore = default.kvstore
+    if not isinstance(kvstore, CachedDbKVStore):
+        return {key: kvstore.get(file) for key, file in files.items()}
+    keys = {add_prefix(file.key): key for key, file in files.items()}
+    values = kvstore.cache.get_many(keys)
+    missing = [key for key in keys if key not in values]
+    if missing:
+        stored = dict(KVStore.objects.filter(key__in=missing)
+                      .values_list('key', 'value'))
+        # промахи запоминаются так же, как в самом хранилище sorl
+        found = {key: stored.get(key, EMPTY_VALUE) for key in missing}
+        kvstore.cache.set_many(found, sorl_settings.THUMBNAIL_CACHE_TIMEOUT)
+        values.update(found)
+    return {
+        key: (None if values[raw] == EMPTY_VALUE
+              else deserialize_image_file(values[raw]))
+        for raw, key in keys.items()
+    }
+
+
+def lookup_many(images, size):
+    """Готовые миниатюры размера size для картинок images: словарь
+    имя картинки -> Picture или None. Пустые картинки пропускаются."""
+    files = {}
+    for image in images:
+        if not image:
+            continue
+        source = ImageFile(image)
+        for format, width, geometry, options in variants(size):
+            files[image.name, format, width] = _thumbnail_file(
+                source, geometry, options)
+    pictures = {}
+    for (name, format, width), file in _load(files).items():
+        pictures.setdefault(name, []).append((format, width, file))
+    return {
+        name: (Picture(files) if all(file is not None for *_, file in files)
+               else None)
+        for name, files in pictures.items()
+    }
+
+
+def create(image):
+    """Создаёт все варианты всех размеров картинки, декодируя её
+    один раз, как ThumbnailBackend.get_thumbnail."""
+    source = ImageFile(image)
+    engine = default.engine
+    source_image = engine.get_image(source)
+    try:
+        image_info = engine.get_image_info(source_image)
+        source.set_size(engine.get_image_size(source_image))
+        default.kvstore.get_or_set(source)
+        for size in settings.THUMBNAIL_SIZES:
+            for _, _, geometry, options in variants(size):
+                options = _options(source, options)
+                thumbnail = _thumbnail_file(source, geometry, options)
+                # хранилище не перезаписывает файлы, а сохраняет под
+                # другим именем; файл без записи sorl остаётся как есть
+                if (sorl_settings.THUMBNAIL_FORCE_OVERWRITE
+                        or not thumbnail.exists()):
+                    default.backend._create_thumbnail(
+                        source_image, geometry,
+                        dict(options, image_info=image_info), thumbnail)
+                default.kvstore.set(thumbnail, source)
+    finally:
+        engine.cleanup(source_image)
+
+
+def generate(post_id):
+    """Создаёт миниатюры картинки поста. Выполняется в процессе пула."""
+    from . import cache_tags
+    from .models import Post
+
+    try:
+        post = (Post.objects.filter(pk=post_id)
+                .select_related('author').first())
+        if post is None or not post.image:
+            return
+        create(post.image)
+    except Exception:
+        logger.exception('Не удалось создать миниатюры поста %s', post_id)
+        return
+    cache_tags.invalidate_post(post)
+
+
+def _check(post_id, future):
+    # ошибки вне generate: процесс погиб, задачу не удалось передать
+    if not future.cancelled() and future.exception() is not None:
+        logger.error('Не удалось создать миниатюры поста %s', post_id,
+                     exc_info=future.exception())
+
+
+def schedule(post_ids):
+    """Отправляет посты в пул, не дожидаясь миниатюр."""
+    futures = []
+    for post_id in post_ids:
+        future = pool.submit(generate, post_id)
+        future.add_done_callback(partial(_check, post_id))
+        futures.append(future)
+    return futures
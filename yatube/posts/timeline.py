@@ -0,0 +1,171 @@
+"""Лента подписок с раскладкой постов при записи (fan-out-on-write).
+
+При публикации пост раскладывается в TimelineEntry каждого подписчика,
+поэтому follow_index читает один диапазон индекса (user, -pub_date)
+вместо соединения Follow и Post. Посты авторов, у которых подписчиков
+больше FANOUT_FOLLOWERS_LIMIT, не раскладываются, а подтягиваются
+при чтении; момент, когда автор перешёл лимит, запоминается в
+AuthorStats.pulled_since. Подписка на такого автора всё равно
+раскладывает его посты в ленту нового подписчика, так что у каждого
+подписчика в ленте есть все посты автора до pulled_since.
+
+Когда подписчиков снова становится не больше лимита, новые посты
+автора опять раскладываются, а опубликованные после pulled_since
+раскладываются по лентам подписчиков в пуле процессов (settle) пачками
+по FANOUT_BATCH_SIZE подписчиков, не задерживая запрос на отписку.
+Пока пул не закончил, pulled_since не сброшен и лента подтягивает посты
+автора при чтении.
+"""
+import logging
+from functools import partial
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from core.pools import ProcessPool, current_settings, setup_django
+
+from .consts import FANOUT_BATCH_SIZE, FANOUT_FOLLOWERS_LIMIT
+from .models import AuthorStats, Follow, Post, TimelineEntry
+
+logger = logging.getLogger(__name__)
+
+pool = ProcessPool(
+    'FANOUT_WORKERS', initializer=setup_django,
+    initargs=lambda: (current_settings(('DATABASES', 'CACHES')),))
+
+
+def is_pulled(author):
+    """Посты автора читаются при запросе ленты, а не раскладываются."""
+    return AuthorStats.objects.filter(
+        user=author, followers_count__gt=FANOUT_FOLLOWERS_LIMIT).exists()
+
+
+def pulled_authors(user):
+    """Авторы из подписок пользователя, которых лента подтягивает
+    при чтении."""
+    return Follow.objects.filter(
+        Q(author__stats__followers_count__gt=FANOUT_FOLLOWERS_LIMIT)
+        | Q(author__stats__pulled_since__isnull=False),
+        user=user,
+    ).values_list('author', flat=True)
+
+
+def mark_pulled(author):
+    """После подписки: запоминает, когда подписчиков у автора стало
+    больше FANOUT_FOLLOWERS_LIMIT. Если прошлые посты ещё не
+    разложены, остаётся прежний момент."""
+    AuthorStats.objects.filter(
+        user=author,
+        followers_count__gt=FANOUT_FOLLOWERS_LIMIT,
+        pulled_since__isnull=True,
+    ).update(pulled_since=timezone.now())
+
+
+def _entries(posts, user_ids):
+    for post_id, author_id, pub_date in posts:
+        for user_id in user_ids:
+            yield TimelineEntry(user_id=user_id, post_id=post_id,
+                                author_id=author_id, pub_date=pub_date)
+
+
+def fan_out(post):
+    """Раскладывает новый пост по лентам подписчиков автора."""
+    if is_pulled(post.author_id):
+        return
+    followers = list(
+        Follow.objects.filter(author=post.author_id)
+        .values_list('user', flat=True)
+    )
+    TimelineEntry.objects.bulk_create(
+        _entries([(post.pk, post.author_id, post.pub_date)], followers),
+        batch_size=FANOUT_BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def _backfill(user_ids, posts):
+    TimelineEntry.objects.bulk_create(
+        _entries(posts, user_ids),
+        batch_size=FANOUT_BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def _posts(author, since=None):
+    posts = Post.objects.filter(author=author).order_by()
+    if since is not None:
+        posts = posts.filter(pub_date__gte=since)
+    return posts.values_list('pk', 'author', 'pub_date')
+
+
+def backfill(user, author):
+    """Добавляет в ленту пользователя посты автора после подписки."""
+    _backfill([getattr(user, 'pk', user)], _posts(author).iterator())
+
+
+def settle(author):
+    """После отписки: если подписчиков у автора стало ровно
+    FANOUT_FOLLOWERS_LIMIT, после фиксации транзакции отправляет в пул
+    раскладку постов, опубликованных, пока автор подтягивался."""
+    since = AuthorStats.objects.filter(
+        user=author, followers_count=FANOUT_FOLLOWERS_LIMIT,
+    ).values_list('pulled_since', flat=True).first()
+    if since is None:
+        return
+    transaction.on_commit(lambda: schedule(author, since))
+
+
+def spread(author_id, since):
+    """Раскладывает посты автора, опубликованные с since, по лентам
+    подписчиков пачками и перестаёт подтягивать автора, если он не
+    перешёл лимит снова. Выполняется в процессе пула."""
+    try:
+        posts = list(_posts(author_id, since))
+        last = 0
+        while True:
+            user_ids = list(
+                Follow.objects.filter(author=author_id, user__gt=last)
+                .order_by('user')
+                .values_list('user', flat=True)[:FANOUT_BATCH_SIZE])
+            if not user_ids:
+                break
+            _backfill(user_ids, posts)
+            last = user_ids[-1]
+        AuthorStats.objects.filter(
+            user=author_id, pulled_since=since,
+            followers_count__lte=FANOUT_FOLLOWERS_LIMIT,
+        ).update(pulled_since=None)
+    except Exception:
+        logger.exception('Не удалось разложить посты автора %s', author_id)
+
+
+def _check(author_id, future):
+    # ошибки вне spread: процесс погиб, задачу не удалось передать
+    if not future.cancelled() and future.exception() is not None:
+        logger.error('Не удалось разложить посты автора %s', author_id,
+                     exc_info=future.exception())
+
+
+def schedule(author_id, since):
+    """Отправляет раскладку постов автора в пул, не дожидаясь её."""
+    future = pool.submit(spread, author_id, since)
+    future.add_done_callback(partial(_check, author_id))
+    return future
+
+
+def prune(user, author):
+    """Убирает из ленты пользователя посты автора после отписки."""
+    TimelineEntry.objects.filter(user=user, author=author).delete()
+
+
+def feed(user):
+    """Посты ленты подписок пользователя, новые сверху."""
+    pulled = list(pulled_authors(user))
+    if not pulled:
+        return Post.objects.for_listing().filter(
+            timeline_entries__user=user).order_by(
+            '-timeline_entries__pub_date', '-timeline_entries__post')
+    stored = TimelineEntry.objects.filter(user=user).values('post')
+    return Post.objects.for_listing().filter(
+        Q(pk__in=stored) | Q(author__in=pulled))
@@ -0,0 +1,156 @@
+"""Проверка и нормализация картинок, загружаемых в посты.
+
+check() в потоке запроса читает только заголовок файла — формат и
+размеры — и отклоняет форматы не из UPLOAD_IMAGE_FORMATS и картинки
+больше UPLOAD_IMAGE_MAX_PIXELS пикселей ещё до того, как что-либо
+будет декодировано.
+
+normalize() выполняется в отдельном пуле из UPLOAD_WORKERS процессов,
+так что пик памяти при декодировании приходится не на процесс,
+обслуживающий запросы. Картинка уменьшается до UPLOAD_IMAGE_MAX_SIZE
+(JPEG сразу декодируется уменьшенным), поворачивается по EXIF и
+сохраняется заново без EXIF, но с цветовым профилем: JPEG —
+прогрессивным с качеством UPLOAD_IMAGE_QUALITY, WEBP — в WEBP,
+остальное — в PNG. У анимации лимит пикселей действует на все кадры
+вместе, и каждый кадр уменьшается и сохраняется заново в её формате.
+Там же вычисляются сведения о картинке для поста (posts.image_info).
+Погибший или не уложившийся в UPLOAD_TIMEOUT секунд процесс пула
+(см. core.pools) превращается в ошибку формы, а не в ответ 500.
+"""
+import os
+from concurrent.futures import TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from io import BytesIO
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from PIL import Image, ImageOps, ImageSequence
+
+from core.pools import ProcessPool
+
+from . import image_info
+
+EXTENSIONS = {'GIF': 'gif', 'JPEG': 'jpg', 'PNG': 'png', 'WEBP': 'webp'}
+# сведения кадра, которые нужны для его записи; остальное — метаданные
+FRAME_INFO = ('background', 'duration', 'icc_profile', 'transparency')
+
+pool = ProcessPool('UPLOAD_WORKERS')
+
+
+class ImageTooLarge(Exception):
+    pass
+
+
+def _source(file):
+    """Путь к временному файлу загрузки или её содержимое."""
+    if hasattr(file, 'temporary_file_path'):
+        return file.temporary_file_path()
+    file.seek(0)
+    return file.read()
+
+
+def _open(source):
+    return Image.open(BytesIO(source) if isinstance(source, bytes)
+                      else source)
+
+
+def check(file):
+    """Проверяет формат и число пикселей по заголовку картинки."""
+    file.seek(0)
+    try:
+        with Image.open(file) as image:
+            image_format, (width, height) = image.format, image.size
+    except Image.DecompressionBombError:
+        image_format, width, height = None, float('inf'), 1
+    except Exception as error:
+        raise ValidationError('Файл не является картинкой.',
+                              code='invalid_image') from error
+    finally:
+        file.seek(0)
+    if width * height > settings.UPLOAD_IMAGE_MAX_PIXELS:
+        raise ValidationError(
+            'Картинка слишком большая: не больше %(limit)s мегапикселей.',
+            code='too_many_pixels',
+            params={'limit': settings.UPLOAD_IMAGE_MAX_PIXELS // 10 ** 6})
+    if image_format not in settings.UPLOAD_IMAGE_FORMATS:
+        raise ValidationError(
+            'Неподдерживаемый формат картинки %(format)s.',
+            code='invalid_format', params={'format': image_format})
+
+
+def _still(image, max_size, quality):
+    image_format = image.format if image.format in ('JPEG', 'WEBP') else 'PNG'
+    icc_profile = image.info.get('icc_profile')
+    image.draft('RGB', max_size)
+    image = ImageOps.exif_transpose(image)
+    image.thumbnail(max_size, Image.LANCZOS)
+    image.info.pop('exif', None)
+    params = {'optimize': True}
+    if icc_profile:
+        params['icc_profile'] = icc_profile
+    if image_format == 'JPEG':
+        image = image.convert('RGB')
+        params.update(quality=quality, progressive=True)
+    elif image_format == 'WEBP':
+        params.update(quality=quality)
+    buffer = BytesIO()
+    image.save(buffer, image_format, **params)
+    return buffer.getvalue(), image_format
+
+
+def _animation(image, max_size):
+    frames, durations = [], []
+    for frame in ImageSequence.Iterator(image):
+        durations.append(frame.info.get('duration', 0))
+        frame = frame.copy()
+        frame.info = {key: value for key, value in frame.info.items()
+                      if key in FRAME_INFO}
+        frame.thumbnail(max_size, Image.LANCZOS)
+        frames.append(frame)
+    buffer = BytesIO()
+    frames[0].save(buffer, image.format, save_all=True,
+                   append_images=frames[1:], duration=durations,
+                   loop=image.info.get('loop', 0))
+    return buffer.getvalue(), image.format
+
+
+def normalize(source, max_pixels, max_size, quality):
+    """Картинка source (путь или байты), готовая к хранению: (данные,
+    формат, поля Post из image_info.describe)."""
+    with _open(source) as image:
+        frames = getattr(image, 'n_frames', 1)
+        if image.width * image.height * frames > max_pixels:
+            raise ImageTooLarge(image.size, frames)
+        if frames > 1:
+            data, image_format = _animation(image, max_size)
+        else:
+            data, image_format = _still(image, max_size, quality)
+    return data, image_format, image_info.describe(BytesIO(data))
+
+
+def process(file):
+    """Нормализованная копия загруженной картинки file из пула
+    процессов; сведения о ней — в атрибуте image_info."""
+    try:
+        future = pool.submit(
+            normalize, _source(file), settings.UPLOAD_IMAGE_MAX_PIXELS,
+            settings.UPLOAD_IMAGE_MAX_SIZE, settings.UPLOAD_IMAGE_QUALITY)
+        result = pool.result(future, settings.UPLOAD_TIMEOUT)
+    except ImageTooLarge as error:
+        raise ValidationError('Картинка слишком большая.',
+                              code='too_many_pixels') from error
+    except (BrokenProcessPool, TimeoutError) as error:
+        raise ValidationError(
+            'Не удалось обработать картинку, попробуйте другую.',
+            code='processing_failed') from error
+    except Exception as error:
+        raise ValidationError('Файл повреждён или не является картинкой.',
+                              code='invalid_image') from error
+    data, image_format, fields = result
+    name = os.path.splitext(os.path.basename(file.name))[0]
+    normalized = SimpleUploadedFile(
+        f'{name}.{EXTENSIONS[image_format]}', data,
+        Image.MIME[image_format])
+    normalized.image_info = fields
+    return normalized
@@ -1,10 +1,224 @@
-from django.core.paginator import Paginator
+import base64
+import datetime as dt
 
-from .consts import POSTS_COUNT
+from django.core.paginator import (EmptyPage, Page, PageNotAnInteger,
+                                   Paginator)
+from django.db.models import Q, QuerySet
+from django.utils import timezone
+from django.utils.functional import cached_property
 
+from . import counts
+from .consts import PAGE_WINDOW_ENDS, PAGE_WINDOW_SIDE, POSTS_COUNT
 
-def paginator(request, posts):
-    paginator = Paginator(posts, POSTS_COUNT)
+EPOCH = dt.datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def encode_cursor(post):
+    """Непрозрачный токен позиции поста в ленте (pub_date, id)."""
+    stamp = (post.pub_date - EPOCH) // dt.timedelta(microseconds=1)
+    raw = f'{stamp}:{post.pk}'.encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """Позиция (pub_date, id) из токена или None, если токен битый."""
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        stamp, pk = map(int, raw.decode().split(':'))
+        position = EPOCH + dt.timedelta(microseconds=stamp), pk
+    except (ValueError, UnicodeDecodeError, OverflowError):
+        return None
+    # id вне 64-битного целого база не примет
+    if not 0 < pk < 2 ** 63:
+        return None
+    return position
+
+
+class CursorPage(Page):
+    """Страница ленты, отсчитанная от позиции соседнего поста.
+
+    Не знает своего номера и общего числа страниц: ни COUNT, ни OFFSET
+    для неё не выполняются.
+    """
+    is_cursor = True
+
+    def __init__(self, object_list, paginator, has_previous, has_next):
+        super().__init__(object_list, None, paginator)
+        self._has_previous = has_previous
+        self._has_next = has_next
+
+    def __repr__(self):
+        return '<Cursor page>'
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    @property
+    def next_cursor(self):
+        if self._has_next and self.object_list:
+            return encode_cursor(self.object_list[-1])
+
+    @property
+    def previous_cursor(self):
+        if self._has_previous and self.object_list:
+            return encode_cursor(self.object_list[0])
+
+
+class CursorPaginator(Paginator):
+    """Пагинация по ключу (pub_date, id) вместо OFFSET/LIMIT.
+
+    Страница читается одним диапазоном индекса от позиции курсора,
+    поэтому глубокие страницы не дороже первой и не съезжают,
+    когда сверху появляются новые посты.
+    """
+
+    def __init__(self, object_list, per_page, **kwargs):
+        super().__init__(
+            object_list.order_by('-pub_date', '-pk'), per_page, **kwargs)
+
+    def first_page(self):
+        rows = list(self.object_list[:self.per_page + 1])
+        return CursorPage(rows[:self.per_page], self, False,
+                          len(rows) > self.per_page)
+
+    def page_after(self, position):
+        pub_date, pk = position
+        older = self.object_list.filter(
+            Q(pub_date__lt=pub_date) | Q(pub_date=pub_date, pk__lt=pk))
+        rows = list(older[:self.per_page + 1])
+        has_previous = self.object_list.filter(
+            Q(pub_date__gt=pub_date) | Q(pub_date=pub_date, pk__gte=pk)
+        ).exists()
+        return CursorPage(rows[:self.per_page], self, has_previous,
+                          len(rows) > self.per_page)
+
+    def page_before(self, position):
+        pub_date, pk = position
+        newer = self.object_list.filter(
+            Q(pub_date__gt=pub_date) | Q(pub_date=pub_date, pk__gt=pk)
+        ).reverse()
+        rows = list(newer[:self.per_page + 1])
+        if len(rows) <= self.per_page:
+            return self.first_page()
+        return CursorPage(rows[:self.per_page][::-1], self, True, True)
+
+
+def cursor_page(request, posts):
+    """Страница по ?after=/?before= или None, если курсора нет."""
+    for param in ('after', 'before'):
+        token = request.GET.get(param)
+        if token is None:
+            continue
+        paginator = CursorPaginator(posts, POSTS_COUNT)
+        position = decode_cursor(token)
+        if position is None:
+            return paginator.first_page()
+        if param == 'after':
+            return paginator.page_after(position)
+        return paginator.page_before(position)
+    return None
+
+
+class CachedCountPaginator(Paginator):
+    """Paginator, который берёт общее число постов из кэша области
+    выборки (см. posts.counts) вместо COUNT(*) на каждый запрос.
+
+    Если итог приблизительный, номера страниц за ним не отсекаются,
+    а в окне номеров нет последней страницы. Пустая страница за
+    приблизительным итогом — повод посчитать посты точно: page()
+    поднимает EmptyPage, а get_page() отдаёт последнюю страницу.
+    """
+    ELLIPSIS = '…'
+
+    def __init__(self, object_list, per_page, scope=None, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.scope = scope
+        self.approximate = False
+
+    @cached_property
+    def count(self):
+        if self.scope is None:
+            return super().count
+        total, self.approximate = counts.get_total(
+            self.scope, self.object_list)
+        return total
+
+    def validate_number(self, number):
+        if not (self.count and self.approximate):
+            return super().validate_number(number)
+        try:
+            number = int(number)
+        except (TypeError, ValueError):
+            raise PageNotAnInteger('That page number is not an integer')
+        if number < 1:
+            raise EmptyPage('That page number is less than 1')
+        return number
+
+    def _count_exactly(self):
+        self.approximate = False
+        self.__dict__['count'] = Paginator.count.func(self)
+        self.__dict__.pop('num_pages', None)
+
+    def page(self, number):
+        number = self.validate_number(number)
+        bottom = (number - 1) * self.per_page
+        top = bottom + self.per_page
+        if not self.approximate and top + self.orphans >= self.count:
+            top = self.count
+        object_list = self.object_list[bottom:top]
+        if self.approximate and number > 1 and not object_list:
+            self._count_exactly()
+            raise EmptyPage('That page contains no results')
+        page = self._get_page(object_list, number, self)
+        page.page_window = list(self.get_elided_page_range(number))
+        return page
+
+    def get_page(self, number):
+        try:
+            return super().get_page(number)
+        except EmptyPage:
+            return self.page(self.num_pages)
+
+    def get_elided_page_range(self, number=1, *,
+                              on_each_side=PAGE_WINDOW_SIDE,
+                              on_ends=PAGE_WINDOW_ENDS):
+        """Номера страниц вокруг текущей и по краям, пропуски
+        обозначены ELLIPSIS."""
+        last = max(self.num_pages, number)
+        if last <= (on_each_side + on_ends) * 2 and not self.approximate:
+            yield from range(1, last + 1)
+            return
+        if number > (1 + on_each_side + on_ends) + 1:
+            yield from range(1, on_ends + 1)
+            yield self.ELLIPSIS
+            yield from range(number - on_each_side, number + 1)
+        else:
+            yield from range(1, number + 1)
+        if self.approximate:
+            yield from range(number + 1,
+                             min(number + on_each_side, last) + 1)
+            yield self.ELLIPSIS
+        elif number < (last - on_each_side - on_ends) - 1:
+            yield from range(number + 1, number + on_each_side + 1)
+            yield self.ELLIPSIS
+            yield from range(last - on_ends + 1, last + 1)
+        else:
+            yield from range(number + 1, last + 1)
+
+
+def paginator(request, posts, scope=None):
+    if isinstance(posts, QuerySet):
+        page_obj = cursor_page(request, posts)
+        if page_obj is not None:
+            return page_obj
+    paginator = CachedCountPaginator(posts, POSTS_COUNT, scope=scope)
     page_number = request.GET.get('page')
     page_obj = paginator.get_page(page_number)
+    # при приблизительном итоге следующая страница может быть и за
+    # последней известной: номер за ней paginator не отсекает
+    page_obj.has_more = page_obj.has_next() or (
+        paginator.approximate and len(page_obj) == POSTS_COUNT)
     return page_obj
@@ -1,63 +1,75 @@
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
-from django.shortcuts import get_object_or_404, redirect, render
-from django.views.decorators.cache import cache_page
+from django.shortcuts import redirect, render
 
-from .consts import TITLE_LENGTH
+from core.cache_tags import cache_view, conditional_view
+from core.identity import get_object_or_404
+from core.query_budget import query_budget
+from core.query_cache import cached
+
+from . import cache_tags, stats
+from .consts import PAGE_CACHE_TIMEOUT
+from .feeds import follow_feed
 from .forms import CommentForm, PostForm
 from .models import Follow, Group, Post, User
 from .utils import paginator
 
 
-@cache_page(20, key_prefix='index_page')
+@query_budget(5)
+@conditional_view(cache_tags.with_viewer(cache_tags.index_tags))
+@cache_view(cache_tags.index_tags, PAGE_CACHE_TIMEOUT, 'index_page')
 def index(request):
-    posts = Post.objects.all()
-    context = dict(posts=posts, page_obj=paginator(request, posts))
+    posts = Post.objects.for_listing()
+    context = dict(posts=posts,
+                   page_obj=paginator(request, posts, scope='all'))
     return render(request, 'posts/index.html', context)
 
 
+@query_budget(6)
+@conditional_view(cache_tags.with_viewer(cache_tags.group_posts_tags))
+@cache_view(cache_tags.group_posts_tags, PAGE_CACHE_TIMEOUT, 'group_posts')
 def group_posts(request, slug):
-    group = get_object_or_404(Group, slug=slug)
-    posts = group.posts_by_group.all()
+    group = get_object_or_404(cached(Group.objects), slug=slug)
+    posts = group.posts_by_group.for_listing()
     # posts здесь не обязателен, и так работает, но в тестах
     # проверяться должен список постов, так что возвращаю его
     context = dict(group=group, posts=posts,
-                   page_obj=paginator(request, posts))
+                   page_obj=paginator(request, posts,
+                                      scope=f'group:{group.pk}'))
     return render(request, 'posts/group_list.html', context)
 
 
+@query_budget(10)
+@conditional_view(cache_tags.with_viewer(cache_tags.profile_tags))
+@cache_view(cache_tags.profile_tags, PAGE_CACHE_TIMEOUT, 'profile')
 def profile(request, username):
-    posts = get_object_or_404(User, username=username).posts_by_author.all()
-    posts_author = get_object_or_404(User, username=username)
-    following = False
-    if request.user.is_authenticated:
-        following = Follow.objects.filter(
-            user=request.user,
-            author=get_object_or_404(User, username=username)
-        ).exists()
+    posts_author = get_object_or_404(
+        cached(User.objects.select_related('stats')), username=username)
+    posts = posts_author.posts_by_author.for_listing()
+    # кнопка подписки зависит от пользователя и выводится дыркой
+    # follow_button, см. posts.holes
     context = dict(posts=posts,
-                   page_obj=paginator(request, posts),
-                   following=following,
+                   page_obj=paginator(request, posts,
+                                      scope=f'author:{posts_author.pk}'),
                    posts_author=posts_author)
     return render(request, 'posts/profile.html', context)
 
 
+@query_budget(6)
+@conditional_view(cache_tags.with_viewer(cache_tags.post_detail_tags))
+@cache_view(cache_tags.post_detail_tags, PAGE_CACHE_TIMEOUT, 'post_detail')
 def post_detail(request, post_id):
-    post = get_object_or_404(Post, id=post_id)
-    short_post = str(post.text)[:TITLE_LENGTH]
-    if len(short_post) == TITLE_LENGTH:
-        short_post += '...'
-    posts = post.author.posts_by_author.all()
-    comments = get_object_or_404(Post, id=post_id).comments.all()
-    context = dict(post=post, posts=posts,
-                   short_post=short_post,
-                   imposter=post.author != request.user,
+    post = get_object_or_404(Post.objects.for_detail(), id=post_id)
+    comments = post.comments.select_related('author')
+    context = dict(post=post,
+                   short_post=post.title,
                    form=CommentForm(),
                    comments=comments
                    )
     return render(request, 'posts/post_detail.html', context)
 
 
+@query_budget(15)
 @login_required
 def post_create(request):
     form = PostForm(request.POST or None,
@@ -72,6 +84,7 @@ def post_create(request):
     return redirect('posts:profile', request.user)
 
 
+@query_budget(15)
 @login_required
 def post_edit(request, post_id):
     post = get_object_or_404(Post, id=post_id)
@@ -90,6 +103,7 @@ def post_edit(request, post_id):
                   {'is_edit': True, 'form': form})
 
 
+@query_budget(8)
 @login_required
 def add_comment(request, post_id):
     post = get_object_or_404(Post, id=post_id)
@@ -102,22 +116,25 @@ def add_comment(request, post_id):
     return redirect('posts:post_detail', post_id=post_id)
 
 
+@query_budget(8)
 @login_required
 def follow_index(request):
     """View-функция страницы, куда будут выведены посты авторов,
     на которых подписан текущий пользователь"""
-    posts = Post.objects.filter(author__following__user=request.user)
-    count = Follow.objects.count()
+    posts = follow_feed(request.user)
+    count = stats.following_count(request.user)
     context = dict(posts=posts,
                    count=count,
-                   page_obj=paginator(request, posts))
+                   page_obj=paginator(request, posts,
+                                      scope=f'follow:{request.user.pk}'))
     return render(request, 'posts/follow.html', context)
 
 
+@query_budget(12)
 @login_required
 def profile_follow(request, username):
     # Подписаться на автора
-    author = get_object_or_404(User, username=username)
+    author = get_object_or_404(cached(User.objects), username=username)
     follow = Follow.objects.filter(
         user=request.user,
         author=author)
@@ -130,11 +147,12 @@ def profile_follow(request, username):
     return redirect('posts:profile', username=username)
 
 
+@query_budget(10)
 @login_required
 def profile_unfollow(request, username):
     # Отписаться от автора
     Follow.objects.filter(
         user=request.user,
-        author=get_object_or_404(User, username=username)
+        author=get_object_or_404(cached(User.objects), username=username)
     ).delete()
     return redirect('posts:profile', username=username)
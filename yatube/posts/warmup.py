@@ -0,0 +1,59 @@
+"""Прогрев кэша страниц после выкладки.
+
+hot_urls() выбирает страницы, которые первыми откроют посетители:
+первые страницы главной, крупнейшие группы, авторов с наибольшим
+числом подписчиков и свежие посты. warm() запрашивает их анонимно
+через тестовый клиент Django в несколько потоков: cache_view кладёт
+тело страницы в кэш, а дырки заполняются уже для настоящих
+посетителей.
+"""
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connections
+from django.test import Client
+from django.urls import reverse
+from django.utils import translation
+
+from .models import Group, Post, User
+
+
+def hot_urls(pages=3, top=10):
+    urls = [reverse('posts:index')]
+    urls += [f'{urls[0]}?page={number}' for number in range(2, pages + 1)]
+    urls += [reverse('posts:group_list', kwargs={'slug': slug})
+             for slug in Group.objects.order_by('-posts_count')
+             .values_list('slug', flat=True)[:top]]
+    urls += [reverse('posts:profile', kwargs={'username': username})
+             for username in User.objects.order_by('-stats__followers_count')
+             .values_list('username', flat=True)[:top]]
+    urls += [reverse('posts:post_detail', kwargs={'post_id': post_id})
+             for post_id in Post.objects.values_list('id', flat=True)[:top]]
+    return urls
+
+
+def _fetch(url, host, secure, language):
+    # язык входит в ключ кэша страницы, а новый поток начинает
+    # с языка по умолчанию
+    try:
+        started = time.monotonic()
+        with translation.override(language):
+            response = Client(HTTP_HOST=host).get(url, secure=secure)
+        return url, response.status_code, time.monotonic() - started
+    finally:
+        # у каждого потока своё соединение с базой
+        connections.close_all()
+
+
+def warm(urls, workers=4, host=None, secure=None):
+    """Рендерит страницы urls в кэш; возвращает (url, статус, секунды)
+    в порядке urls."""
+    host = host or settings.WARM_CACHE_HOST
+    if secure is None:
+        secure = settings.WARM_CACHE_SECURE
+    language = translation.get_language()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(_fetch, urls, [host] * len(urls),
+                                 [secure] * len(urls),
+                                 [language] * len(urls)))
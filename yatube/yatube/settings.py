@@ -51,6 +51,9 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'core.query_budget.QueryBudgetMiddleware',
+    'core.identity.IdentityMapMiddleware',
+    'core.cache_stats.CacheStatsMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -148,8 +151,80 @@ CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Кэш в памяти процесса поверх общего для процессов машины кэша,
+# изменения ключей объявляются через журнал CHANNEL (см. core.caches)
+CACHE_DIR = os.path.join(BASE_DIR, 'cache')
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-    }
+        'BACKEND': 'core.caches.instrumented.InstrumentedCache',
+        'OPTIONS': {
+            'CACHE': 'two_tier',
+            'STATS': os.path.join(CACHE_DIR, 'stats.sqlite3'),
+        },
+    },
+    'two_tier': {
+        'BACKEND': 'core.caches.two_tier.TwoTierCache',
+        'OPTIONS': {
+            'SHARED': 'shared',
+            'CHANNEL': os.path.join(CACHE_DIR, 'invalidation.sqlite3'),
+            'MAX_ENTRIES': 1000,
+            'LOCAL_TIMEOUT': 60,
+        },
+    },
+    'shared': {
+        'BACKEND': 'core.caches.shared_memory.SharedMemoryCache',
+        'LOCATION': os.path.join(CACHE_DIR, 'shared.mmap'),
+        'OPTIONS': {'SIZE': 64 * 1024 * 1024},
+    },
+}
+
+# Хост и схема (https при WARM_CACHE_SECURE), от имени которых
+# warm_cache рендерит страницы: в ключ кэша страницы входит её полный
+# адрес
+WARM_CACHE_HOST = 'localhost'
+WARM_CACHE_SECURE = False
+
+# Размеры миниатюр картинок постов: имя -> (геометрия, опции
+# sorl-thumbnail). Миниатюры создаёт пул из THUMBNAIL_WORKERS процессов
+# после сохранения поста, см. posts.thumbnails
+THUMBNAIL_SIZES = {
+    'card': ('960x339', {'crop': 'center', 'upscale': True}),
 }
+# Ширины вариантов каждого размера для srcset и современные форматы
+# вариантов в порядке предпочтения; форматы, которые не умеет
+# кодировать Pillow, пропускаются
+THUMBNAIL_WIDTHS = (320, 640, 960)
+THUMBNAIL_FORMATS = ('AVIF', 'WEBP')
+
+# Загружаемые картинки постов: допустимые форматы и число пикселей
+# проверяются по заголовку, затем пул из UPLOAD_WORKERS процессов
+# уменьшает картинку до UPLOAD_IMAGE_MAX_SIZE и сохраняет заново без
+# EXIF; результат ждут не дольше UPLOAD_TIMEOUT секунд, см. posts.uploads
+UPLOAD_IMAGE_FORMATS = ('JPEG', 'PNG', 'GIF', 'WEBP')
+UPLOAD_IMAGE_MAX_PIXELS = 50 * 10 ** 6
+UPLOAD_IMAGE_MAX_SIZE = (2560, 2560)
+UPLOAD_IMAGE_QUALITY = 85
+UPLOAD_WORKERS = 2
+UPLOAD_TIMEOUT = 30
+THUMBNAIL_WORKERS = 2
+# Посты автора, вернувшегося под лимит раскладки, раскладывает по
+# лентам пул из FANOUT_WORKERS процессов, см. posts.timeline
+FANOUT_WORKERS = 1
+
+# Движок ленты подписок: 'timeline' (раскладка постов по лентам при записи)
+# или 'buffers' (слияние буферов последних постов авторов при чтении)
+FOLLOW_FEED_ENGINE = 'timeline'
+
+# Таблицы, запросы к которым кэширует core.query_cache.cached: записи
+# только в них меняют версии кэшированных запросов. UPDATE только
+# столбцов из QUERY_CACHE_IGNORED_COLUMNS версий не меняет: кэшированные
+# страницы эти столбцы не показывают
+QUERY_CACHE_TABLES = (
+    'auth_user', 'posts_authorstats', 'posts_group', 'posts_follow',
+)
+QUERY_CACHE_IGNORED_COLUMNS = {'auth_user': ('last_login',)}
+
+# Бюджет SQL-запросов на запрос к view (см. core.query_budget).
+# В строгом режиме превышение бюджета поднимает исключение
+QUERY_BUDGET_DEFAULT = 30
+QUERY_BUDGET_STRICT = False
@@ -0,0 +1,37 @@
+"""Настройки для тестов.
+
+Тесты получают свой каталог кэша на каждый запуск, поэтому общий кэш
+и статистика разработки не смешиваются с тестовыми. manage.py test и
+pytest берут эти настройки сами.
+"""
+import atexit
+import copy
+import os
+import shutil
+import tempfile
+
+from .settings import *  # noqa: F401,F403
+from .settings import CACHE_DIR as DEV_CACHE_DIR
+from .settings import CACHES
+
+# каталог создают сами кэши при первой записи, так что процессы пулов,
+# которые получают CACHES родителя, своего каталога не заводят
+CACHE_DIR = os.path.join(tempfile.gettempdir(),
+                         f'yatube-cache-{os.getpid()}')
+shutil.rmtree(CACHE_DIR, ignore_errors=True)
+atexit.register(shutil.rmtree, CACHE_DIR, ignore_errors=True)
+
+
+def _in_test_dir(value):
+    if isinstance(value, str) and value.startswith(DEV_CACHE_DIR):
+        return CACHE_DIR + value[len(DEV_CACHE_DIR):]
+    return value
+
+
+CACHES = copy.deepcopy(CACHES)
+for params in CACHES.values():
+    if 'LOCATION' in params:
+        params['LOCATION'] = _in_test_dir(params['LOCATION'])
+    options = params.get('OPTIONS', {})
+    for name, value in options.items():
+        options[name] = _in_test_dir(value)
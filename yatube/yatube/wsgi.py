@@ -8,9 +8,27 @@ https://docs.djangoproject.com/en/2.2/howto/deployment/wsgi/
 """
 
 import os
+import threading
 
 from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
 
 application = get_wsgi_application()
+
+
+def warm_cache():
+    """Прогревает кэш страниц один раз на выкладку, сколько бы
+    процессов ни стартовало: выкладка задаёт YATUBE_WARM_CACHE,
+    например номером релиза."""
+    from django.core.cache import cache
+    from django.core.management import call_command
+
+    release = os.environ['YATUBE_WARM_CACHE']
+    if cache.add(f'warm_cache:{release}', True, None):
+        call_command('warm_cache')
+
+
+if os.environ.get('YATUBE_WARM_CACHE'):
+    # процесс начинает отвечать, не дожидаясь прогрева
+    threading.Thread(target=warm_cache, daemon=True).start()